@@ -0,0 +1,52 @@
+"""
+Numeric Mode Benchmarks
+Compares evaluation cost of the float, decimal and fraction modes
+
+Run from the project root:
+
+    python benchmarks/bench_numeric_modes.py
+"""
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from calculator_logic import CalculatorLogic
+
+EXPRESSIONS = {
+    "short": "12 + 7 - 3 * 2",
+    "decimals": "0.1 + 0.2 * 3.75 / 1.25",
+    "nested": "((1.5 + 2.25) * (3 - 0.5)) / ((4 + 1) * (2.5 - 1))",
+    "division": "1 / 3 + 2 / 7 + 5 / 11",
+}
+
+MODES = ("float", "decimal", "fraction")
+
+
+def time_per_call(func, number: int) -> float:
+    """Best of three runs, in microseconds per call"""
+    return min(timeit.repeat(func, number=number, repeat=3)) / number * 1e6
+
+
+def main(number: int = 20000):
+    """Print per-call cost of calculate and the arithmetic methods per mode"""
+    rows = []
+    for mode in MODES:
+        logic = CalculatorLogic(mode=mode)
+        for name, expression in EXPRESSIONS.items():
+            rows.append((mode, f"calculate[{name}]",
+                         time_per_call(lambda: logic.calculate(expression), number)))
+        rows.append((mode, "add", time_per_call(lambda: logic.add("1.25", "2.5"), number)))
+        rows.append((mode, "divide", time_per_call(lambda: logic.divide("1", "3"), number)))
+        rows.append((mode, "format_result",
+                     time_per_call(lambda: logic.format_result(logic.calculate("1/3")), number)))
+
+    print(f"{'mode':<10}{'benchmark':<24}{'us/call':>10}")
+    for mode, name, micros in rows:
+        print(f"{mode:<10}{name:<24}{micros:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
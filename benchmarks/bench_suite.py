@@ -0,0 +1,264 @@
+"""
+Benchmark Suite
+Reproducible timings for the logic, history and UI hot paths
+
+Run from the project root:
+
+    python benchmarks/bench_suite.py --output results.json
+    python benchmarks/bench_suite.py --compare results.json --threshold 0.25
+
+Every benchmark reports seconds per call (best of several runs). Results
+are written as JSON; --compare loads an earlier run and exits with status 1
+when any benchmark got slower by more than the threshold fraction.
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+from datetime import datetime
+from itertools import islice
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from calculator_logic import CalculatorLogic
+from history_manager import HistoryManager
+
+DEFAULT_SIZES = (100, 10000, 1000000)
+DEFAULT_THRESHOLD = 0.25
+
+EXPRESSIONS = {
+    "short": "12 + 7 - 3 * 2",
+    "long": " + ".join(f"{i}.5 * {i % 7 + 1}" for i in range(200)),
+    "nested": "(" * 90 + "1 + 2" + ")" * 90,
+}
+
+
+def best_time(func, number: int, repeat: int = 3) -> float:
+    """Best of repeat runs, in seconds per call"""
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number
+
+
+def bench_logic(results: dict, scale: float = 1.0):
+    """calculate() for several expression shapes and the arithmetic methods"""
+    number = max(1, int(2000 * scale))
+    for name, expression in EXPRESSIONS.items():
+        # A fresh cache per call measures parsing plus evaluation
+        logic = CalculatorLogic()
+        results[f"logic.calculate[{name}]"] = best_time(
+            lambda: (logic.cache.clear(), logic.calculate(expression)), number)
+
+    logic = CalculatorLogic()
+    results["logic.calculate[repeated]"] = best_time(
+        lambda: logic.calculate(EXPRESSIONS["short"]), number * 10)
+    unique = [f"{i} * 3 + {i % 97} / 7" for i in range(number)]
+    results["logic.calculate[unique]"] = best_time(
+        lambda: [logic.calculate(e) for e in unique], 1) / len(unique)
+
+    for method in ("add", "subtract", "multiply", "divide"):
+        func = getattr(logic, method)
+        results[f"logic.{method}"] = best_time(lambda: func("12.5", "3.25"), number * 10)
+
+    # The same formula through compile(): bindings only, no parsing per call
+    compiled = logic.compile("x * 3 + y / 7")
+    results["logic.compile[call]"] = best_time(lambda: compiled(12.5, 3.25), number * 10)
+
+
+def write_snapshot(path: str, size: int):
+    """Write a history snapshot with size synthetic calculations"""
+    calculations = [
+        {"expression": f"{i} + {i % 13} × 7", "result": str(i + i % 13 * 7),
+         "timestamp": "2024-01-01 12:00:00"}
+        for i in range(size)
+    ]
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({"calculations": calculations, "last_seq": size}, f)
+
+
+def bench_history(results: dict, sizes=DEFAULT_SIZES):
+    """HistoryManager operations at several history sizes"""
+    for size in sizes:
+        repeat = 1 if size >= 1000000 else 3
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "history.json")
+            write_snapshot(path, size)
+            # max_entries=0 disables trimming so the history keeps every entry
+            results[f"history.load_history[{size}]"] = best_time(
+                lambda: HistoryManager(path, max_entries=0), 1, repeat)
+
+            history = HistoryManager(path, max_entries=0)
+            # The search index is built once, then kept up to date
+            results[f"history.build_index[{size}]"] = best_time(
+                lambda: history.get_history().copy().enable_index(), 1, repeat)
+            history.get_history().enable_index()
+            results[f"history.search_history[{size}]"] = best_time(
+                lambda: history.search_history("77"), 1, repeat)
+            # First page of search-as-you-type results for each query kind
+            for name, query in (("text", {"text": "77"}), ("prefix", {"prefix": "12"}),
+                                ("range", {"minimum": 100, "maximum": 200})):
+                results[f"history.query_history[{name},{size}]"] = best_time(
+                    lambda: list(islice(history.query_history(**query), 50)), 10, repeat)
+            export = os.path.join(directory, "export.json")
+            results[f"history.export_history[{size}]"] = best_time(
+                lambda: history.export_history(export), 1, repeat)
+            # Foreground latency only; compaction runs on its own thread
+            results[f"history.add_calculation[{size}]"] = best_time(
+                lambda: history.add_calculation("1 + 2", "3"), 200, repeat)
+            history.close()
+
+
+def bench_startup(results: dict, repeat: int = 5):
+    """Cold start of main.py in a fresh interpreter"""
+    command = [sys.executable, os.path.join(ROOT, "main.py"), "--eval", "-"]
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(command, input=b"", cwd=tempfile.gettempdir(),
+                       stdout=subprocess.DEVNULL, check=True)
+        timings.append(time.perf_counter() - start)
+    results["startup.main[headless]"] = min(timings)
+
+    try:
+        import PySide6  # noqa: F401
+    except ImportError:
+        return
+    command = [sys.executable, "-c", "import sys; sys.path.insert(0, sys.argv[1]); "
+               "from PySide6.QtWidgets import QApplication; import calculator_ui; "
+               "app = QApplication([]); w = calculator_ui.CalculatorUI(); w.close()", ROOT]
+    env = dict(os.environ, QT_QPA_PLATFORM="offscreen")
+    timings = []
+    with tempfile.TemporaryDirectory() as directory:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            subprocess.run(command, cwd=directory, env=env, check=True)
+            timings.append(time.perf_counter() - start)
+    results["startup.main[gui]"] = min(timings)
+
+
+def bench_ui(results: dict, scale: float = 1.0):
+    """History panel updates and expression input, on an offscreen display"""
+    try:
+        os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+        from PySide6.QtWidgets import QApplication
+    except ImportError:
+        print("PySide6 not installed, skipping UI benchmarks", file=sys.stderr)
+        return
+    import calculator_ui
+
+    app = QApplication.instance() or QApplication([])
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        try:
+            window = calculator_ui.CalculatorUI()
+            number = max(1, int(500 * scale))
+
+            def add_and_refresh():
+                window.history.add_calculation("1 + 2", "3")
+                window.update_history_display()
+                app.processEvents()
+
+            results["ui.update_history_display"] = best_time(add_and_refresh, number)
+
+            # A 5,000-character expression, pasted at once or typed key by key
+            expression = "12+" * 1666 + "34"
+            app.clipboard().setText(expression)
+
+            def paste():
+                window.handle_clear()
+                window.handle_paste()
+                app.processEvents()
+
+            def type_keys():
+                window.handle_clear()
+                for key in expression:
+                    window.button_clicked(key)
+                app.processEvents()
+
+            results["ui.paste_expression"] = best_time(paste, max(1, int(20 * scale)))
+            results["ui.type_expression"] = best_time(type_keys, max(1, int(5 * scale)))
+            window.close()
+        finally:
+            os.chdir(cwd)
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """Return (name, old, new, ratio) for benchmarks slower than the threshold"""
+    regressions = []
+    for name, new in sorted(results.items()):
+        old = baseline.get(name)
+        if old and new / old > 1 + threshold:
+            regressions.append((name, old, new, new / old))
+    return regressions
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Create the command line parser"""
+    parser = argparse.ArgumentParser(description="Run the calculator benchmark suite")
+    parser.add_argument("--output", metavar="FILE", help="write results as JSON")
+    parser.add_argument("--compare", metavar="FILE", help="baseline JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="allowed slowdown fraction before failing (default: 0.25)")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                        help="comma-separated history sizes (default: 100,10000,1000000)")
+    parser.add_argument("--only", choices=("logic", "history", "startup", "ui"), action="append",
+                        help="run only the given group (repeatable)")
+    parser.add_argument("--quick", action="store_true",
+                        help="fewer iterations and no 1M history, for smoke runs")
+    return parser
+
+
+def main(argv=None) -> int:
+    """Run the selected benchmarks, save and compare results"""
+    args = build_parser().parse_args(argv)
+    groups = args.only or ["logic", "history", "startup", "ui"]
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+    scale = 0.1 if args.quick else 1.0
+    if args.quick:
+        sizes = [s for s in sizes if s < 1000000]
+
+    results = {}
+    if "logic" in groups:
+        bench_logic(results, scale)
+    if "history" in groups:
+        bench_history(results, sizes)
+    if "startup" in groups:
+        bench_startup(results, 2 if args.quick else 5)
+    if "ui" in groups:
+        bench_ui(results, scale)
+
+    print(f"{'benchmark':<40}{'us/call':>14}")
+    for name, seconds in results.items():
+        print(f"{name:<40}{seconds * 1e6:>14.2f}")
+
+    if args.output:
+        data = {
+            "meta": {
+                "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+            },
+            "results": results,
+        }
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2)
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        for name, old, new, ratio in regressions:
+            print(f"REGRESSION {name}: {old * 1e6:.2f} -> {new * 1e6:.2f} us ({ratio:.2f}x)")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,170 @@
+"""
+Calculator Client Module
+Client library for the JSON-RPC calculator server
+"""
+
+import asyncio
+import itertools
+import json
+import socket
+from typing import List, Optional
+from calc_server import MAX_LINE_BYTES, parse_address
+
+
+class CalculatorServerError(Exception):
+    """Error response returned by the calculator server"""
+
+    def __init__(self, code: int, message: str):
+        super().__init__(message)
+        self.code = code
+
+
+def unwrap(response: dict):
+    """Return the result of a response or raise its error"""
+    if "error" in response:
+        error = response["error"]
+        raise CalculatorServerError(error.get("code"), error.get("message"))
+    return response["result"]
+
+
+class CalculatorClient:
+    """Blocking client; one request at a time or a pipelined batch"""
+
+    def __init__(self, address: str = "127.0.0.1:8765", timeout: Optional[float] = None):
+        kind, target = parse_address(address)
+        if kind == "unix":
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        else:
+            self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.sock.settimeout(timeout)
+        self.sock.connect(target)
+        self.stream = self.sock.makefile("rwb")
+        self.ids = itertools.count(1)
+
+    def call(self, method: str, params=None):
+        """Send one request and wait for its result"""
+        request_id = next(self.ids)
+        self.send({"jsonrpc": "2.0", "id": request_id, "method": method, "params": params or {}})
+        return unwrap(self.receive())
+
+    def calculate(self, expression: str) -> str:
+        """Evaluate one expression and return the formatted result"""
+        return self.call("calculate", {"expression": expression})
+
+    def calculate_many(self, expressions: List[str]) -> list:
+        """Evaluate a list of expressions server-side in one request"""
+        return self.call("calculate_many", {"expressions": list(expressions)})
+
+    def pipeline(self, expressions: List[str]) -> list:
+        """Send one JSON-RPC batch of calculate requests, results in order
+
+        Failed items come back as CalculatorServerError instances.
+        """
+        start = next(self.ids)
+        batch = [{"jsonrpc": "2.0", "id": start + i, "method": "calculate",
+                  "params": {"expression": expression}}
+                 for i, expression in enumerate(expressions)]
+        self.ids = itertools.count(start + len(batch))
+        if not batch:
+            return []
+        self.send(batch)
+        by_id = {response["id"]: response for response in self.receive()}
+        results = []
+        for request in batch:
+            try:
+                results.append(unwrap(by_id[request["id"]]))
+            except CalculatorServerError as e:
+                results.append(e)
+        return results
+
+    def send(self, message):
+        """Write one newline-delimited JSON message"""
+        self.stream.write(json.dumps(message).encode("utf-8") + b"\n")
+        self.stream.flush()
+
+    def receive(self):
+        """Read one newline-delimited JSON message"""
+        line = self.stream.readline(MAX_LINE_BYTES)
+        if not line:
+            raise ConnectionError("Calculator server closed the connection")
+        return json.loads(line)
+
+    def close(self):
+        """Close the connection"""
+        self.stream.close()
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class AsyncCalculatorClient:
+    """Asyncio client that pipelines concurrent requests on one connection"""
+
+    def __init__(self):
+        self.reader = None
+        self.writer = None
+        self.pending = {}
+        self.ids = itertools.count(1)
+        self.listener = None
+
+    @classmethod
+    async def connect(cls, address: str = "127.0.0.1:8765") -> "AsyncCalculatorClient":
+        """Open a connection to the server"""
+        client = cls()
+        kind, target = parse_address(address)
+        if kind == "unix":
+            client.reader, client.writer = await asyncio.open_unix_connection(
+                target, limit=MAX_LINE_BYTES)
+        else:
+            client.reader, client.writer = await asyncio.open_connection(
+                *target, limit=MAX_LINE_BYTES)
+        client.listener = asyncio.ensure_future(client.listen())
+        return client
+
+    async def listen(self):
+        """Route responses to the futures waiting for them"""
+        try:
+            while True:
+                line = await self.reader.readline()
+                if not line:
+                    break
+                message = json.loads(line)
+                for response in (message if isinstance(message, list) else [message]):
+                    future = self.pending.pop(response.get("id"), None)
+                    if future is not None and not future.done():
+                        future.set_result(response)
+        finally:
+            for future in self.pending.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("Calculator server closed the connection"))
+            self.pending.clear()
+
+    async def call(self, method: str, params=None):
+        """Send one request; many calls may be awaited concurrently"""
+        request_id = next(self.ids)
+        future = asyncio.get_running_loop().create_future()
+        self.pending[request_id] = future
+        message = {"jsonrpc": "2.0", "id": request_id, "method": method, "params": params or {}}
+        self.writer.write(json.dumps(message).encode("utf-8") + b"\n")
+        await self.writer.drain()
+        return unwrap(await future)
+
+    async def calculate(self, expression: str) -> str:
+        """Evaluate one expression and return the formatted result"""
+        return await self.call("calculate", {"expression": expression})
+
+    async def calculate_many(self, expressions: List[str]) -> list:
+        """Evaluate a list of expressions server-side in one request"""
+        return await self.call("calculate_many", {"expressions": list(expressions)})
+
+    async def close(self):
+        """Close the connection"""
+        self.writer.close()
+        await self.writer.wait_closed()
+        if self.listener is not None:
+            await asyncio.gather(self.listener, return_exceptions=True)
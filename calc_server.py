@@ -0,0 +1,338 @@
+"""
+Calculator Server Module
+Asyncio JSON-RPC 2.0 evaluation service over a Unix socket or localhost TCP
+
+Requests are newline-delimited JSON objects (or JSON arrays for batches).
+Several requests may be pipelined on one connection; responses are written
+as soon as each one completes and are matched by id.
+
+Methods:
+    calculate        params {"expression": str}     -> result text
+    calculate_many   params {"expressions": [str]}  -> [{"value": text} | {"error": text}]
+    cache_info       no params                      -> compiled-expression cache counters
+    metrics          no params                      -> recorded timings (see metrics.py)
+
+Variables and functions defined with worksheet input ("rate = 0.07") are
+private to the connection that defined them.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import stat
+import sys
+from typing import List, Optional
+from calculator_logic import WORKSHEET_PATTERN, CalculatorLogic
+from evaluation_limits import BudgetExceededError, EvaluationLimits
+from metrics import metrics
+
+# JSON-RPC error codes
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+CALCULATION_ERROR = -32000
+BUDGET_EXCEEDED = -32001
+
+# Longest accepted request line, so large batches fit in one message
+MAX_LINE_BYTES = 64 * 1024 * 1024
+
+
+class CalculatorServer:
+    """JSON-RPC evaluation server wrapping CalculatorLogic
+
+    Small requests are evaluated inline on the event loop; the evaluation
+    budget keeps each one short. calculate_many calls with at least
+    pool_threshold expressions are split into chunks and spread over a
+    process pool so large batches use every core. max_inflight bounds
+    concurrently processed requests per connection and max_pool_jobs bounds
+    chunks queued on the pool; once either is reached the server stops
+    reading, which pushes back on clients through the socket.
+
+    Every connection evaluates with its own CalculatorLogic, so worksheet
+    variables are never shared between clients; the compiled expression
+    cache is shared. Batches containing worksheet input always run on the
+    connection's calculator, since pool workers cannot see its variables;
+    large ones run on a thread so the event loop keeps serving.
+    """
+
+    def __init__(self, mode: str = "float", precision: Optional[int] = None,
+                 processes: Optional[int] = None, pool_threshold: int = 256,
+                 chunk_size: int = 2048, max_inflight: int = 64, max_pool_jobs: int = None):
+        self.mode = mode
+        self.precision = precision
+        # Inline evaluations share the event loop, so keep their time budget short
+        self.logic = CalculatorLogic(mode=mode, precision=precision,
+                                     limits=EvaluationLimits(timeout=0.25))
+        self.processes = processes or os.cpu_count() or 1
+        self.pool_threshold = pool_threshold
+        self.chunk_size = chunk_size
+        self.max_inflight = max_inflight
+        self.max_pool_jobs = max_pool_jobs or self.processes * 2
+        self.pool_slots = None
+        self.executor = None
+        self.server = None
+        self.connections = set()
+
+    def create_session(self) -> CalculatorLogic:
+        """Calculator for one connection, sharing the compiled expression cache"""
+        logic = CalculatorLogic(mode=self.mode, precision=self.precision,
+                                limits=self.logic.limits)
+        logic.cache = self.logic.cache
+        return logic
+
+    async def start_unix(self, path: str):
+        """Listen on a Unix domain socket, replacing a stale socket file"""
+        try:
+            # Anything that is not a socket is left alone for bind to refuse
+            if stat.S_ISSOCK(os.lstat(path).st_mode):
+                os.unlink(path)
+        except FileNotFoundError:
+            pass
+        self.pool_slots = asyncio.Semaphore(self.max_pool_jobs)
+        self.server = await asyncio.start_unix_server(self.handle_connection, path,
+                                                      limit=MAX_LINE_BYTES)
+        return self.server
+
+    async def start_tcp(self, host: str = "127.0.0.1", port: int = 8765):
+        """Listen on a TCP port (localhost by default)"""
+        self.pool_slots = asyncio.Semaphore(self.max_pool_jobs)
+        self.server = await asyncio.start_server(self.handle_connection, host, port,
+                                                 limit=MAX_LINE_BYTES)
+        return self.server
+
+    async def close(self):
+        """Stop listening and shut down the process pool"""
+        if self.server is not None:
+            self.server.close()
+            # Closing the transports ends each handler's read loop
+            for writer in list(self.connections):
+                writer.close()
+            await self.server.wait_closed()
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+            self.executor = None
+
+    async def handle_connection(self, reader, writer):
+        """Serve pipelined requests from one client connection"""
+        inflight = asyncio.Semaphore(self.max_inflight)
+        write_lock = asyncio.Lock()
+        tasks = set()
+        logic = self.create_session()
+        self.connections.add(writer)
+
+        async def respond(line):
+            try:
+                response = await self.handle_message(line, logic)
+                if response is not None:
+                    async with write_lock:
+                        writer.write(json.dumps(response).encode("utf-8") + b"\n")
+                        await writer.drain()
+            except ConnectionError:
+                pass
+            finally:
+                inflight.release()
+
+        try:
+            while True:
+                await inflight.acquire()
+                try:
+                    line = await reader.readline()
+                except (ConnectionError, asyncio.LimitOverrunError, ValueError):
+                    inflight.release()
+                    break
+                if not line:
+                    inflight.release()
+                    break
+                if not line.strip():
+                    inflight.release()
+                    continue
+                task = asyncio.ensure_future(respond(line))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            self.connections.discard(writer)
+            writer.close()
+
+    async def handle_message(self, line: bytes, logic: CalculatorLogic = None):
+        """Decode one line and dispatch a single request or a batch"""
+        try:
+            message = json.loads(line)
+        except (json.JSONDecodeError, UnicodeDecodeError, RecursionError):
+            return error_response(None, PARSE_ERROR, "Parse error")
+
+        if isinstance(message, list):
+            if not message:
+                return error_response(None, INVALID_REQUEST, "Empty batch")
+            responses = await asyncio.gather(*(self.handle_request(r, logic) for r in message))
+            responses = [r for r in responses if r is not None]
+            return responses or None
+        return await self.handle_request(message, logic)
+
+    async def handle_request(self, request, logic: CalculatorLogic = None):
+        """Run one JSON-RPC request and build its response
+
+        logic is the calling connection's calculator, self.logic if None.
+        """
+        logic = logic or self.logic
+        if not isinstance(request, dict) or not isinstance(request.get("method"), str) \
+                or not isinstance(request.get("id"), (str, int, float, type(None))):
+            return error_response(None, INVALID_REQUEST, "Invalid request")
+        request_id = request.get("id")
+        is_notification = "id" not in request
+        params = request.get("params") or {}
+        method = request["method"]
+
+        try:
+            if method == "calculate":
+                expression = param(params, "expression", 0)
+                if not isinstance(expression, str):
+                    raise TypeError("expression must be a string")
+                result = self.calculate(expression, logic)
+            elif method == "calculate_many":
+                expressions = param(params, "expressions", 0)
+                if not isinstance(expressions, list) or \
+                        not all(isinstance(e, str) for e in expressions):
+                    raise TypeError("expressions must be a list of strings")
+                result = await self.calculate_many(expressions, logic)
+            elif method == "cache_info":
+                result = self.logic.cache_info()
+            elif method == "metrics":
+                result = metrics.snapshot()
+            else:
+                return None if is_notification else \
+                    error_response(request_id, METHOD_NOT_FOUND, "Method not found")
+        except (TypeError, KeyError, IndexError) as e:
+            response = error_response(request_id, INVALID_PARAMS, f"Invalid params: {e}")
+        except BudgetExceededError as e:
+            response = error_response(request_id, BUDGET_EXCEEDED, str(e))
+        except (ValueError, ZeroDivisionError) as e:
+            response = error_response(request_id, CALCULATION_ERROR, str(e))
+        else:
+            response = {"jsonrpc": "2.0", "id": request_id, "result": result}
+        return None if is_notification else response
+
+    def calculate(self, expression: str, logic: CalculatorLogic = None) -> str:
+        """Evaluate one expression inline and format the result"""
+        logic = logic or self.logic
+        return logic.format_result(logic.evaluate(expression))
+
+    async def calculate_many(self, expressions: List[str], logic: CalculatorLogic = None) -> list:
+        """Evaluate a batch inline, on a thread or on the process pool, preserving order"""
+        logic = logic or self.logic
+        if len(expressions) < self.pool_threshold:
+            return format_batch(logic, expressions)
+
+        loop = asyncio.get_running_loop()
+        if any(WORKSHEET_PATTERN.search(e) for e in expressions):
+            return await loop.run_in_executor(None, format_batch, logic, expressions)
+        if self.executor is None:
+            from concurrent.futures import ProcessPoolExecutor
+            self.executor = ProcessPoolExecutor(max_workers=self.processes)
+
+        # Spread the batch across workers, but keep chunks big enough to
+        # amortize the inter-process round trip
+        size = max(self.chunk_size // 8,
+                   min(self.chunk_size, -(-len(expressions) // self.processes)))
+        chunks = [expressions[i:i + size] for i in range(0, len(expressions), size)]
+
+        async def run_chunk(chunk):
+            async with self.pool_slots:
+                return await loop.run_in_executor(self.executor, evaluate_chunk,
+                                                  chunk, self.mode, self.precision)
+
+        results = []
+        for chunk_result in await asyncio.gather(*(run_chunk(c) for c in chunks)):
+            results.extend(chunk_result)
+        return results
+
+
+def param(params, name: str, position: int):
+    """Read a parameter passed by name or by position"""
+    if isinstance(params, dict):
+        return params[name]
+    return params[position]
+
+
+def error_response(request_id, code: int, message: str) -> dict:
+    """Build a JSON-RPC error response"""
+    return {"jsonrpc": "2.0", "id": request_id, "error": {"code": code, "message": message}}
+
+
+def format_batch(logic: CalculatorLogic, expressions: List[str]) -> list:
+    """Evaluate expressions and convert each outcome to a JSON-friendly dict"""
+    return [
+        {"error": str(r.error)} if r.error is not None
+        else {"value": logic.format_result(r.value)}
+        for r in logic.calculate_many(expressions)
+    ]
+
+
+# Per-process calculator used by pooled batch evaluation
+_worker_logic = None
+
+
+def evaluate_chunk(expressions: List[str], mode: str, precision: Optional[int]) -> list:
+    """Evaluate one chunk of a batch inside a pool worker"""
+    global _worker_logic
+    if _worker_logic is None or \
+            (_worker_logic.mode.name, _worker_logic.mode.precision) != (mode, precision):
+        _worker_logic = CalculatorLogic(mode=mode, precision=precision)
+    return format_batch(_worker_logic, expressions)
+
+
+def parse_address(address: str):
+    """Split "unix:/path" or "[tcp:]host:port" into (kind, target)"""
+    if address.startswith("unix:"):
+        return "unix", address[len("unix:"):]
+    if address.startswith("tcp:"):
+        address = address[len("tcp:"):]
+    host, _, port = address.rpartition(":")
+    return "tcp", (host or "127.0.0.1", int(port))
+
+
+async def serve(address: str, **options):
+    """Run a server on address until cancelled"""
+    server = CalculatorServer(**options)
+    kind, target = parse_address(address)
+    if kind == "unix":
+        await server.start_unix(target)
+    else:
+        await server.start_tcp(*target)
+    print(f"Calculator server listening on {address}", file=sys.stderr)
+    try:
+        await server.server.serve_forever()
+    finally:
+        await server.close()
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Create the command line parser for server mode"""
+    parser = argparse.ArgumentParser(description="Serve calculator evaluations over JSON-RPC")
+    parser.add_argument("--serve", dest="address", metavar="ADDRESS", default="127.0.0.1:8765",
+                        help="unix:/path/to.sock or [tcp:]host:port (default: 127.0.0.1:8765)")
+    parser.add_argument("--mode", choices=("float", "decimal", "fraction"), default="float",
+                        help="number domain used for evaluation (default: float)")
+    parser.add_argument("--precision", type=int, default=None,
+                        help="significant digits in decimal mode")
+    parser.add_argument("--processes", type=int, default=None,
+                        help="worker processes for large batches (default: CPU count)")
+    return parser
+
+
+def run(argv: Optional[List[str]] = None) -> int:
+    """Run the server from command line arguments"""
+    args = build_parser().parse_args(argv)
+    try:
+        asyncio.run(serve(args.address, mode=args.mode, precision=args.precision,
+                          processes=args.processes))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(run())
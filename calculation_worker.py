@@ -0,0 +1,111 @@
+"""
+Calculation Worker Module
+Runs expression evaluation on a Qt thread pool
+"""
+
+import threading
+from PySide6.QtCore import QObject, QRunnable, Signal
+
+class CalculationSignals(QObject):
+    """Signals a worker uses to report back to the GUI thread"""
+
+    # job id, expression, result value
+    finished = Signal(int, str, object)
+    # job id, expression, error message
+    failed = Signal(int, str, str)
+
+
+class CalculationWorker(QRunnable):
+    """Evaluates one expression off the GUI thread
+
+    Setting the cancel event (see cancel()) stops the evaluation at its
+    next operation; a cancelled job reports nothing.
+    """
+
+    def __init__(self, logic, job_id: int, expression: str):
+        super().__init__()
+        self.logic = logic
+        self.job_id = job_id
+        self.expression = expression
+        self.cancel_event = threading.Event()
+        self.signals = CalculationSignals()
+
+    def cancel(self):
+        """Ask the running evaluation to stop"""
+        self.cancel_event.set()
+
+    def run(self):
+        """Evaluate the expression and emit the outcome"""
+        try:
+            result = self.logic.evaluate(self.expression, self.cancel_event)
+        except Exception as e:
+            if not self.cancel_event.is_set():
+                self.signals.failed.emit(self.job_id, self.expression, str(e))
+            return
+        if not self.cancel_event.is_set():
+            self.signals.finished.emit(self.job_id, self.expression, result)
+
+
+class SweepSignals(QObject):
+    """Signals a sweep worker uses to report back to the GUI thread"""
+
+    # one sweep.SweepChunk
+    chunk = Signal(object)
+    # number of values evaluated
+    finished = Signal(int)
+    # error message
+    failed = Signal(str)
+
+
+class SweepWorker(QRunnable):
+    """Runs CalculatorLogic.sweep off the GUI thread, one signal per chunk"""
+
+    def __init__(self, logic, expression: str, values, variable: str = "x"):
+        super().__init__()
+        self.logic = logic
+        self.expression = expression
+        self.values = values
+        self.variable = variable
+        self.cancel_event = threading.Event()
+        self.signals = SweepSignals()
+
+    def cancel(self):
+        """Stop the sweep before its next chunk"""
+        self.cancel_event.set()
+
+    def run(self):
+        """Evaluate every chunk and emit it as it completes"""
+        count = 0
+        try:
+            for chunk in self.logic.sweep(self.expression, self.values, self.variable,
+                                          cancel=self.cancel_event):
+                if self.cancel_event.is_set():
+                    return
+                count += len(chunk.inputs)
+                self.signals.chunk.emit(chunk)
+        except Exception as e:
+            if not self.cancel_event.is_set():
+                self.signals.failed.emit(str(e))
+            return
+        if not self.cancel_event.is_set():
+            self.signals.finished.emit(count)
+
+
+class HistoryLoadSignals(QObject):
+    """Signals a history load worker uses to report back to the GUI thread"""
+
+    # the loaded HistoryStore
+    loaded = Signal(object)
+
+
+class HistoryLoadWorker(QRunnable):
+    """Reads the history files off the GUI thread for a deferred load"""
+
+    def __init__(self, history):
+        super().__init__()
+        self.history = history
+        self.signals = HistoryLoadSignals()
+
+    def run(self):
+        """Load the history and hand it to the GUI thread"""
+        self.signals.loaded.emit(self.history.load_history())
@@ -4,57 +4,293 @@ Handles all mathematical operations and calculations
 """
 
 import re
-from decimal import Decimal, InvalidOperation, getcontext
+from collections import deque, namedtuple
+from decimal import InvalidOperation
+from itertools import islice
+from time import perf_counter
+from typing import Iterable, Iterator, Optional
+from evaluation_limits import BudgetExceededError, EvaluationCancelled, EvaluationLimits
+from expression_parser import (ExpressionCache, IncrementalEvaluator, compile_expression,
+                               evaluate_guarded, evaluate_program)
+from metrics import metrics
+from numeric_modes import create_mode
+from worksheet import Worksheet
 
-# Set precision for decimal calculations
-getcontext().prec = 15
+# Outcome of one expression in a batch: value is None when error is set
+CalculationResult = namedtuple("CalculationResult", ["expression", "value", "error"])
+
+# Distinct expressions remembered per batch before the memo is reset
+BATCH_MEMO_SIZE = 4096
+
+# Characters that only occur in worksheet input (names, assignments, calls)
+WORKSHEET_PATTERN = re.compile(r"[A-Za-z_=,]")
+
+# Per-stage timings, recorded only while metrics are enabled
+STAGE_HELP = "Time spent in each calculation stage"
+VALIDATE_SECONDS = metrics.histogram("calculator_stage_seconds", STAGE_HELP, stage="validate")
+PARSE_SECONDS = metrics.histogram("calculator_stage_seconds", STAGE_HELP, stage="parse")
+EVALUATE_SECONDS = metrics.histogram("calculator_stage_seconds", STAGE_HELP, stage="evaluate")
+CACHE_HITS = metrics.counter("calculator_cache_lookups_total",
+                             "Compiled expression cache lookups", result="hit")
+CACHE_MISSES = metrics.counter("calculator_cache_lookups_total", result="miss")
+ERRORS = metrics.counter("calculator_errors_total", "Calculations that raised an error")
 
 class CalculatorLogic:
     """Core calculator logic and operations"""
     
-    def __init__(self):
+    def __init__(self, cache_size=256, mode="float", precision=None, limits=None,
+                 result_cache=None):
         self.current_expression = ""
         self.result = 0
         self.last_result = 0
+        self.cache = ExpressionCache(cache_size)
+        # Budgets for size, nesting and time; pass False to evaluate unguarded
+        self.limits = EvaluationLimits() if limits is None else (limits or None)
+        self.mode = create_mode(mode, precision)
+        self.preview_evaluator = IncrementalEvaluator(self.mode, self.limits)
+        # Variables and user functions, e.g. "rate = 0.07" or "f(x) = x * rate"
+        self.worksheet = Worksheet(self)
+        # Optional persistent result_cache.ResultCache shared across sessions
+        self.result_cache = None
+        if result_cache is not None:
+            self.use_result_cache(result_cache)
+    
+    def use_result_cache(self, result_cache):
+        """Start consulting a persistent result cache for the current mode"""
+        result_cache.set_settings(self.mode.name, self.mode.precision)
+        self.result_cache = result_cache
+    
+    def set_mode(self, mode, precision=None):
+        """Switch numeric mode ("float", "decimal" or "fraction")"""
+        self.mode = create_mode(mode, precision)
+        # Compiled programs hold literals of the previous number domain
+        self.cache.clear()
+        self.preview_evaluator = IncrementalEvaluator(self.mode, self.limits)
+        if self.result_cache is not None:
+            # Stored results were computed with the previous settings
+            self.result_cache.set_settings(self.mode.name, self.mode.precision)
+    
+    def format_result(self, value):
+        """Format a result of the current mode for display"""
+        if value is None:
+            # Function definitions have no value
+            return ""
+        return self.mode.format(value)
+    
+    def binary_operation(self, op, a, b, name):
+        """Apply one arithmetic operator in the current numeric mode"""
+        mode = self.mode
+        try:
+            a, b = mode.coerce(a), mode.coerce(b)
+        except (InvalidOperation, ValueError, TypeError):
+            raise ValueError(f"Invalid numbers for {name}")
+        with mode.evaluation_context():
+            return mode.finalize(mode.binary[op](a, b))
     
     def add(self, a, b):
         """Addition operation"""
-        try:
-            return float(Decimal(str(a)) + Decimal(str(b)))
-        except (InvalidOperation, ValueError):
-            raise ValueError("Invalid numbers for addition")
+        return self.binary_operation('+', a, b, "addition")
     
     def subtract(self, a, b):
         """Subtraction operation"""
-        try:
-            return float(Decimal(str(a)) - Decimal(str(b)))
-        except (InvalidOperation, ValueError):
-            raise ValueError("Invalid numbers for subtraction")
+        return self.binary_operation('-', a, b, "subtraction")
     
     def multiply(self, a, b):
         """Multiplication operation"""
-        try:
-            return float(Decimal(str(a)) * Decimal(str(b)))
-        except (InvalidOperation, ValueError):
-            raise ValueError("Invalid numbers for multiplication")
+        return self.binary_operation('*', a, b, "multiplication")
     
     def divide(self, a, b):
         """Division operation with zero check"""
         try:
-            if float(b) == 0:
-                raise ZeroDivisionError("Cannot divide by zero")
-            return float(Decimal(str(a)) / Decimal(str(b)))
-        except (InvalidOperation, ValueError):
-            raise ValueError("Invalid numbers for division")
+            return self.binary_operation('/', a, b, "division")
+        except ZeroDivisionError:
+            raise ZeroDivisionError("Cannot divide by zero")
     
-    def calculate(self, expression):
+    def calculate(self, expression, cancel=None):
         """Evaluate mathematical expression safely"""
+        try:
+            result = self.evaluate(expression, cancel)
+        except (ValueError, ZeroDivisionError):
+            if metrics.enabled:
+                ERRORS.inc()
+            raise
+        if result is not None:
+            self.last_result = result
+        return result
+    
+    def evaluate(self, expression, cancel=None):
+        """Evaluate an expression without touching calculator state
+        
+        cancel may be a threading.Event; setting it from another thread
+        aborts the evaluation with EvaluationCancelled. Input with names,
+        assignments or function definitions goes to the worksheet.
+        """
         if not expression or not expression.strip():
             return 0
         
         # Clean the expression
+        source = expression
         expression = expression.replace(' ', '')
         
+        # Reuse the compiled program for expressions we have seen before
+        program = self.cache.get(expression)
+        if program is None:
+            if metrics.enabled:
+                CACHE_MISSES.inc()
+            if WORKSHEET_PATTERN.search(expression):
+                # Programs bake in variable values, so they are never cached
+                return self.worksheet.execute(source, cancel)
+        elif metrics.enabled:
+            CACHE_HITS.inc()
+        
+        # Results of earlier sessions, keyed by the canonical expression
+        if self.result_cache is not None:
+            value = self.result_cache.get(expression)
+            if value is not None:
+                return value
+        if program is None:
+            program = self.compile_program(expression)
+            self.cache.put(expression, program)
+        
+        value = self.run_program(program, cancel)
+        if self.result_cache is not None:
+            self.result_cache.put(expression, value)
+        return value
+    
+    def run_program(self, program, cancel=None):
+        """Execute a compiled program and normalize its result"""
+        mode = self.mode
+        timed = metrics.enabled
+        if timed:
+            start = perf_counter()
+        try:
+            with mode.evaluation_context():
+                if self.limits is None:
+                    return mode.finalize(evaluate_program(program))
+                guard = self.limits.guard(mode, cancel)
+                return mode.finalize(evaluate_guarded(program, guard))
+            
+        except (BudgetExceededError, EvaluationCancelled):
+            raise
+        except ZeroDivisionError:
+            raise ZeroDivisionError("Cannot divide by zero")
+        except (ValueError, TypeError):
+            raise ValueError("Invalid expression")
+        except Exception:
+            raise ValueError("Calculation error")
+        finally:
+            if timed:
+                EVALUATE_SECONDS.observe(perf_counter() - start)
+    
+    def preview(self, expression):
+        """Evaluate a partially typed expression for a live result preview
+        
+        Returns None when there is nothing to show. Successive calls reuse
+        the parse state of the unchanged prefix of the expression.
+        """
+        mode = self.mode
+        with mode.evaluation_context():
+            value = self.preview_evaluator.update(expression)
+            if value is None:
+                return None
+            try:
+                return mode.finalize(value)
+            except (ValueError, ArithmeticError):
+                return None
+    
+    def calculate_many(self, expressions: Iterable[str], chunk_size: int = 1000,
+                       processes: Optional[int] = None) -> Iterator[CalculationResult]:
+        """Evaluate many expressions, yielding one result per input in order
+        
+        Errors are reported per item instead of being raised. When processes
+        is given, chunks of chunk_size expressions are evaluated on a process
+        pool with at most two chunks per worker in flight; worksheet
+        variables are then local to each worker process.
+        """
+        if processes is None:
+            return self._calculate_serial(expressions)
+        return self._calculate_pooled(expressions, chunk_size, processes)
+    
+    def _calculate_serial(self, expressions):
+        """Evaluate expressions in this process, sharing compiled programs"""
+        # Batch-local memo so repeated shapes skip the LRU bookkeeping and
+        # never thrash it when a batch has more distinct expressions than fit
+        programs = {}
+        compile_program = self.compile_program
+        run = self.run_program
+        for expression in expressions:
+            try:
+                if not expression or not expression.strip():
+                    value = 0
+                else:
+                    key = expression.replace(' ', '')
+                    program = programs.get(key)
+                    if program is not None:
+                        value = run(program)
+                    elif WORKSHEET_PATTERN.search(key):
+                        value = self.worksheet.execute(expression)
+                    else:
+                        if len(programs) >= BATCH_MEMO_SIZE:
+                            programs.clear()
+                        program = programs[key] = compile_program(key)
+                        value = run(program)
+                yield CalculationResult(expression, value, None)
+            except (ValueError, ZeroDivisionError) as e:
+                if metrics.enabled:
+                    ERRORS.inc()
+                yield CalculationResult(expression, None, e)
+    
+    def _calculate_pooled(self, expressions, chunk_size, processes):
+        """Evaluate chunks of expressions on a process pool"""
+        from concurrent.futures import ProcessPoolExecutor
+        
+        iterator = iter(expressions)
+        max_pending = max(1, processes) * 2
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            pending = deque()
+            while True:
+                while len(pending) < max_pending:
+                    chunk = list(islice(iterator, chunk_size))
+                    if not chunk:
+                        break
+                    pending.append(executor.submit(_calculate_chunk, chunk,
+                                                   self.mode.name, self.mode.precision))
+                if not pending:
+                    return
+                yield from pending.popleft().result()
+    
+    def compile(self, expression: str, params=None):
+        """Compile an expression into a callable taking variable values
+        
+        The result is a compiled_expression.CompiledExpression: constants
+        are folded and no-op operands dropped once, so each call only does
+        the remaining arithmetic. Names that are not worksheet variables
+        become parameters in order of appearance unless params lists them.
+        """
+        from compiled_expression import compile_closure
+        
+        return compile_closure(expression, self.mode, self.limits, self.worksheet, params)
+    
+    def sweep(self, expression: str, values, variable: str = "x", chunk_size: int = None,
+              vectorize: Optional[bool] = None, cancel=None):
+        """Evaluate expression over many values of one variable, in chunks
+        
+        values may be a sweep.SweepRange, a NumPy array or any iterable of
+        numbers. Yields sweep.SweepChunk tuples; float mode uses NumPy when
+        it is installed, otherwise values are evaluated one at a time.
+        """
+        # Imported lazily so NumPy is only loaded when a sweep runs
+        import sweep
+        
+        return sweep.sweep(self, expression, values, variable,
+                           chunk_size or sweep.DEFAULT_CHUNK_SIZE, vectorize, cancel)
+    
+    def compile_program(self, expression):
+        """Validate and compile an expression into a postfix program"""
+        timed = metrics.enabled
+        if timed:
+            start = perf_counter()
+        
         # Validate expression contains only allowed characters
         if not re.match(r'^[0-9+\-*/().]+$', expression):
             raise ValueError("Invalid characters in expression")
@@ -63,29 +299,21 @@ class CalculatorLogic:
         if expression.count('(') != expression.count(')'):
             raise ValueError("Unbalanced parentheses")
         
+        if timed:
+            now = perf_counter()
+            VALIDATE_SECONDS.observe(now - start)
+            start = now
         try:
-            # Safely evaluate the expression
-            # Using eval here is generally not recommended, but with proper validation it's acceptable
-            # In production, consider using a proper expression parser
-            result = eval(expression)
-            
-            # Handle division by zero and other math errors
-            if not isinstance(result, (int, float)) or str(result) in ['inf', '-inf', 'nan']:
-                raise ValueError("Invalid calculation result")
-            
-            # Round to avoid floating point precision issues
-            if isinstance(result, float):
-                result = round(result, 10)
-            
-            self.last_result = result
-            return result
-            
-        except ZeroDivisionError:
-            raise ZeroDivisionError("Cannot divide by zero")
-        except (ValueError, TypeError, SyntaxError):
-            raise ValueError("Invalid expression")
-        except Exception:
+            program = compile_expression(expression, self.mode, self.limits)
+        except RecursionError:
             raise ValueError("Calculation error")
+        if timed:
+            PARSE_SECONDS.observe(perf_counter() - start)
+        return program
+    
+    def cache_info(self):
+        """Return hit/miss statistics of the compiled expression cache"""
+        return self.cache.info()
     
     def clear(self):
         """Clear current calculation"""
@@ -104,3 +332,17 @@ class CalculatorLogic:
             return True
         except ValueError:
             return False
+
+
+# Per-process calculator used by pooled batch evaluation
+_worker_logic = None
+
+
+def _calculate_chunk(expressions, mode, precision):
+    """Evaluate one chunk of a batch inside a pool worker"""
+    global _worker_logic
+    if _worker_logic is None:
+        _worker_logic = CalculatorLogic(mode=mode, precision=precision)
+    elif (_worker_logic.mode.name, _worker_logic.mode.precision) != (mode, precision):
+        _worker_logic.set_mode(mode, precision)
+    return list(_worker_logic._calculate_serial(expressions))
@@ -3,27 +3,93 @@ Calculator UI Module
 Handles all user interface components and layouts
 """
 
+import os
 from PySide6.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, 
                                QHBoxLayout, QGridLayout, QPushButton, 
-                               QLineEdit, QTextEdit, QLabel, QSplitter)
-from PySide6.QtCore import Qt, Signal
+                               QLineEdit, QListView, QLabel, QSplitter,
+                               QAbstractItemView, QApplication)
+from PySide6.QtCore import Qt, Signal, QTimer, QThreadPool
 from PySide6.QtGui import QKeySequence, QShortcut, QFont
 from styles import LIGHT_THEME_STYLESHEET
 from calculator_logic import CalculatorLogic
 from history_manager import HistoryManager
+from history_index import parse_query
+from history_model import HistoryListModel, HistorySearchModel
+from input_buffer import InputBuffer
+from calculation_worker import CalculationWorker, HistoryLoadWorker
+from metrics import metrics
+from startup import startup
+
+# Timings recorded only while metrics are enabled
+UI_HELP = "Time spent handling UI events"
+DISPATCH_SECONDS = metrics.histogram("ui_event_seconds", UI_HELP, event="button")
+REFRESH_SECONDS = metrics.histogram("ui_event_seconds", UI_HELP, event="history_refresh")
 
 class CalculatorUI(QMainWindow):
     """Main calculator window class"""
     
+    # Quiet period after the last keystroke before the preview is refreshed
+    PREVIEW_DELAY_MS = 60
+    
     def __init__(self):
         super().__init__()
-        self.logic = CalculatorLogic()
-        self.history = HistoryManager()
-        self.current_input = ""
-        self.setup_ui()
-        self.apply_theme()
-        self.setup_keyboard_shortcuts()
-        self.load_history_display()
+        # Persist history on a background writer so "=" never waits on disk;
+        # the files are read on the pool once the window is up and shared
+        # with any other open calculator windows. The history view is
+        # virtualized, so the whole history is kept rather than the last 100
+        with startup.phase("history_init"):
+            self.history = HistoryManager(max_entries=0, write_behind=True, fsync="flush",
+                                          defer_load=True, shared=True, search_index=True)
+        self.history_watcher = None
+        with startup.phase("logic_init"):
+            self.logic = CalculatorLogic()
+        # Expression being typed; the display is rendered from it
+        self.input = InputBuffer()
+        # Evaluation runs on the pool; job ids let us drop stale results
+        self.thread_pool = QThreadPool.globalInstance()
+        self.job_id = 0
+        self.pending_job = None
+        self.painted = False
+        with startup.phase("setup_ui"):
+            self.setup_ui()
+        with startup.phase("theme"):
+            self.apply_theme()
+        # Everything else waits until the event loop has shown the window
+        QTimer.singleShot(0, self.finish_startup)
+    
+    def finish_startup(self):
+        """Work deferred until after the window is first shown"""
+        with startup.phase("shortcuts"):
+            self.setup_keyboard_shortcuts()
+        startup.mark("history_load_start")
+        worker = HistoryLoadWorker(self.history)
+        worker.signals.loaded.connect(self.on_history_loaded)
+        self.thread_pool.start(worker)
+        with startup.phase("result_cache"):
+            from result_cache import ResultCache, default_path
+            
+            # Results are reused across sessions from a cache beside the history
+            self.logic.use_result_cache(ResultCache(default_path(self.history.history_file)))
+    
+    def on_history_loaded(self, calculations):
+        """Install the history read by the load worker"""
+        with startup.phase("history_install"):
+            self.history.install_history(calculations)
+            self.load_history_display()
+            from history_watcher import HistoryWatcher
+            
+            # Pick up calculations other instances make from now on, and any
+            # they made while the history was being loaded
+            self.history_watcher = HistoryWatcher(self.history, self)
+            self.history.sync()
+        startup.finish()
+    
+    def paintEvent(self, event):
+        """Record the first paint for the startup report"""
+        if not self.painted:
+            self.painted = True
+            startup.mark("first_paint")
+        super().paintEvent(event)
     
     def setup_ui(self):
         """Initialize the user interface"""
@@ -56,6 +122,23 @@ class CalculatorUI(QMainWindow):
         self.display.setFont(font)
         self.display.setMinimumHeight(50)
         calc_layout.addWidget(self.display)
+        # Render the input at most once per event-loop pass, however many
+        # keys or pasted characters arrived since the last one
+        self.display_timer = QTimer(self)
+        self.display_timer.setSingleShot(True)
+        self.display_timer.setInterval(0)
+        self.display_timer.timeout.connect(self.refresh_display)
+        
+        # Live result preview, refreshed once typing pauses
+        self.preview = QLabel("")
+        self.preview.setProperty("class", "preview")
+        self.preview.setAlignment(Qt.AlignRight)
+        calc_layout.addWidget(self.preview)
+        self.preview_timer = QTimer(self)
+        self.preview_timer.setSingleShot(True)
+        self.preview_timer.setInterval(self.PREVIEW_DELAY_MS)
+        self.preview_timer.timeout.connect(self.update_preview)
+        self.display.textChanged.connect(self.schedule_preview)
         
         # Button grid
         self.create_button_grid(calc_layout)
@@ -67,16 +150,48 @@ class CalculatorUI(QMainWindow):
         history_label = QLabel("History:")
         history_layout.addWidget(history_label)
         
-        self.history_display = QTextEdit()
-        self.history_display.setReadOnly(True)
+        # Search as you type: the filter box swaps the list over to the
+        # matches from the history index, newest first
+        self.history_filter = QLineEdit()
+        self.history_filter.setPlaceholderText("Filter: text, =prefix or min..max")
+        self.history_filter.setClearButtonEnabled(True)
+        self.history_filter.textChanged.connect(self.filter_history)
+        history_layout.addWidget(self.history_filter)
+        self.search_model = HistorySearchModel(self)
+        # History changes re-run the filter once per event loop pass
+        self.filter_timer = QTimer(self)
+        self.filter_timer.setSingleShot(True)
+        self.filter_timer.setInterval(0)
+        self.filter_timer.timeout.connect(self.filter_history)
+        self.history.add_listener(self.schedule_filter)
+        
+        # Model/view list: rows are inserted incrementally and only the
+        # visible ones are laid out, whatever the history length
+        self.history_model = HistoryListModel(self.history, self)
+        self.history_display = QListView()
+        self.history_display.setModel(self.history_model)
+        self.history_display.setUniformItemSizes(True)
+        self.history_display.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.history_display.setSelectionMode(QAbstractItemView.SingleSelection)
         self.history_display.setMaximumHeight(150)
         history_layout.addWidget(self.history_display)
         
+        # Running totals, updated in constant time on every history change
+        self.stats_label = QLabel()
+        history_layout.addWidget(self.stats_label)
+        self.history.add_listener(self.update_statistics_display)
+        self.update_statistics_display()
+        
         # Clear history button
         clear_history_btn = QPushButton("Clear History")
         clear_history_btn.clicked.connect(self.clear_history)
         history_layout.addWidget(clear_history_btn)
         
+        # Evaluate an expression over a range of inputs
+        sweep_btn = QPushButton("Sweep…")
+        sweep_btn.clicked.connect(self.open_sweep_dialog)
+        history_layout.addWidget(sweep_btn)
+        
         # Add widgets to splitter
         splitter.addWidget(calc_widget)
         splitter.addWidget(history_widget)
@@ -109,6 +224,11 @@ class CalculatorUI(QMainWindow):
     
     def button_clicked(self, text):
         """Handle button click events"""
+        with metrics.time(DISPATCH_SECONDS):
+            self.dispatch_button(text)
+    
+    def dispatch_button(self, text):
+        """Route a button press to its handler"""
         if text.isdigit() or text == '.':
             self.handle_number_input(text)
         elif text in ['+', '-', '×', '÷']:
@@ -126,160 +246,134 @@ class CalculatorUI(QMainWindow):
     
     def handle_number_input(self, digit):
         """Handle number and decimal input"""
-        current = self.display.text()
-        
-        # If we're building an expression and the display ends with an operator
-        if self.current_input and current.strip() and current.strip()[-1] in ['×', '÷', '+', '-']:
-            # Start new number after operator
-            if digit == '.':
-                self.display.setText(current + ' 0.')
-            else:
-                self.display.setText(current + ' ' + digit)
-        # If we're continuing to build the current number
-        elif self.current_input and not current.endswith(('×', '÷', '+', '-')):
-            # Get the last part (current number being typed)
-            parts = current.split()
-            if parts:
-                last_part = parts[-1]
-                if digit == '.' and '.' in last_part:
-                    return  # Prevent multiple decimals in same number
-            self.display.setText(current + digit)
-        else:
-            # Normal number input behavior (starting fresh)
-            if current == "0" or current == "Error":
-                self.display.setText(digit)
-            else:
-                if digit == '.' and '.' in current:
-                    return  # Prevent multiple decimals
-                self.display.setText(current + digit)
+        self.input.digit(digit)
+        self.schedule_display()
     
     def handle_operator_input(self, operator):
         """Handle operator input"""
-        current = self.display.text().strip()
-        if current == "Error" or not current:
-            return
-        
         # Convert display operator to internal operator
         op_map = {'×': '*', '÷': '/'}
-        internal_op = op_map.get(operator, operator)
-        
-        # If there's already a current input, we're chaining operations
-        if self.current_input:
-            # If the display already shows an expression, use it as is
-            if any(op in current for op in ['×', '÷', '+', '-']):
-                # Update the expression with new operator
-                self.current_input = current.replace('×', '*').replace('÷', '/') + ' ' + internal_op + ' '
-            else:
-                # Add the current number and new operator
-                self.current_input += current + ' ' + internal_op + ' '
-        else:
-            # Start new expression
-            self.current_input = current + ' ' + internal_op + ' '
-        
-        # Show the building expression in display (with display operators)
-        display_expr = self.current_input.replace('*', '×').replace('/', '÷')
-        self.display.setText(display_expr)
+        self.input.operator(op_map.get(operator, operator))
+        self.schedule_display()
+    
+    def handle_paste(self):
+        """Append the clipboard expression to the input in one pass"""
+        try:
+            self.input.paste(QApplication.clipboard().text())
+        except ValueError:
+            self.preview.setText("Cannot paste: not an expression")
+            return
+        self.schedule_display()
+    
+    def schedule_display(self):
+        """Refresh the display once control returns to the event loop"""
+        if not self.display_timer.isActive():
+            self.display_timer.start()
+    
+    def refresh_display(self):
+        """Render the input buffer into the display"""
+        self.display.setText(self.input.text())
     
     def handle_equals(self):
         """Handle equals button press - THIS IS WHERE WE CLEAR"""
-        current = self.display.text().strip()
-        if current == "Error" or not current:
+        if self.input.is_empty():
             return
+        expression = self.input.expression()
         
-        # Determine the complete expression
-        if self.current_input:
-            # If we have a pending operation
-            if any(op in current for op in ['×', '÷', '+', '-']):
-                # The display already contains the full expression
-                expression = current.replace('×', '*').replace('÷', '/')
-            else:
-                # Current display is just the last number
-                expression = self.current_input + current
-        else:
-            # No pending operation, just evaluate what's shown
-            expression = current.replace('×', '*').replace('÷', '/')
-        
-        if not expression.strip():
+        # Evaluate on a worker so slow expressions never freeze the window
+        self.cancel_calculation()
+        self.job_id += 1
+        worker = CalculationWorker(self.logic, self.job_id, expression)
+        worker.signals.finished.connect(self.on_calculation_finished)
+        worker.signals.failed.connect(self.on_calculation_failed)
+        # Remember the input version: any edit before the result arrives
+        # means the user has moved on and the result is discarded
+        self.pending_job = (self.job_id, worker.cancel_event, self.input.version)
+        self.preview_timer.stop()
+        self.preview.setText("computing…")
+        self.thread_pool.start(worker)
+    
+    def is_current_job(self, job_id):
+        """Check that a worker result still belongs to what is on screen"""
+        if self.pending_job is None or self.pending_job[0] != job_id:
+            return False
+        return self.input.version == self.pending_job[2]
+    
+    def on_calculation_finished(self, job_id, expression, result):
+        """Show a worker result unless it has gone stale"""
+        if not self.is_current_job(job_id):
             return
-        
+        self.pending_job = None
         try:
-            result = self.logic.calculate(expression)
-            
-            # Add to history before clearing
-            display_expr = expression.replace('*', '×').replace('/', '÷')
-            self.history.add_calculation(display_expr, str(result))
-            self.update_history_display()
-            
-            # NOW we clear and show only result
-            self.display.setText(str(result))
-            self.current_input = ""
-            
-        except Exception as e:
-            self.display.setText("Error")
-            self.current_input = ""
+            result_text = self.logic.format_result(result)
+        except ValueError:
+            self.input.set_error()
+            self.schedule_display()
+            return
+        self.logic.last_result = result
+        
+        # Add to history before clearing
+        display_expr = expression.replace('*', '×').replace('/', '÷')
+        self.history.add_calculation(display_expr, result_text)
+        self.update_history_display()
+        
+        # NOW we clear and show only result
+        self.input.set_result(result_text)
+        self.schedule_display()
+    
+    def on_calculation_failed(self, job_id, expression, message):
+        """Show an error for a failed worker result unless it has gone stale"""
+        if not self.is_current_job(job_id):
+            return
+        self.pending_job = None
+        self.input.set_error()
+        self.schedule_display()
+    
+    def cancel_calculation(self):
+        """Cancel the in-flight calculation, if any"""
+        if self.pending_job is not None:
+            self.pending_job[1].set()
+            self.pending_job = None
+            self.preview.setText("")
+    
+    def schedule_preview(self):
+        """Restart the preview debounce timer after a display change"""
+        # Restarting an active single-shot timer coalesces bursts of input
+        self.preview_timer.start()
+    
+    def update_preview(self):
+        """Show the running result of the expression being typed"""
+        result = None
+        if not self.input.is_empty():
+            result = self.logic.preview(self.input.expression())
+        if result is None:
+            self.preview.setText("")
+            return
+        result_text = self.logic.format_result(result)
+        # Nothing to preview when the display already shows just that number
+        self.preview.setText("" if self.input.tokens == [result_text] else f"= {result_text}")
     
     def handle_clear(self):
         """Clear everything"""
-        self.display.setText("0")
-        self.current_input = ""
+        self.cancel_calculation()
+        self.input.clear()
+        self.schedule_display()
         self.logic.clear()
     
     def handle_clear_entry(self):
         """Clear current entry only"""
-        current = self.display.text().strip()
-        
-        if self.current_input:
-            # If we're in the middle of building an expression
-            # Just reset to show the pending operation
-            display_expr = self.current_input.replace('*', '×').replace('/', '÷')
-            self.display.setText(display_expr.rstrip())
-        else:
-            # Just clear the display
-            self.display.setText("0")
+        self.input.clear_entry()
+        self.schedule_display()
     
     def handle_backspace(self):
         """Remove last character"""
-        current = self.display.text()
-        if current == "Error" or current == "0":
-            return
-        
-        if len(current) <= 1:
-            self.display.setText("0")
-            self.current_input = ""
-        else:
-            new_text = current[:-1].rstrip()
-            if not new_text:
-                self.display.setText("0")
-                self.current_input = ""
-            else:
-                self.display.setText(new_text)
-                # Update current_input if we're modifying it
-                if self.current_input:
-                    self.current_input = new_text.replace('×', '*').replace('÷', '/') + ' '
+        self.input.backspace()
+        self.schedule_display()
     
     def handle_sign_change(self):
         """Change sign of current number"""
-        current = self.display.text().strip()
-        if current == "Error" or not current:
-            return
-        
-        # If we're in the middle of an expression
-        if self.current_input and any(op in current for op in ['×', '÷', '+', '-']):
-            # Find the last number and change its sign
-            parts = current.split()
-            if parts and parts[-1].replace('-', '').replace('.', '').isdigit():
-                last_num = parts[-1]
-                if last_num.startswith('-'):
-                    parts[-1] = last_num[1:]
-                else:
-                    parts[-1] = '-' + last_num
-                self.display.setText(' '.join(parts))
-        else:
-            # Simple case - just the number on display
-            if current.startswith('-'):
-                self.display.setText(current[1:])
-            else:
-                self.display.setText('-' + current)
+        self.input.negate()
+        self.schedule_display()
     
     def setup_keyboard_shortcuts(self):
         """Setup keyboard mappings"""
@@ -299,6 +393,7 @@ class CalculatorUI(QMainWindow):
         QShortcut(QKeySequence(Qt.Key_Return), self).activated.connect(self.handle_equals)
         QShortcut(QKeySequence(Qt.Key_Enter), self).activated.connect(self.handle_equals)
         QShortcut(QKeySequence(Qt.Key_Escape), self).activated.connect(self.handle_clear)
+        QShortcut(QKeySequence.Paste, self).activated.connect(self.handle_paste)
         QShortcut(QKeySequence(Qt.Key_Backspace), self).activated.connect(self.handle_backspace)
     
     def apply_theme(self):
@@ -307,18 +402,72 @@ class CalculatorUI(QMainWindow):
     
     def load_history_display(self):
         """Load and display calculation history"""
-        history = self.history.get_history()
         self.update_history_display()
     
     def update_history_display(self):
-        """Update the history display"""
-        history = self.history.get_history()
-        history_text = ""
-        for calc in history[-10:]:  # Show last 10 calculations
-            history_text += f"{calc['expression']} = {calc['result']}\n"
-        self.history_display.setText(history_text)
+        """Scroll the history view to the latest calculation"""
+        with metrics.time(REFRESH_SECONDS):
+            if self.history_display.model() is self.history_model:
+                self.history_display.scrollToBottom()
+    
+    def filter_history(self, text=None):
+        """Show the calculations matching the filter box, or all of them"""
+        text = self.history_filter.text().strip()
+        if not text:
+            if self.history_display.model() is not self.history_model:
+                self.search_model.set_results(None)
+                self.history_display.setModel(self.history_model)
+                self.history_display.scrollToBottom()
+            return
+        self.search_model.set_results(self.history.query_history(**parse_query(text)))
+        if self.history_display.model() is not self.search_model:
+            self.history_display.setModel(self.search_model)
+    
+    def schedule_filter(self, event=None, payload=None):
+        """Re-run an active filter after the history changes"""
+        if self.history_filter.text().strip() and not self.filter_timer.isActive():
+            self.filter_timer.start()
+    
+    def update_statistics_display(self, event=None, payload=None):
+        """Show running totals of the history and of this session"""
+        history = self.history.get_statistics()
+        session = self.history.get_statistics("session")
+        if history.count:
+            text = (f"History: {history.count} results, sum {history.total:.10g}, "
+                    f"mean {history.mean:.10g}, min {history.minimum:.10g}, "
+                    f"max {history.maximum:.10g}")
+        else:
+            text = "History: no numeric results"
+        self.stats_label.setText(f"{text}\nSession: {session.count} results, "
+                                 f"sum {session.total:.10g}")
+    
+    def closeEvent(self, event):
+        """Flush pending history writes before the window closes"""
+        self.cancel_calculation()
+        self.thread_pool.waitForDone()
+        if self.history_watcher is not None:
+            self.history_watcher.stop()
+        self.history.remove_listener(self.update_statistics_display)
+        self.history.remove_listener(self.schedule_filter)
+        self.history_model.detach()
+        self.history.close()
+        if self.logic.result_cache is not None:
+            self.logic.result_cache.close()
+        # Leave a metrics dump behind when asked to
+        metrics_file = os.environ.get("CALCULATOR_METRICS_FILE")
+        if metrics.enabled and metrics_file:
+            metrics.dump(metrics_file)
+        super().closeEvent(event)
     
     def clear_history(self):
         """Clear calculation history"""
         self.history.clear_history()
-        self.history_display.clear()
+    
+    def open_sweep_dialog(self):
+        """Open the sweep dialog seeded with the expression on screen"""
+        from sweep_dialog import SweepDialog
+        
+        expression = "" if self.input.is_empty() else self.input.expression()
+        dialog = SweepDialog(self.logic, self.thread_pool, expression, self)
+        dialog.setAttribute(Qt.WA_DeleteOnClose)
+        dialog.show()
@@ -0,0 +1,443 @@
+"""
+Compiled Expression Module
+Turns an expression into a reusable callable for repeated evaluation
+
+The AST is simplified once (constant folding, identity and dead operand
+elimination) and then built into nested closures that read variable
+values from the argument tuple, so each call runs only the arithmetic
+that is left, without tokenizing, validating or stack handling. Too
+deeply nested expressions run as a postfix program instead.
+"""
+
+from collections import namedtuple
+from contextlib import nullcontext
+from operator import itemgetter
+from typing import Dict, Iterable, List, Optional, Sequence
+from evaluation_limits import BudgetExceededError, EvaluationCancelled
+from expression_parser import (DEFAULT_MAX_DEPTH, MAX_CALL_DEPTH, PUSH, BinaryOp, Call, Name,
+                               Number, UnaryOp, compile_ast, evaluate_guarded,
+                               evaluate_program, parse, substitute)
+
+# One built node: func(args) computes it, or func is None and value is a
+# folded constant. index is the parameter position for bare variables,
+# safe means evaluating the node can never raise, and depth is how many
+# closures a call nests.
+Code = namedtuple("Code", ["func", "value", "index", "safe", "depth"], defaults=[0])
+
+# Closure nesting above which an expression runs as a postfix program
+# instead, so calls stay well below the recursion limit
+MAX_CLOSURE_DEPTH = 200
+
+# Operators that never raise on numbers of any mode
+SAFE_OPERATORS = frozenset(('+', '-', '*'))
+
+
+def free_names(node) -> List[str]:
+    """Variable names in an AST, in order of first appearance"""
+    names = []
+    stack = [node]
+    while stack:
+        current = stack.pop()
+        if isinstance(current, Name):
+            if current.id not in names:
+                names.append(current.id)
+        elif isinstance(current, Call):
+            stack.extend(reversed(current.args))
+        elif isinstance(current, UnaryOp):
+            stack.append(current.operand)
+        elif isinstance(current, BinaryOp):
+            stack.append(current.right)
+            stack.append(current.left)
+    return names
+
+
+def exact_type(mode):
+    """Type whose values are exact in mode and need no finalizing, or None
+
+    Float mode ints and fraction mode Fractions come out of the operators
+    already valid; Decimals still need rounding to the mode's context.
+    """
+    if mode.name == "float":
+        return int
+    if mode.name == "fraction":
+        return type(mode.literal("1"))
+    return None
+
+
+def translate_errors(error: Exception) -> Exception:
+    """Map a raw arithmetic error to the one CalculatorLogic.calculate raises"""
+    if isinstance(error, (BudgetExceededError, EvaluationCancelled)):
+        return error
+    if isinstance(error, ZeroDivisionError):
+        return ZeroDivisionError("Cannot divide by zero")
+    if isinstance(error, (ValueError, TypeError)):
+        return ValueError("Invalid expression")
+    return ValueError("Calculation error")
+
+
+class CompiledExpression:
+    """Callable form of one expression with named parameters
+
+    Call it with values for params positionally or by keyword:
+    f = logic.compile("x * rate + y"); f(2, 3) or f(x=2, y=3). Worksheet
+    variables and functions are captured when the expression is compiled.
+    Results and errors match CalculatorLogic.calculate in the numeric mode
+    the expression was compiled for.
+    """
+
+    def __init__(self, expression: str, params: Sequence[str], code: Code, mode):
+        self.expression = expression
+        self.params = tuple(params)
+        self.mode = mode
+        self._positions = {name: i for i, name in enumerate(self.params)}
+        self._function = code.func
+        self._coerce = mode.coerce
+        self._finalize = mode.finalize
+        # Values of these types are passed through without coercing
+        self._native = frozenset((type(mode.literal("1")), type(mode.literal("0.5"))))
+        self._exact = exact_type(mode)
+        # Decimal arithmetic has to run inside the mode's context
+        self._context = mode.evaluation_context if mode.name == "decimal" else None
+        self._arity = len(self.params)
+        self._result = None
+        if code.func is None:
+            try:
+                with mode.evaluation_context():
+                    self._result = mode.finalize(code.value)
+            except Exception as e:
+                raise translate_errors(e) from None
+
+    @property
+    def is_constant(self) -> bool:
+        """True when the expression folded to a single value"""
+        return self._function is None
+
+    def __call__(self, *args, **bindings):
+        if bindings or len(args) != self._arity:
+            args = self.bind(args, bindings)
+        function = self._function
+        if function is None:
+            return self._result
+        native = self._native
+        for value in args:
+            if type(value) not in native:
+                args = tuple(map(self._coerce, args))
+                break
+        try:
+            if self._context is None:
+                result = function(args)
+                if type(result) is self._exact:
+                    return result
+                return self._finalize(result)
+            with self._context():
+                return self._finalize(function(args))
+        except Exception as e:
+            raise translate_errors(e) from None
+
+    def bind(self, args: tuple, bindings: Dict) -> tuple:
+        """Order positional and keyword values by parameter"""
+        if len(args) > len(self.params):
+            raise ValueError(f"Expected {len(self.params)} values, got {len(args)}")
+        values = list(args) + [None] * (len(self.params) - len(args))
+        for name, value in bindings.items():
+            position = self._positions.get(name)
+            if position is None:
+                raise ValueError(f"Unknown variable: {name}")
+            if position < len(args):
+                raise ValueError(f"Variable bound twice: {name}")
+            values[position] = value
+        missing = [name for name, value in zip(self.params, values) if value is None]
+        if missing:
+            raise ValueError(f"Undefined variable: {missing[0]}")
+        return tuple(values)
+
+    def many(self, rows: Iterable[Sequence]) -> List:
+        """Evaluate once per row of positional values"""
+        return [self(*row) for row in rows]
+
+    def __repr__(self):
+        return f"CompiledExpression({self.expression!r}, params={self.params})"
+
+
+class ClosureBuilder:
+    """Builds the closure tree for one expression in one numeric mode"""
+
+    def __init__(self, mode, limits=None, worksheet=None, params: Sequence[str] = ()):
+        self.mode = mode
+        self.limits = limits
+        self.worksheet = worksheet
+        self.positions = {name: i for i, name in enumerate(params)}
+        self.binary = mode.binary
+        self.unary = mode.unary
+        # Guard used only for its size estimates, never its deadline
+        self.guard = limits.guard(mode) if limits is not None else None
+        self.nodes = 0
+        # Identities that hold exactly for every value of the mode; Decimal
+        # operations round to the context, so nothing is dropped there
+        self.exact = exact_type(mode)
+
+    def build(self, node, calls: int = 0) -> Code:
+        """Build the closure for node, folding what can be computed now
+
+        The AST is walked post-order with an explicit stack; operators are
+        pushed back with calls set to None and built from the Codes of
+        their operands once those are done.
+        """
+        built = []
+        stack = [(node, calls)]
+        while stack:
+            current, calls = stack.pop()
+            if calls is None:
+                if isinstance(current, UnaryOp):
+                    built.append(self.build_unary(current.op, built.pop()))
+                else:
+                    right = built.pop()
+                    built.append(self.build_binary(current.op, built.pop(), right))
+                continue
+            self.nodes += 1
+            if self.limits is not None and self.nodes > self.limits.max_operations:
+                raise BudgetExceededError("Expression too long")
+            if isinstance(current, Number):
+                if self.limits is not None:
+                    self.limits.check_literal(current.text)
+                built.append(Code(None, self.mode.literal(current.text), None, True))
+            elif isinstance(current, Name):
+                built.append(self.build_name(current.id))
+            elif isinstance(current, Call):
+                if self.worksheet is None:
+                    raise ValueError(f"Undefined function: {current.name}")
+                params, body = self.worksheet.function(current.name)
+                if len(params) != len(current.args):
+                    raise ValueError(f"{current.name}() takes {len(params)} arguments")
+                if calls >= MAX_CALL_DEPTH:
+                    raise BudgetExceededError("Function calls nested too deeply")
+                stack.append((substitute(body, dict(zip(params, current.args))), calls + 1))
+            elif isinstance(current, UnaryOp):
+                # Signs: +x is dropped and -(-x) cancels out, except in Decimal mode
+                if self.exact is not None and current.op == '+':
+                    stack.append((current.operand, calls))
+                elif self.exact is not None and isinstance(current.operand, UnaryOp) \
+                        and current.operand.op == '-':
+                    self.nodes += 1
+                    stack.append((current.operand.operand, calls))
+                else:
+                    stack.append((current, None))
+                    stack.append((current.operand, calls))
+            else:
+                stack.append((current, None))
+                stack.append((current.right, calls))
+                stack.append((current.left, calls))
+        return built[-1]
+
+    def build_name(self, name: str) -> Code:
+        """Parameter read, or the current value of a worksheet variable"""
+        position = self.positions.get(name)
+        if position is not None:
+            return Code(itemgetter(position), None, position, True)
+        if self.worksheet is None:
+            raise ValueError(f"Undefined variable: {name}")
+        return Code(None, self.worksheet.lookup(name), None, True)
+
+    def build_unary(self, op: str, operand: Code) -> Code:
+        """Apply a sign to a built operand"""
+        negate = self.unary[op]
+        if operand.func is None:
+            try:
+                return Code(None, negate(operand.value), None, True)
+            except Exception as e:
+                raise translate_errors(e) from None
+        func = operand.func
+        if operand.index is not None:
+            index = operand.index
+            return Code(lambda args: negate(args[index]), None, None, operand.safe, 1)
+        return Code(lambda args: negate(func(args)), None, None, operand.safe,
+                    operand.depth + 1)
+
+    def build_binary(self, op: str, left: Code, right: Code) -> Code:
+        """Fold, simplify or specialize one binary operation"""
+        func = self.binary[op]
+        check = self.size_check(op)
+        if check is not None:
+            unchecked = func
+
+            def func(a, b):
+                check(a, b)
+                return unchecked(a, b)
+
+        if left.func is None and right.func is None:
+            try:
+                return Code(None, func(left.value, right.value), None, True)
+            except Exception as e:
+                raise translate_errors(e) from None
+        simplified = self.simplify(op, left, right)
+        if simplified is not None:
+            return simplified
+
+        safe = op in SAFE_OPERATORS and left.safe and right.safe
+        # A checked operator adds the wrapper's frame to every call
+        depth = max(left.depth, right.depth) + (2 if check is not None else 1)
+        f, g = left.func, right.func
+        i, j = left.index, right.index
+        if g is None:
+            c = right.value
+            if i is not None:
+                return Code(lambda args: func(args[i], c), None, None, safe, depth)
+            return Code(lambda args: func(f(args), c), None, None, safe, depth)
+        if f is None:
+            c = left.value
+            if j is not None:
+                return Code(lambda args: func(c, args[j]), None, None, safe, depth)
+            return Code(lambda args: func(c, g(args)), None, None, safe, depth)
+        if i is not None and j is not None:
+            return Code(lambda args: func(args[i], args[j]), None, None, safe, depth)
+        return Code(lambda args: func(f(args), g(args)), None, None, safe, depth)
+
+    def size_check(self, op: str):
+        """The guard's digit budget check for op, as calculate() applies it"""
+        if self.guard is None:
+            return None
+        if op == '**':
+            return self.guard.check_power
+        if op == '*' or self.mode.name == "fraction":
+            return self.guard.check_size
+        return None
+
+    def simplify(self, op: str, left: Code, right: Code) -> Optional[Code]:
+        """Drop operands that cannot change the result
+
+        x - 0, x * 1, 1 * x and x ** 1 hold for every number; x + 0 and
+        x / 1 only where there is no negative zero or int/float promotion.
+        x * 0 folds to 0 in fraction mode when x can never raise.
+        """
+        exact = self.exact
+        if exact is None:
+            return None
+        if right.func is None and type(right.value) is exact:
+            c = right.value
+            if (c == 0 and op == '-') or (c == 1 and op in ('*', '**')):
+                return left
+            if self.mode.name == "fraction":
+                if (c == 0 and op == '+') or (c == 1 and op == '/'):
+                    return left
+                if c == 0 and op == '*' and left.safe:
+                    return right
+        if left.func is None and type(left.value) is exact:
+            c = left.value
+            if c == 1 and op == '*':
+                return right
+            if self.mode.name == "fraction":
+                if c == 0 and op == '+':
+                    return right
+                if c == 0 and op == '*' and right.safe:
+                    return left
+        return None
+
+
+def compile_closure(expression: str, mode, limits=None, worksheet=None,
+                    params: Optional[Sequence[str]] = None) -> CompiledExpression:
+    """Parse, simplify and build a CompiledExpression
+
+    Without params, every name that is not a worksheet variable becomes a
+    parameter, in order of first appearance.
+    """
+    max_depth = limits.max_depth if limits is not None else DEFAULT_MAX_DEPTH
+    node = parse(expression.strip(), max_depth)
+    with worksheet._lock if worksheet is not None else nullcontext():
+        if worksheet is not None:
+            worksheet.check_mode()
+        if params is None:
+            params = [name for name in free_names_expanded(node, worksheet)
+                      if worksheet is None or not worksheet.is_variable(name)]
+        builder = ClosureBuilder(mode, limits, worksheet, params)
+        try:
+            with mode.evaluation_context():
+                code = builder.build(node)
+                if code.depth > MAX_CLOSURE_DEPTH:
+                    code = Code(program_function(node, mode, limits, worksheet, params),
+                                None, None, False)
+        except RecursionError:
+            raise ValueError("Calculation error")
+    return CompiledExpression(expression, params, code, mode)
+
+
+class ParameterScope:
+    """Name resolution for program_function: parameters become markers"""
+
+    def __init__(self, worksheet, markers: Dict):
+        self.worksheet = worksheet
+        self.markers = markers
+
+    def lookup(self, name: str):
+        """Marker for a parameter, or the value of a worksheet variable"""
+        if name in self.markers:
+            return self.markers[name]
+        if self.worksheet is None:
+            raise ValueError(f"Undefined variable: {name}")
+        return self.worksheet.lookup(name)
+
+    def function(self, name: str):
+        """Parameters and body of a worksheet function"""
+        if self.worksheet is None:
+            raise ValueError(f"Undefined function: {name}")
+        return self.worksheet.function(name)
+
+
+def program_function(node, mode, limits, worksheet, params: Sequence[str]):
+    """Function of the argument tuple that runs node as a postfix program
+
+    Used where the closures would nest too deeply to call. Each call
+    patches the arguments into a copy of the program and evaluates it the
+    way calculate() does, with a fresh guard.
+    """
+    markers = {name: object() for name in params}
+    program = compile_ast(node, mode, limits, ParameterScope(worksheet, markers))
+    positions = {id(marker): i for i, marker in enumerate(markers.values())}
+    slots = [(position, positions[id(arg)]) for position, (opcode, arg) in enumerate(program)
+             if opcode == PUSH and id(arg) in positions]
+
+    def function(args):
+        run = list(program)
+        for position, index in slots:
+            run[position] = (PUSH, args[index])
+        if limits is None:
+            return evaluate_program(run)
+        return evaluate_guarded(run, limits.guard(mode))
+
+    return function
+
+
+def free_names_expanded(node, worksheet=None) -> List[str]:
+    """Variable names in node after inlining worksheet functions"""
+    if worksheet is None:
+        return free_names(node)
+    names = []
+    pending = [(node, 0)]
+    while pending:
+        current, calls = pending.pop(0)
+        for name in free_names(current):
+            if name not in names:
+                names.append(name)
+        for call in calls_in(current):
+            if calls >= MAX_CALL_DEPTH:
+                raise BudgetExceededError("Function calls nested too deeply")
+            params, body = worksheet.function(call.name)
+            if len(params) != len(call.args):
+                raise ValueError(f"{call.name}() takes {len(params)} arguments")
+            pending.append((substitute(body, dict(zip(params, call.args))), calls + 1))
+    return names
+
+
+def calls_in(node) -> List:
+    """Call nodes in an AST, outermost first"""
+    calls = []
+    stack = [node]
+    while stack:
+        current = stack.pop()
+        if isinstance(current, Call):
+            calls.append(current)
+        elif isinstance(current, UnaryOp):
+            stack.append(current.operand)
+        elif isinstance(current, BinaryOp):
+            stack.append(current.right)
+            stack.append(current.left)
+    return calls
@@ -0,0 +1,131 @@
+"""
+Evaluation Limits Module
+Time, size and nesting budgets that keep pathological expressions in check
+"""
+
+import math
+import time
+from decimal import Decimal
+from fractions import Fraction
+
+# Python refuses to convert ints above 4300 digits to text by default,
+# so results larger than that could not be displayed anyway
+DEFAULT_MAX_DIGITS = 4000
+
+
+class BudgetExceededError(ValueError):
+    """Raised when an expression would exceed an evaluation limit"""
+
+
+class EvaluationCancelled(ValueError):
+    """Raised when an evaluation is cancelled before it finishes"""
+
+    def __init__(self, message: str = "Calculation cancelled"):
+        super().__init__(message)
+
+
+class EvaluationLimits:
+    """Configurable evaluation budget
+
+    max_digits bounds the estimated size of every exact intermediate value
+    (literals, products, powers), max_exponent bounds the absolute value of
+    any exponent, max_depth bounds parenthesis and sign nesting, and
+    max_operations bounds the compiled program length. timeout is the
+    wall-clock budget in seconds for one evaluation; None disables it.
+    """
+
+    def __init__(self, max_digits: int = DEFAULT_MAX_DIGITS, max_exponent: int = 1000000,
+                 max_depth: int = 100, max_operations: int = 100000,
+                 timeout: float = 2.0):
+        self.max_digits = max_digits
+        self.max_exponent = max_exponent
+        self.max_depth = max_depth
+        self.max_operations = max_operations
+        self.timeout = timeout
+
+    def check_literal(self, text: str):
+        """Reject number literals longer than the digit budget"""
+        if len(text) > self.max_digits:
+            raise BudgetExceededError("Number too large")
+
+    def check_program(self, program: tuple):
+        """Reject programs whose instruction count exceeds the budget"""
+        if len(program) > self.max_operations:
+            raise BudgetExceededError("Expression too long")
+
+    def guard(self, mode=None, cancel=None) -> "EvaluationGuard":
+        """Create a guard for one evaluation in the given numeric mode"""
+        return EvaluationGuard(self, mode, cancel)
+
+
+class EvaluationGuard:
+    """Budget enforcement for a single evaluation
+
+    before_binary is called ahead of every binary operation. It checks
+    cancellation and the deadline, and estimates the size of products and
+    powers, and of every Fraction result, from their operands so that work
+    which cannot fit the budget is refused before it starts.
+    """
+
+    def __init__(self, limits: EvaluationLimits, mode=None, cancel=None):
+        self.limits = limits
+        self.cancel = cancel
+        self.deadline = (time.monotonic() + limits.timeout) if limits.timeout else None
+        binary = mode.binary if mode is not None else None
+        self.power = binary['**'] if binary else None
+        self.multiply = binary['*'] if binary else None
+
+    def tick(self):
+        """Raise if the evaluation was cancelled or ran out of time"""
+        if self.cancel is not None and self.cancel.is_set():
+            raise EvaluationCancelled()
+        if self.deadline is not None and time.monotonic() > self.deadline:
+            raise BudgetExceededError("Calculation took too long")
+
+    def before_binary(self, func, left, right):
+        """Validate one binary operation before it runs"""
+        self.tick()
+        if func is self.power:
+            self.check_power(left, right)
+        elif func is self.multiply or isinstance(left, Fraction) or isinstance(right, Fraction):
+            # Sums, differences and quotients of fractions multiply their
+            # denominators, so they can grow as fast as products
+            self.check_size(left, right)
+
+    def check_size(self, left, right):
+        """Estimate the size of a product of left and right before computing it"""
+        if estimate_digits(left) + estimate_digits(right) > self.limits.max_digits:
+            raise BudgetExceededError("Result too large")
+
+    def check_power(self, base, exponent):
+        """Estimate the size of base ** exponent before computing it"""
+        if isinstance(exponent, float) or isinstance(base, float):
+            # Float powers are constant time and overflow on their own
+            return
+        if abs(exponent) > self.limits.max_exponent:
+            raise BudgetExceededError("Exponent too large")
+        if isinstance(base, Decimal) or (isinstance(base, int) and -1 <= base <= 1):
+            # Decimal results are bounded by the mode's precision, and
+            # powers of 0 and +-1 never grow
+            return
+        if isinstance(base, Fraction):
+            size = _log10(base.numerator) + _log10(base.denominator)
+        else:
+            size = _log10(base)
+        if size * abs(exponent) > self.limits.max_digits:
+            raise BudgetExceededError("Result too large")
+
+
+def estimate_digits(value) -> float:
+    """Approximate number of decimal digits needed to hold an exact value"""
+    if isinstance(value, int):
+        return _log10(value) + 1
+    if isinstance(value, Fraction):
+        return _log10(value.numerator) + _log10(value.denominator) + 2
+    # Floats and Decimals have bounded size
+    return 0
+
+
+def _log10(value: int) -> float:
+    """log10 of the magnitude of an integer, 0 for zero"""
+    return math.log10(abs(value)) if value else 0.0
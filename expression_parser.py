@@ -0,0 +1,646 @@
+"""
+Expression Parser Module
+Tokenizes, parses and compiles arithmetic expressions for the calculator
+"""
+
+import operator
+import re
+import threading
+from collections import OrderedDict, namedtuple
+from bisect import bisect_left
+from typing import List
+from evaluation_limits import BudgetExceededError
+
+# Token kinds produced by the tokenizer
+NUMBER = "NUMBER"
+OP = "OP"
+LPAREN = "LPAREN"
+RPAREN = "RPAREN"
+NAME = "NAME"
+COMMA = "COMMA"
+ASSIGN = "ASSIGN"
+
+Token = namedtuple("Token", ["kind", "value", "pos"])
+
+# AST nodes
+Number = namedtuple("Number", ["text"])
+UnaryOp = namedtuple("UnaryOp", ["op", "operand"])
+BinaryOp = namedtuple("BinaryOp", ["op", "left", "right"])
+Name = namedtuple("Name", ["id"])
+Call = namedtuple("Call", ["name", "args"])
+
+# Statement nodes: params is None for variables, a tuple of names for functions
+Assignment = namedtuple("Assignment", ["target", "params", "body"])
+
+_TOKEN_RE = re.compile(r"\s*(?:(\d+\.?\d*|\.\d+)|(\*\*|//|[+\-*/])|(\()|(\))"
+                       r"|([A-Za-z_][A-Za-z_0-9]*)|(,)|(=))")
+
+_TOKEN_KINDS = (NUMBER, OP, LPAREN, RPAREN, NAME, COMMA, ASSIGN)
+
+# Nested user function calls allowed while inlining function bodies
+MAX_CALL_DEPTH = 32
+
+BINARY_OPERATORS = {
+    '+': operator.add,
+    '-': operator.sub,
+    '*': operator.mul,
+    '/': operator.truediv,
+    '//': operator.floordiv,
+    '**': operator.pow,
+}
+
+UNARY_OPERATORS = {
+    '-': operator.neg,
+    '+': operator.pos,
+}
+
+# Instruction opcodes of a compiled program
+PUSH = 0
+UNARY = 1
+BINARY = 2
+
+
+def tokenize(expression: str, pos: int = 0) -> List[Token]:
+    """Split an expression into number, operator, name and punctuation tokens"""
+    tokens = []
+    end = len(expression.rstrip())
+    while pos < end:
+        match = _TOKEN_RE.match(expression, pos)
+        if not match:
+            raise ValueError("Invalid expression")
+        group = match.lastindex
+        value = match.group(group)
+        if group == 1 and value[0] == '0' and value.strip('0') and value.isdigit():
+            # Python rejects integer literals with leading zeros
+            raise ValueError("Invalid expression")
+        tokens.append(Token(_TOKEN_KINDS[group - 1], value, match.start(group)))
+        pos = match.end()
+    return tokens
+
+
+# Nesting allowed when no explicit limit is given; keeps recursion well
+# below Python's default recursion limit
+DEFAULT_MAX_DEPTH = 150
+
+class Parser:
+    """Recursive descent parser following Python's arithmetic precedence"""
+
+    def __init__(self, tokens: List[Token], max_depth: int = DEFAULT_MAX_DEPTH):
+        self.tokens = tokens
+        self.index = 0
+        self.max_depth = max_depth
+        self.depth = 0
+
+    def enter(self):
+        """Track one more level of parenthesis or sign nesting"""
+        self.depth += 1
+        if self.depth > self.max_depth:
+            raise BudgetExceededError("Expression nested too deeply")
+
+    def parse(self):
+        """Parse the whole token list into an AST"""
+        if not self.tokens:
+            raise ValueError("Invalid expression")
+        node = self.parse_sum()
+        if self.index != len(self.tokens):
+            raise ValueError("Invalid expression")
+        return node
+
+    def parse_statement(self):
+        """Parse "name = sum", "name(params) = sum" or a bare expression"""
+        tokens = self.tokens
+        if len(tokens) >= 2 and tokens[0].kind == NAME:
+            if tokens[1].kind == ASSIGN:
+                self.index = 2
+                return Assignment(tokens[0].value, None, self.parse())
+            if tokens[1].kind == LPAREN:
+                params = self.parse_params()
+                if params is not None:
+                    return Assignment(tokens[0].value, params, self.parse())
+        return self.parse()
+
+    def parse_params(self):
+        """Parse "(a, b) =" after a function name, or return None if absent"""
+        tokens = self.tokens
+        index = 2
+        params = []
+        while index < len(tokens) and tokens[index].kind == NAME:
+            params.append(tokens[index].value)
+            index += 1
+            if index < len(tokens) and tokens[index].kind == COMMA:
+                index += 1
+            else:
+                break
+        if index + 1 >= len(tokens) or tokens[index].kind != RPAREN \
+                or tokens[index + 1].kind != ASSIGN:
+            return None
+        if len(set(params)) != len(params):
+            raise ValueError("Duplicate parameter name")
+        self.index = index + 2
+        return tuple(params)
+
+    def peek(self):
+        """Return the current token without consuming it"""
+        if self.index < len(self.tokens):
+            return self.tokens[self.index]
+        return None
+
+    def accept_op(self, *ops):
+        """Consume and return the current operator if it is one of ops"""
+        token = self.peek()
+        if token is not None and token.kind == OP and token.value in ops:
+            self.index += 1
+            return token.value
+        return None
+
+    def parse_sum(self):
+        """sum := term (('+' | '-') term)*"""
+        node = self.parse_term()
+        while True:
+            op = self.accept_op('+', '-')
+            if op is None:
+                return node
+            node = BinaryOp(op, node, self.parse_term())
+
+    def parse_term(self):
+        """term := factor (('*' | '/' | '//') factor)*"""
+        node = self.parse_factor()
+        while True:
+            op = self.accept_op('*', '/', '//')
+            if op is None:
+                return node
+            node = BinaryOp(op, node, self.parse_factor())
+
+    def parse_factor(self):
+        """factor := ('+' | '-') factor | power"""
+        op = self.accept_op('+', '-')
+        if op is not None:
+            self.enter()
+            node = UnaryOp(op, self.parse_factor())
+            self.depth -= 1
+            return node
+        return self.parse_power()
+
+    def parse_power(self):
+        """power := atom ['**' factor]"""
+        node = self.parse_atom()
+        if self.accept_op('**'):
+            node = BinaryOp('**', node, self.parse_factor())
+        return node
+
+    def parse_atom(self):
+        """atom := NUMBER | NAME | NAME '(' [sum (',' sum)*] ')' | '(' sum ')'"""
+        token = self.peek()
+        if token is None:
+            raise ValueError("Invalid expression")
+        if token.kind == NUMBER:
+            self.index += 1
+            return Number(token.value)
+        if token.kind == NAME:
+            self.index += 1
+            opening = self.peek()
+            if opening is None or opening.kind != LPAREN:
+                return Name(token.value)
+            self.index += 1
+            self.enter()
+            args = []
+            closing = self.peek()
+            if closing is None or closing.kind != RPAREN:
+                args.append(self.parse_sum())
+                while self.peek() is not None and self.peek().kind == COMMA:
+                    self.index += 1
+                    args.append(self.parse_sum())
+            closing = self.peek()
+            if closing is None or closing.kind != RPAREN:
+                raise ValueError("Invalid expression")
+            self.index += 1
+            self.depth -= 1
+            return Call(token.value, tuple(args))
+        if token.kind == LPAREN:
+            self.index += 1
+            self.enter()
+            node = self.parse_sum()
+            closing = self.peek()
+            if closing is None or closing.kind != RPAREN:
+                raise ValueError("Invalid expression")
+            self.index += 1
+            self.depth -= 1
+            return node
+        raise ValueError("Invalid expression")
+
+
+def parse(expression: str, max_depth: int = DEFAULT_MAX_DEPTH):
+    """Parse an expression string into an AST"""
+    return Parser(tokenize(expression), max_depth).parse()
+
+
+def parse_statement(expression: str, max_depth: int = DEFAULT_MAX_DEPTH):
+    """Parse an assignment, function definition or expression into an AST"""
+    return Parser(tokenize(expression), max_depth).parse_statement()
+
+
+def names_in(node) -> set:
+    """Names of the variables and functions an AST refers to"""
+    names = set()
+    stack = [node]
+    while stack:
+        current = stack.pop()
+        if isinstance(current, Name):
+            names.add(current.id)
+        elif isinstance(current, Call):
+            names.add(current.name)
+            stack.extend(current.args)
+        elif isinstance(current, UnaryOp):
+            stack.append(current.operand)
+        elif isinstance(current, BinaryOp):
+            stack.append(current.left)
+            stack.append(current.right)
+    return names
+
+
+def substitute(node, bindings: dict):
+    """Replace Name nodes by the AST bound to their name"""
+    if isinstance(node, Name):
+        return bindings.get(node.id, node)
+    if isinstance(node, UnaryOp):
+        return UnaryOp(node.op, substitute(node.operand, bindings))
+    if isinstance(node, BinaryOp):
+        return BinaryOp(node.op, substitute(node.left, bindings),
+                        substitute(node.right, bindings))
+    if isinstance(node, Call):
+        return Call(node.name, tuple(substitute(arg, bindings) for arg in node.args))
+    return node
+
+
+# Binding strength of each node kind when printing canonical text
+_SUM, _TERM, _FACTOR, _POWER, _ATOM = 1, 2, 3, 4, 5
+
+_BINARY_PRECEDENCE = {'+': _SUM, '-': _SUM, '*': _TERM, '/': _TERM, '//': _TERM, '**': _POWER}
+
+
+def canonical_text(node) -> str:
+    """Print an AST in a normal form shared by equivalent spellings
+
+    Whitespace and redundant parentheses disappear, and the two operands
+    of + and * are put in a fixed order. Operands are only swapped, never
+    regrouped, so the normal form evaluates to exactly the same value in
+    every numeric mode.
+    """
+    # Post-order walk with an explicit stack, as in compile_ast; printed
+    # operands wait on done as (text, binding strength) pairs
+    done = []
+    stack = [(node, False)]
+    while stack:
+        current, ready = stack.pop()
+        if isinstance(current, Number):
+            done.append((current.text, _ATOM))
+        elif isinstance(current, Name):
+            done.append((current.id, _ATOM))
+        elif not ready:
+            stack.append((current, True))
+            if isinstance(current, Call):
+                stack.extend((arg, False) for arg in reversed(current.args))
+            elif isinstance(current, UnaryOp):
+                stack.append((current.operand, False))
+            else:
+                stack.append((current.right, False))
+                stack.append((current.left, False))
+        elif isinstance(current, Call):
+            args = done[len(done) - len(current.args):]
+            del done[len(done) - len(current.args):]
+            done.append((f"{current.name}({','.join(text for text, _ in args)})", _ATOM))
+        elif isinstance(current, UnaryOp):
+            text, strength = done.pop()
+            if strength < _FACTOR:
+                text = f"({text})"
+            done.append((current.op + text, _FACTOR))
+        else:
+            right = done.pop()
+            done.append(_canonical_binary(current.op, done.pop(), right))
+    return done[-1][0]
+
+
+def _canonical_binary(op: str, left: tuple, right: tuple) -> tuple:
+    """Canonical text and binding strength of a binary operation"""
+    precedence = _BINARY_PRECEDENCE[op]
+    if op in ('+', '*') and right[0] < left[0]:
+        left, right = right, left
+    if op == '**':
+        # The base is an atom and the exponent a factor
+        left_text = left[0] if left[1] == _ATOM else f"({left[0]})"
+        right_text = right[0] if right[1] >= _FACTOR else f"({right[0]})"
+    else:
+        left_text = left[0] if left[1] >= precedence else f"({left[0]})"
+        right_text = right[0] if right[1] > precedence else f"({right[0]})"
+    return f"{left_text}{op}{right_text}", precedence
+
+
+def parse_number(text: str):
+    """Convert a number literal to int or float like Python would"""
+    if '.' in text:
+        return float(text)
+    return int(text)
+
+
+def compile_ast(node, mode=None, limits=None, scope=None) -> tuple:
+    """Flatten an AST into a postfix instruction list
+
+    Literals and operators come from the numeric mode when one is given,
+    so the program evaluates entirely in that number domain. With limits,
+    oversized literals and programs are rejected before evaluation.
+
+    Names are resolved through scope, which provides lookup(name) for
+    variable values (pushed as constants) and function(name) returning
+    (params, body); calls are inlined with the arguments substituted.
+    """
+    literal = mode.literal if mode is not None else parse_number
+    if limits is not None:
+        convert = literal
+
+        def literal(text):
+            limits.check_literal(text)
+            return convert(text)
+
+    binary = mode.binary if mode is not None else BINARY_OPERATORS
+    unary = mode.unary if mode is not None else UNARY_OPERATORS
+    program = []
+    # Post-order walk with an explicit stack, so long chains of operators
+    # never hit the recursion limit; operators are pushed back as
+    # (node, None) and emitted once their operands have been
+    stack = [(node, 0)]
+    while stack:
+        current, calls = stack.pop()
+        if calls is None:
+            if isinstance(current, UnaryOp):
+                program.append((UNARY, unary[current.op]))
+            else:
+                program.append((BINARY, binary[current.op]))
+        elif isinstance(current, Number):
+            program.append((PUSH, literal(current.text)))
+        elif isinstance(current, UnaryOp):
+            stack.append((current, None))
+            stack.append((current.operand, calls))
+        elif isinstance(current, BinaryOp):
+            stack.append((current, None))
+            stack.append((current.right, calls))
+            stack.append((current.left, calls))
+        elif scope is None:
+            raise ValueError("Invalid characters in expression")
+        elif isinstance(current, Name):
+            program.append((PUSH, scope.lookup(current.id)))
+        else:
+            params, body = scope.function(current.name)
+            if len(params) != len(current.args):
+                raise ValueError(f"{current.name}() takes {len(params)} arguments")
+            if calls >= MAX_CALL_DEPTH:
+                raise BudgetExceededError("Function calls nested too deeply")
+            stack.append((substitute(body, dict(zip(params, current.args))), calls + 1))
+
+    program = tuple(program)
+    if limits is not None:
+        limits.check_program(program)
+    return program
+
+
+def compile_expression(expression: str, mode=None, limits=None) -> tuple:
+    """Parse and compile an expression into a postfix instruction list"""
+    max_depth = limits.max_depth if limits is not None else DEFAULT_MAX_DEPTH
+    return compile_ast(parse(expression, max_depth), mode, limits)
+
+
+def evaluate_program(program: tuple):
+    """Run a compiled postfix program on a value stack"""
+    stack = []
+    push = stack.append
+    pop = stack.pop
+    for opcode, arg in program:
+        if opcode == PUSH:
+            push(arg)
+        elif opcode == UNARY:
+            stack[-1] = arg(stack[-1])
+        else:
+            right = pop()
+            stack[-1] = arg(stack[-1], right)
+    return stack[-1]
+
+
+def evaluate_guarded(program: tuple, guard):
+    """Run a compiled program, letting guard vet every binary operation"""
+    stack = []
+    push = stack.append
+    pop = stack.pop
+    before_binary = guard.before_binary
+    for opcode, arg in program:
+        if opcode == PUSH:
+            push(arg)
+        elif opcode == UNARY:
+            stack[-1] = arg(stack[-1])
+        else:
+            right = pop()
+            before_binary(arg, stack[-1], right)
+            stack[-1] = arg(stack[-1], right)
+    return stack[-1]
+
+
+# Shunting-yard operator table: precedence and right associativity.
+# Unary signs bind tighter than * and / but looser than **, as in Python.
+OPERATOR_PRECEDENCE = {
+    '+': (1, False), '-': (1, False),
+    '*': (2, False), '/': (2, False), '//': (2, False),
+    'u+': (3, True), 'u-': (3, True),
+    '**': (4, True),
+}
+
+# Parser state after a token. values and ops are immutable cons lists
+# (head, tail) so every checkpoint shares structure with the previous one.
+# complete is the latest earlier state that ended on a whole operand.
+ParseState = namedtuple("ParseState", ["values", "ops", "expect_operand", "complete", "error"])
+
+INITIAL_STATE = ParseState(None, None, True, None, False)
+ERROR_STATE = ParseState(None, None, True, None, True)
+
+
+class IncrementalEvaluator:
+    """Evaluates an expression as it is typed, reusing work for the prefix
+
+    A parser checkpoint is kept after every token. When the text changes,
+    tokens that end before the first edited character are kept along with
+    their checkpoints, and only the remaining tail is tokenized and fed to
+    the operator-precedence parser, which evaluates eagerly. Incomplete
+    input such as "12 + 7 *" or "(3 + 4" previews the value of the longest
+    complete prefix with open parentheses implicitly closed.
+    """
+
+    def __init__(self, mode=None, limits=None):
+        self.mode = mode
+        self.limits = limits
+        self.guard = None
+        self.literal = mode.literal if mode is not None else parse_number
+        self.binary = mode.binary if mode is not None else BINARY_OPERATORS
+        self.unary = mode.unary if mode is not None else UNARY_OPERATORS
+        self.reset()
+
+    def reset(self):
+        """Forget all cached parse state"""
+        self.text = ""
+        self.tokens = []
+        self.token_ends = []
+        self.states = [INITIAL_STATE]
+        self.tail_error = False
+
+    def update(self, text: str):
+        """Return the preview value for text, or None if there is none"""
+        # Reuse every token that ends strictly before the first change
+        common = 0
+        limit = min(len(text), len(self.text))
+        while common < limit and text[common] == self.text[common]:
+            common += 1
+        keep = bisect_left(self.token_ends, common)
+        del self.tokens[keep:]
+        del self.token_ends[keep:]
+        del self.states[keep + 1:]
+        self.text = text
+
+        start = self.token_ends[-1] if self.token_ends else 0
+        try:
+            new_tokens = tokenize(text, start)
+            self.tail_error = False
+        except ValueError:
+            new_tokens = []
+            self.tail_error = True
+
+        # Eager reductions run under a fresh budget for every update
+        self.guard = self.limits.guard(self.mode) if self.limits is not None else None
+        state = self.states[-1]
+        for token in new_tokens:
+            state = self.advance(state, token)
+            self.tokens.append(token)
+            self.token_ends.append(token.pos + len(token.value))
+            self.states.append(state)
+        if self.tail_error:
+            return None
+        return self.finish(state)
+
+    def advance(self, state: ParseState, token: Token) -> ParseState:
+        """Feed one token to the parser, returning the next state"""
+        if state.error:
+            return state
+        complete = state if not state.expect_operand else state.complete
+        values, ops = state.values, state.ops
+        try:
+            if token.kind == NUMBER:
+                if not state.expect_operand:
+                    return ERROR_STATE
+                if self.limits is not None:
+                    self.limits.check_literal(token.value)
+                return ParseState((self.literal(token.value), values), ops, False, None, False)
+            if token.kind == LPAREN:
+                if not state.expect_operand:
+                    return ERROR_STATE
+                return ParseState(values, ('(', ops), True, complete, False)
+            if token.kind == RPAREN:
+                if state.expect_operand:
+                    return ERROR_STATE
+                while ops is not None and ops[0] != '(':
+                    values, ops = self.reduce(values, ops)
+                if ops is None:
+                    return ERROR_STATE
+                return ParseState(values, ops[1], False, None, False)
+            if state.expect_operand:
+                if token.value not in ('+', '-'):
+                    return ERROR_STATE
+                return ParseState(values, ('u' + token.value, ops), True, complete, False)
+            precedence, right_assoc = OPERATOR_PRECEDENCE[token.value]
+            while ops is not None and ops[0] != '(':
+                top_precedence = OPERATOR_PRECEDENCE[ops[0]][0]
+                if top_precedence < precedence or (top_precedence == precedence and right_assoc):
+                    break
+                values, ops = self.reduce(values, ops)
+            return ParseState(values, (token.value, ops), True, complete, False)
+        except Exception:
+            # Division by zero, overflow and friends make the preview unavailable
+            return ERROR_STATE
+
+    def reduce(self, values, ops):
+        """Apply the operator on top of the stack to the top values"""
+        op, ops = ops
+        if op[0] == 'u':
+            value, values = values
+            return (self.unary[op[1:]](value), values), ops
+        right, values = values
+        left, values = values
+        func = self.binary[op]
+        if self.guard is not None:
+            self.guard.before_binary(func, left, right)
+        return (func(left, right), values), ops
+
+    def finish(self, state: ParseState):
+        """Evaluate a state as if the input ended at its last complete operand"""
+        if state.error:
+            return None
+        if state.expect_operand:
+            state = state.complete
+            if state is None:
+                return None
+        values, ops = state.values, state.ops
+        try:
+            while ops is not None:
+                if ops[0] == '(':
+                    ops = ops[1]
+                else:
+                    values, ops = self.reduce(values, ops)
+            return values[0]
+        except Exception:
+            return None
+
+
+class ExpressionCache:
+    """Size-limited, thread-safe LRU cache of compiled expressions"""
+
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return the cached value for key, or None on a miss"""
+        with self._lock:
+            try:
+                value = self._entries[key]
+            except KeyError:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """Store a value, evicting the least recently used entry if full"""
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Drop all entries and reset the counters"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def info(self) -> dict:
+        """Return hit/miss counters and current size"""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+        }
+
+    def __len__(self):
+        return len(self._entries)
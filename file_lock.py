@@ -0,0 +1,89 @@
+"""
+File Lock Module
+Advisory locks that serialize file access between processes
+"""
+
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError:
+    # Windows
+    fcntl = None
+    import msvcrt
+
+
+def lock_descriptor(fd: int):
+    """Block until the exclusive lock on an open lock file is held"""
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        return
+    os.lseek(fd, 0, os.SEEK_SET)
+    while True:
+        try:
+            # LK_LOCK gives up after about ten seconds of retrying
+            msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+            return
+        except OSError:
+            continue
+
+
+def unlock_descriptor(fd: int):
+    """Release the lock taken by lock_descriptor"""
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+        return
+    os.lseek(fd, 0, os.SEEK_SET)
+    msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+
+class FileLock:
+    """Exclusive advisory lock on a lock file, shared by every process using it
+
+    The lock only excludes other code that takes the same lock; the files it
+    protects are not locked themselves. It is re-entrant, and threads of one
+    process queue on a thread lock so only one of them touches the file lock.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._fd = None
+        self._depth = 0
+        self._thread_lock = threading.RLock()
+
+    def acquire(self):
+        """Take the lock, waiting for other processes and threads"""
+        self._thread_lock.acquire()
+        if self._depth == 0:
+            try:
+                if self._fd is None:
+                    self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+                lock_descriptor(self._fd)
+            except BaseException:
+                self._thread_lock.release()
+                raise
+        self._depth += 1
+
+    def release(self):
+        """Give the lock up once every acquire has been matched"""
+        self._depth -= 1
+        try:
+            if self._depth == 0:
+                unlock_descriptor(self._fd)
+        finally:
+            self._thread_lock.release()
+
+    def close(self):
+        """Close the lock file; the lock must not be held"""
+        with self._thread_lock:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.release()
@@ -0,0 +1,144 @@
+"""
+Headless Calculator Module
+Evaluates expressions from stdin or a file without loading the Qt UI
+"""
+
+import argparse
+import sys
+from typing import Iterable, Iterator, List, Optional, TextIO
+from calculator_logic import CalculatorLogic
+from metrics import metrics
+
+
+def read_expressions(stream: TextIO) -> Iterator[str]:
+    """Yield non-empty expression lines from a text stream"""
+    for line in stream:
+        line = line.strip()
+        if line:
+            yield line
+
+
+def format_result(result, logic: CalculatorLogic) -> str:
+    """Format one batch result as an output line"""
+    if result.error is not None:
+        return f"Error: {result.error}"
+    return logic.format_result(result.value)
+
+
+def evaluate_stream(expressions: Iterable[str], logic: CalculatorLogic,
+                    history=None, processes: Optional[int] = None) -> Iterator:
+    """Evaluate expressions lazily, recording successes in history if given
+
+    Results that cannot be formatted are turned into per-line errors.
+    """
+    for result in logic.calculate_many(expressions, processes=processes):
+        if result.error is None:
+            try:
+                text = logic.format_result(result.value)
+            except ValueError as e:
+                yield result._replace(value=None, error=e)
+                continue
+            if history is not None:
+                display_expr = result.expression.replace('*', '×').replace('/', '÷')
+                history.add_calculation(display_expr, text)
+        yield result
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Create the command line parser for headless mode"""
+    parser = argparse.ArgumentParser(
+        description="Evaluate calculator expressions line by line without the UI")
+    parser.add_argument("--eval", dest="source", metavar="FILE", default="-",
+                        help="file with one expression per line, '-' for stdin (default)")
+    parser.add_argument("--mode", choices=("float", "decimal", "fraction"), default="float",
+                        help="number domain used for evaluation (default: float)")
+    parser.add_argument("--precision", type=int, default=None,
+                        help="significant digits in decimal mode")
+    parser.add_argument("--history", action="store_true",
+                        help="record successful calculations in the history file")
+    parser.add_argument("--history-backend", choices=("json", "sqlite"), default="json",
+                        help="storage used with --history (default: json)")
+    parser.add_argument("--processes", type=int, default=None,
+                        help="evaluate chunks of input on this many worker processes")
+    parser.add_argument("--metrics", metavar="FILE", default=None,
+                        help="record timings and write them to FILE (.json or Prometheus text)")
+    parser.add_argument("--sweep", metavar="EXPRESSION", default=None,
+                        help="evaluate EXPRESSION for every value of --var, printing "
+                             "'value<TAB>result' lines")
+    parser.add_argument("--var", dest="variable", metavar="NAME", default="x",
+                        help="variable swept by --sweep (default: x)")
+    parser.add_argument("--range", dest="sweep_range", metavar="START:STOP[:STEP]", default=None,
+                        help="values for --sweep; without it values are read like --eval input")
+    return parser
+
+
+def run_sweep(args, logic: CalculatorLogic, source: TextIO, stdout: TextIO) -> bool:
+    """Print one line per swept value and return True if any value failed"""
+    import sweep
+
+    if args.sweep_range is not None:
+        values = sweep.parse_range(args.sweep_range)
+    else:
+        values = (sweep.parse_value(line) for line in read_expressions(source))
+    failed = False
+    for chunk in logic.sweep(args.sweep, values, args.variable):
+        lines = []
+        for value, result, error in sweep.iter_results([chunk]):
+            if error is not None:
+                failed = True
+                lines.append(f"{sweep.format_input(value)}\tError: {error}\n")
+            else:
+                try:
+                    text = logic.format_result(result)
+                except ValueError as e:
+                    failed = True
+                    text = f"Error: {e}"
+                lines.append(f"{sweep.format_input(value)}\t{text}\n")
+        stdout.write("".join(lines))
+        stdout.flush()
+    return failed
+
+
+def run(argv: Optional[List[str]] = None, stdin: Optional[TextIO] = None,
+        stdout: Optional[TextIO] = None) -> int:
+    """Run headless evaluation and return the process exit code"""
+    args = build_parser().parse_args(argv)
+    stdin = stdin or sys.stdin
+    stdout = stdout or sys.stdout
+    if args.metrics:
+        metrics.enable()
+
+    history = None
+    if args.history:
+        from history_manager import create_history_manager
+        history = create_history_manager(args.history_backend)
+
+    logic = CalculatorLogic(mode=args.mode, precision=args.precision)
+    source = stdin if args.source == "-" else open(args.source, 'r', encoding='utf-8')
+    # Flush every line when reading stdin so pipelines see results immediately
+    interactive = source is stdin
+    failed = False
+    try:
+        if args.sweep is not None:
+            try:
+                return 1 if run_sweep(args, logic, source, stdout) else 0
+            except (ValueError, ZeroDivisionError) as e:
+                stdout.write(f"Error: {e}\n")
+                return 1
+        for result in evaluate_stream(read_expressions(source), logic, history, args.processes):
+            failed = failed or result.error is not None
+            stdout.write(format_result(result, logic) + "\n")
+            if interactive:
+                stdout.flush()
+    finally:
+        if source is not stdin:
+            source.close()
+        if history is not None:
+            history.close()
+        if args.metrics:
+            metrics.dump(args.metrics)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(run())
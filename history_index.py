@@ -0,0 +1,366 @@
+"""
+History Index Module
+Trigram and numeric indexes for searching calculation history
+"""
+
+import heapq
+import math
+import re
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from history_stats import parse_result
+
+# Padding around indexed text, so every one or two character substring and
+# every result prefix falls inside a whole trigram; result text starts with
+# its own marker so result prefixes never match expressions. A row is
+# indexed as one string, expression then result; the trigram joining the
+# two is in every row and is left out
+EXPRESSION_START = "\x02\x02"
+SEPARATOR = "\x03\x04\x04"
+RESULT_START = "\x04\x04"
+TEXT_END = "\x03\x03"
+PADDING = frozenset("\x02\x03\x04")
+
+# Pairs per chunk of the sorted numeric index before it is split in two
+CHUNK_SIZE = 1024
+
+# Rows per block of the result value column; blocks remember their
+# smallest and largest value so range scans can skip them
+BLOCK_SIZE = 256
+
+# Numeric ranges matching at most this many rows are collected from the
+# sorted index and ordered by row; wider ones scan the value column
+SORT_LIMIT = 4096
+
+# Filter box syntax for numeric ranges, e.g. "10..20", "..0" or "1e3.."
+NUMBER = r"[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?"
+RANGE_PATTERN = re.compile(rf"({NUMBER})?\s*\.\.\s*({NUMBER})?")
+
+# Trimmed rows linger in posting lists until this many have accumulated
+# and they outnumber the live rows
+PURGE_MIN_ROWS = 4096
+
+
+def row_trigrams(expression: str, result: str) -> set:
+    """Distinct trigrams of a row's lowercased, padded expression and result"""
+    padded = EXPRESSION_START + expression.lower() + SEPARATOR + result.lower() + TEXT_END
+    grams = {padded[i:i + 3] for i in range(len(padded) - 2)}
+    grams.discard(SEPARATOR)
+    return grams
+
+
+def short_parts(gram: str) -> set:
+    """One and two character substrings of a trigram, without padding"""
+    parts = {gram[i:i + length] for length in (1, 2) for i in range(4 - length)}
+    return {part for part in parts if not PADDING.intersection(part)}
+
+
+def term_trigrams(term: str) -> set:
+    """Trigrams every match of a lowercased term of 3+ characters contains"""
+    return {term[i:i + 3] for i in range(len(term) - 2)}
+
+
+def parse_query(text: str) -> Dict:
+    """Keyword arguments of HistoryManager.query_history for filter box text
+
+    "min..max" (either bound may be left out) selects numeric results in
+    range, "=prefix" results starting with prefix, anything else is a
+    substring of the expression or result.
+    """
+    text = text.strip()
+    match = RANGE_PATTERN.fullmatch(text)
+    if match and any(match.groups()):
+        low, high = match.groups()
+        return {"minimum": float(low) if low else None,
+                "maximum": float(high) if high else None}
+    if text.startswith("=") and len(text) > 1:
+        return {"prefix": text[1:].strip()}
+    return {"text": text}
+
+
+def distinct(rows: Iterable[int]) -> Iterator[int]:
+    """Drop repeats from a sorted stream of rows"""
+    previous = None
+    for row in rows:
+        if row != previous:
+            previous = row
+            yield row
+
+
+class SortedValues:
+    """(value, row) pairs in value order, stored in chunks of parallel arrays
+
+    Rows are added newest last and removed oldest first, so among equal
+    values rows are in insertion order and the oldest is always the first.
+    Inserts and removals move at most one chunk, 2 * CHUNK_SIZE pairs.
+    """
+
+    def __init__(self):
+        self.values: List[array] = []
+        self.rows: List[array] = []
+        self.maxes: List[float] = []
+
+    def __len__(self):
+        return sum(len(values) for values in self.values)
+
+    def add(self, value: float, row: int):
+        """Insert a pair whose row is newer than every row present"""
+        if not self.values:
+            self.values.append(array('d', (value,)))
+            self.rows.append(array('I', (row,)))
+            self.maxes.append(value)
+            return
+        i = min(bisect_right(self.maxes, value), len(self.maxes) - 1)
+        values = self.values[i]
+        j = bisect_right(values, value)
+        values.insert(j, value)
+        self.rows[i].insert(j, row)
+        self.maxes[i] = values[-1]
+        if len(values) > 2 * CHUNK_SIZE:
+            rows = self.rows[i]
+            self.values[i + 1:i + 1] = [values[CHUNK_SIZE:]]
+            self.rows[i + 1:i + 1] = [rows[CHUNK_SIZE:]]
+            del values[CHUNK_SIZE:]
+            del rows[CHUNK_SIZE:]
+            self.maxes[i:i + 1] = [values[-1], self.values[i + 1][-1]]
+
+    def remove_oldest(self, value: float):
+        """Remove the oldest pair holding value"""
+        i = bisect_left(self.maxes, value)
+        values = self.values[i]
+        j = bisect_left(values, value)
+        del values[j]
+        del self.rows[i][j]
+        if values:
+            self.maxes[i] = values[-1]
+        else:
+            del self.values[i], self.rows[i], self.maxes[i]
+
+    def bounds(self, low: float, high: float) -> Tuple[int, int, int, int]:
+        """Chunk and offset of the first pair >= low and the first > high"""
+        start = bisect_left(self.maxes, low)
+        start_offset = bisect_left(self.values[start], low) if start < len(self.maxes) else 0
+        end = bisect_right(self.maxes, high)
+        end_offset = bisect_right(self.values[end], high) if end < len(self.maxes) else 0
+        return start, start_offset, end, end_offset
+
+    def count(self, low: float, high: float) -> int:
+        """Number of pairs with low <= value <= high"""
+        start, start_offset, end, end_offset = self.bounds(low, high)
+        if start > end or (start == end and start_offset >= end_offset):
+            return 0
+        return sum(len(values) for values in self.values[start:end]) - start_offset + end_offset
+
+    def rows_between(self, low: float, high: float) -> List[int]:
+        """Rows of the pairs with low <= value <= high, in value order"""
+        start, start_offset, end, end_offset = self.bounds(low, high)
+        if start > end:
+            return []
+        if start == end:
+            return list(self.rows[start][start_offset:end_offset]) if start < len(self.rows) else []
+        found = list(self.rows[start][start_offset:])
+        for rows in self.rows[start + 1:end]:
+            found.extend(rows)
+        if end < len(self.rows):
+            found.extend(self.rows[end][:end_offset])
+        return found
+
+
+class HistoryIndex:
+    """Inverted indexes over the rows of a HistoryStore
+
+    Rows are identified by ids that only grow; they are added newest last
+    and trimmed oldest first. grams maps each trigram of the lowercased,
+    padded expressions and results to the sorted ids of rows holding it.
+    Result values sit in a column by row and in a SortedValues index.
+
+    The query methods yield candidate row ids lazily, newest first, without
+    repeats; a candidate may still fail the query, so callers check each
+    row against the actual text. Purging and clearing swap in new arrays
+    rather than editing them, and iterators stop early once either has
+    happened (generation changes), so re-run a query after the history
+    changes.
+    """
+
+    def __init__(self, first: int = 0):
+        self.grams: Dict[str, array] = {}
+        # One and two character strings to the trigrams containing them
+        self.short: Dict[str, List[str]] = {}
+        # Oldest live row, row of values[0] and the row after the newest
+        self.first = first
+        self.offset = first
+        self.end = first
+        self.values = array('d')
+        self.block_min = array('d')
+        self.block_max = array('d')
+        self.ordered = SortedValues()
+        self.generation = 0
+
+    def add(self, row: int, expression: str, result: str):
+        """Index a row newer than every row indexed so far"""
+        if row != self.end:
+            raise ValueError("History index rows must be added in order")
+        self.end = row + 1
+        grams = self.grams
+        for gram in row_trigrams(expression, result):
+            rows = grams.get(gram)
+            if rows is None:
+                rows = grams[gram] = array('I')
+                self.add_short(gram)
+            rows.append(row)
+
+        value = parse_result(result)
+        position = row - self.offset
+        if position % BLOCK_SIZE == 0:
+            self.block_min.append(math.inf)
+            self.block_max.append(-math.inf)
+        if value is None:
+            self.values.append(math.nan)
+            return
+        self.values.append(value)
+        block = position // BLOCK_SIZE
+        if value < self.block_min[block]:
+            self.block_min[block] = value
+        if value > self.block_max[block]:
+            self.block_max[block] = value
+        self.ordered.add(value, row)
+
+    def add_short(self, gram: str):
+        """Register a new trigram under the short strings it contains"""
+        for part in short_parts(gram):
+            self.short.setdefault(part, []).append(gram)
+
+    def drop_before(self, row: int):
+        """Forget the rows older than row"""
+        row = min(row, self.end)
+        values = self.values
+        for position in range(self.first - self.offset, row - self.offset):
+            value = values[position]
+            if value == value:
+                self.ordered.remove_oldest(value)
+        self.first = max(self.first, row)
+        dead = self.first - self.offset
+        if dead >= PURGE_MIN_ROWS and dead >= self.end - self.first:
+            self.purge()
+
+    def purge(self):
+        """Physically remove trimmed rows from the posting lists and columns"""
+        first = self.first
+        grams = self.grams
+        for gram, rows in list(grams.items()):
+            cut = bisect_left(rows, first)
+            if cut == len(rows):
+                del grams[gram]
+                for part in short_parts(gram):
+                    owners = self.short[part]
+                    owners.remove(gram)
+                    if not owners:
+                        del self.short[part]
+            elif cut:
+                grams[gram] = rows[cut:]
+        blocks = (first - self.offset) // BLOCK_SIZE
+        self.values = self.values[blocks * BLOCK_SIZE:]
+        self.block_min = self.block_min[blocks:]
+        self.block_max = self.block_max[blocks:]
+        self.offset += blocks * BLOCK_SIZE
+        self.generation += 1
+
+    def clear(self):
+        """Forget every row; ids keep growing from the current end"""
+        generation = self.generation
+        self.__init__(self.end)
+        self.generation = generation + 1
+
+    def live(self, rows: Iterable[int]) -> Iterator[int]:
+        """Pass rows on while they are live and the index is unchanged"""
+        generation = self.generation
+        for row in rows:
+            if row < self.first or self.generation != generation:
+                return
+            yield row
+
+    def substring(self, term: str) -> Iterator[int]:
+        """Candidate rows whose expression or result contains term"""
+        term = term.lower()
+        if len(term) < 3:
+            grams = self.short.get(term, ())
+            return self.live(distinct(heapq.merge(
+                *(reversed(self.grams[gram]) for gram in grams), reverse=True)))
+        return self.live(self.intersection(term_trigrams(term)))
+
+    def result_prefix(self, prefix: str) -> Iterator[int]:
+        """Candidate rows whose result starts with prefix"""
+        return self.live(self.intersection(term_trigrams(RESULT_START + prefix.lower())))
+
+    def intersection(self, grams: set) -> Iterator[int]:
+        """Rows holding every trigram, newest first
+
+        A leapfrog join: the candidate row drops to the newest row at or
+        below it in the next list until every list agrees, so stretches of
+        rows missing from any one list are skipped by a single bisect.
+        """
+        lists = []
+        for gram in grams:
+            rows = self.grams.get(gram)
+            if rows is None:
+                return
+            lists.append(rows)
+        lists.sort(key=len)
+        if len(lists) == 1:
+            yield from reversed(lists[0])
+            return
+        # Rows only decrease, so each list is searched below its last hit
+        limits = [len(rows) for rows in lists]
+        candidate = lists[0][-1]
+        agreed = 0
+        i = 0
+        while True:
+            rows = lists[i]
+            hi = bisect_right(rows, candidate, 0, limits[i])
+            if not hi:
+                return
+            limits[i] = hi
+            row = rows[hi - 1]
+            if row != candidate:
+                candidate = row
+                agreed = 1
+            else:
+                agreed += 1
+                if agreed == len(lists):
+                    yield candidate
+                    candidate -= 1
+                    agreed = 0
+            i = (i + 1) % len(lists)
+
+    def result_range(self, low: Optional[float] = None,
+                     high: Optional[float] = None) -> Iterator[int]:
+        """Rows whose numeric result lies in [low, high]"""
+        low = -math.inf if low is None else low
+        high = math.inf if high is None else high
+        if self.ordered.count(low, high) <= SORT_LIMIT:
+            rows = self.ordered.rows_between(low, high)
+            rows.sort(reverse=True)
+            return self.live(rows)
+        return self.live(self.scan_range(low, high))
+
+    def scan_range(self, low: float, high: float) -> Iterator[int]:
+        """Walk the value column newest first, skipping blocks out of range"""
+        values, block_min, block_max = self.values, self.block_min, self.block_max
+        offset = self.offset
+        end = self.end - offset
+        for block in range((end - 1) // BLOCK_SIZE, -1, -1):
+            if block_max[block] < low or block_min[block] > high:
+                continue
+            for position in range(min(end, (block + 1) * BLOCK_SIZE) - 1,
+                                  block * BLOCK_SIZE - 1, -1):
+                if low <= values[position] <= high:
+                    yield offset + position
+
+    def memory_usage(self) -> int:
+        """Approximate bytes held by posting lists and value columns"""
+        size = sum(rows.itemsize * len(rows) for rows in self.grams.values())
+        size += 8 * (len(self.values) + len(self.block_min) + len(self.block_max))
+        size += 12 * len(self.ordered)
+        return size
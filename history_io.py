@@ -0,0 +1,347 @@
+"""
+History I/O Module
+Streaming export and memory-mapped import of calculation history archives
+
+Formats:
+    json    {"calculations": [...]} with one calculation per line
+    jsonl   one JSON object per line
+    csv     expression,result,timestamp with a header row
+    binary  fixed header, then per calculation a little-endian
+            (epoch int64, expression length uint32, result length uint32)
+            followed by the UTF-8 expression and result bytes
+"""
+
+import codecs
+import csv
+import json
+import mmap
+import os
+import struct
+from typing import Iterable, Iterator, Mapping, Optional
+from history_store import CalculationView, parse_timestamp, to_epoch
+
+FORMATS = ("json", "jsonl", "csv", "binary")
+
+EXTENSIONS = {
+    ".json": "json",
+    ".jsonl": "jsonl",
+    ".csv": "csv",
+    ".bin": "binary",
+    ".pch": "binary",
+}
+
+# Records buffered per write call
+CHUNK_RECORDS = 4096
+
+BINARY_MAGIC = b"PYCALCH1"
+BINARY_HEADER = struct.Struct("<8sQ")
+BINARY_RECORD = struct.Struct("<qII")
+
+CSV_FIELDS = ("expression", "result", "timestamp")
+
+
+def detect_format(filename: str, fmt: Optional[str] = None) -> str:
+    """Pick the archive format from an explicit name or the file extension"""
+    if fmt is None:
+        fmt = EXTENSIONS.get(os.path.splitext(filename)[1].lower(), "json")
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown history format: {fmt}")
+    return fmt
+
+
+def epoch_of(calculation: Mapping) -> int:
+    """Epoch seconds of a calculation view or history dict"""
+    epoch = getattr(calculation, "epoch", None)
+    return epoch if epoch is not None else parse_timestamp(calculation.get("timestamp", ""))
+
+
+def export_calculations(calculations: Iterable[Mapping], filename: str,
+                        fmt: Optional[str] = None) -> int:
+    """Stream calculations to filename and return how many were written
+
+    Output goes to a temporary file renamed into place, so a failed export
+    never leaves a truncated archive behind.
+    """
+    fmt = detect_format(filename, fmt)
+    temp_file = filename + ".tmp"
+    try:
+        if fmt == "binary":
+            with open(temp_file, 'wb') as f:
+                count = _write_binary(calculations, f)
+        else:
+            with open(temp_file, 'w', encoding='utf-8', newline='') as f:
+                count = WRITERS[fmt](calculations, f)
+        os.replace(temp_file, filename)
+    except BaseException:
+        if os.path.exists(temp_file):
+            os.unlink(temp_file)
+        raise
+    return count
+
+
+def _write_json(calculations, f) -> int:
+    """Write the {"calculations": [...]} document one line per record"""
+    f.write('{\n  "calculations": [')
+    separator = "\n    "
+    count = 0
+    chunk = []
+    for calculation in calculations:
+        chunk.append(separator + json.dumps(_as_dict(calculation), ensure_ascii=False))
+        separator = ",\n    "
+        count += 1
+        if len(chunk) >= CHUNK_RECORDS:
+            f.write("".join(chunk))
+            chunk = []
+    f.write("".join(chunk))
+    f.write("\n  ]\n}\n")
+    return count
+
+
+def _write_jsonl(calculations, f) -> int:
+    """Write one JSON object per line"""
+    count = 0
+    chunk = []
+    for calculation in calculations:
+        chunk.append(json.dumps(_as_dict(calculation), ensure_ascii=False) + "\n")
+        count += 1
+        if len(chunk) >= CHUNK_RECORDS:
+            f.write("".join(chunk))
+            chunk = []
+    f.write("".join(chunk))
+    return count
+
+
+def _write_csv(calculations, f) -> int:
+    """Write a header row and one row per calculation"""
+    writer = csv.writer(f)
+    writer.writerow(CSV_FIELDS)
+    count = 0
+    chunk = []
+    for calculation in calculations:
+        chunk.append((calculation["expression"], calculation["result"],
+                      calculation["timestamp"]))
+        count += 1
+        if len(chunk) >= CHUNK_RECORDS:
+            writer.writerows(chunk)
+            chunk = []
+    writer.writerows(chunk)
+    return count
+
+
+def _write_binary(calculations, f) -> int:
+    """Write the binary header, records, then patch in the record count"""
+    f.write(BINARY_HEADER.pack(BINARY_MAGIC, 0))
+    pack = BINARY_RECORD.pack
+    count = 0
+    chunk = []
+    for calculation in calculations:
+        expression = calculation["expression"].encode("utf-8")
+        result = calculation["result"].encode("utf-8")
+        chunk.append(pack(epoch_of(calculation), len(expression), len(result)))
+        chunk.append(expression)
+        chunk.append(result)
+        count += 1
+        if len(chunk) >= CHUNK_RECORDS * 3:
+            f.write(b"".join(chunk))
+            chunk = []
+    f.write(b"".join(chunk))
+    f.seek(0)
+    f.write(BINARY_HEADER.pack(BINARY_MAGIC, count))
+    return count
+
+
+WRITERS = {
+    "json": _write_json,
+    "jsonl": _write_jsonl,
+    "csv": _write_csv,
+}
+
+
+def _as_dict(calculation: Mapping) -> dict:
+    """Plain dict with the history keys"""
+    return {
+        "expression": calculation["expression"],
+        "result": calculation["result"],
+        "timestamp": calculation["timestamp"],
+    }
+
+
+class HistoryArchive:
+    """Lazy, memory-mapped reader for an exported history file
+
+    Iterating yields CalculationView rows one at a time straight from the
+    mapped file, so archives larger than RAM can be scanned and filtered.
+    Use as a context manager or call close() to release the mapping.
+    """
+
+    def __init__(self, filename: str, fmt: Optional[str] = None):
+        self.filename = filename
+        self.format = detect_format(filename, fmt)
+        self._file = open(filename, 'rb')
+        size = os.fstat(self._file.fileno()).st_size
+        # mmap cannot map empty files
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        if self.format == "binary" and size:
+            magic, self.count = BINARY_HEADER.unpack_from(self._map, 0)
+            if magic != BINARY_MAGIC:
+                self.close()
+                raise ValueError(f"Not a binary history archive: {filename}")
+        else:
+            self.count = None if size else 0
+
+    def __iter__(self) -> Iterator[CalculationView]:
+        return self.filter()
+
+    def filter(self, search_term: str = None, start=None, end=None) -> Iterator[CalculationView]:
+        """Yield calculations matching a search term and a time range
+
+        search_term matches expression or result case-insensitively; start
+        and end bound the timestamp as start <= timestamp < end and may be
+        epoch seconds or "YYYY-MM-DD HH:MM:SS" strings.
+        """
+        term = search_term.lower() if search_term else None
+        start = to_epoch(start) if start is not None else None
+        end = to_epoch(end) if end is not None else None
+        if self.format == "binary":
+            rows = self._iter_binary(start, end)
+        else:
+            rows = READERS[self.format](self, term)
+        for row in rows:
+            if start is not None and row.epoch < start:
+                continue
+            if end is not None and row.epoch >= end:
+                continue
+            if term is not None and term not in row.expression.lower() \
+                    and term not in row.result.lower():
+                continue
+            yield row
+
+    def _iter_binary(self, start, end) -> Iterator[CalculationView]:
+        """Walk binary records, decoding text only for rows in range"""
+        data = self._map
+        unpack = BINARY_RECORD.unpack_from
+        record_size = BINARY_RECORD.size
+        position = BINARY_HEADER.size
+        length = len(data)
+        while position + record_size <= length:
+            epoch, expression_length, result_length = unpack(data, position)
+            position += record_size
+            text_end = position + expression_length + result_length
+            if (start is None or epoch >= start) and (end is None or epoch < end):
+                expression = data[position:position + expression_length].decode("utf-8")
+                result = data[position + expression_length:text_end].decode("utf-8")
+                yield CalculationView(expression, result, epoch)
+            position = text_end
+
+    def _iter_lines(self, term: Optional[str]) -> Iterator[bytes]:
+        """Yield non-empty lines, skipping ones that cannot contain an ASCII term
+
+        Terms with characters JSON escapes are not looked for in the raw bytes.
+        """
+        data = self._map
+        needle = None
+        if term and term.isascii() and term.isprintable() and '"' not in term \
+                and "\\" not in term:
+            needle = term.encode("utf-8")
+        position = 0
+        length = len(data)
+        while position < length:
+            newline = data.find(b"\n", position)
+            if newline < 0:
+                newline = length
+            line = data[position:newline]
+            position = newline + 1
+            if not line.strip():
+                continue
+            if needle is not None and needle not in line.lower():
+                continue
+            yield line
+
+    def _iter_jsonl(self, term: Optional[str]) -> Iterator[CalculationView]:
+        """Parse one JSON object per line"""
+        for line in self._iter_lines(term):
+            try:
+                record = json.loads(line)
+            except (json.JSONDecodeError, UnicodeDecodeError):
+                continue
+            yield _view(record)
+
+    def _iter_csv(self, term: Optional[str]) -> Iterator[CalculationView]:
+        """Parse CSV rows after the header"""
+        lines = (line.decode("utf-8") for line in self._iter_lines(None))
+        reader = csv.reader(lines)
+        header = next(reader, None)
+        if header is None:
+            return
+        columns = [header.index(field) for field in CSV_FIELDS]
+        for row in reader:
+            if len(row) < len(header):
+                continue
+            expression, result, timestamp = (row[i] for i in columns)
+            yield CalculationView(expression, result, parse_timestamp(timestamp))
+
+    def _iter_json(self, term: Optional[str]) -> Iterator[CalculationView]:
+        """Decode the calculations array one object at a time"""
+        data = self._map
+        key = data.find(b'"calculations"')
+        if key < 0:
+            return
+        position = data.find(b"[", key) + 1
+        if position <= 0:
+            return
+        decoder = json.JSONDecoder()
+        text_decoder = codecs.getincrementaldecoder("utf-8")()
+        buffer = ""
+        index = 0
+        length = len(data)
+        chunk_size = 1 << 16
+        while True:
+            # Skip separators between array items
+            while index < len(buffer) and buffer[index] in " \t\r\n,":
+                index += 1
+            if index < len(buffer) and buffer[index] == "]":
+                return
+            try:
+                record, end = decoder.raw_decode(buffer, index)
+            except json.JSONDecodeError:
+                if position >= length:
+                    return
+                # Incomplete object at the end of the buffer: read more
+                buffer = buffer[index:] + text_decoder.decode(
+                    data[position:position + chunk_size], position + chunk_size >= length)
+                position += chunk_size
+                index = 0
+                continue
+            index = end
+            if isinstance(record, dict):
+                yield _view(record)
+
+    def close(self):
+        """Release the memory map and file"""
+        if isinstance(self._map, mmap.mmap):
+            self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+READERS = {
+    "json": HistoryArchive._iter_json,
+    "jsonl": HistoryArchive._iter_jsonl,
+    "csv": HistoryArchive._iter_csv,
+}
+
+
+def _view(record: dict) -> CalculationView:
+    """Convert a decoded history dict into a view"""
+    return CalculationView(str(record.get("expression", "")), str(record.get("result", "")),
+                           parse_timestamp(record.get("timestamp", "")))
+
+
+def open_archive(filename: str, fmt: Optional[str] = None) -> HistoryArchive:
+    """Open an exported history file for lazy iteration"""
+    return HistoryArchive(filename, fmt)
@@ -5,32 +5,159 @@ Handles calculation history storage and retrieval
 
 import json
 import os
+import queue
+import struct
+import threading
+import time
+from contextlib import nullcontext
 from datetime import datetime
-from typing import List, Dict
+from typing import Iterator, List, Dict, Optional, Tuple
+from file_lock import FileLock
+from history_stats import (DEFAULT_BUCKET_SECONDS, HistoryStats, RunningStats, StatsSummary,
+                           parse_result)
+from history_store import CalculationView, HistoryStore, parse_timestamp, to_epoch
+from metrics import metrics
+
+# Timings recorded only while metrics are enabled
+OPERATION_HELP = "Time spent in history operations"
+LOAD_SECONDS = metrics.histogram("history_operation_seconds", OPERATION_HELP, operation="load")
+SAVE_SECONDS = metrics.histogram("history_operation_seconds", OPERATION_HELP, operation="save")
+SEARCH_SECONDS = metrics.histogram("history_operation_seconds", OPERATION_HELP, operation="search")
+
+# Binary snapshot cache header: magic, then the mtime (ns) and size of the
+# JSON snapshot it mirrors, its last_seq and the limit it was trimmed to
+SNAPSHOT_CACHE_MAGIC = b"PYCALCC1"
+SNAPSHOT_CACHE_HEADER = struct.Struct("<8sqqqq")
 
 class HistoryManager:
-    """Manages calculation history persistence"""
+    """Manages calculation history persistence
+    
+    In memory, calculations live in a columnar HistoryStore; get_history()
+    and the search methods return dict-compatible CalculationView rows.
+    
+    The full history lives in a JSON snapshot file. Each calculation is
+    appended to a JSON-lines journal next to it, and the journal is folded
+    into the snapshot in the background once it grows past a size threshold.
+    
+    With write_behind enabled, journal records go through a bounded queue to
+    a background writer that batches them per flush, so callers never wait
+    on disk. fsync is one of FSYNC_POLICIES: "never" leaves syncing to the
+    OS, "flush" syncs after every written batch, "close" syncs on close().
+    
+    Every snapshot is mirrored into a binary cache file (".cache") that
+    loads without JSON parsing; it is used only while the JSON file's
+    mtime and size still match. With defer_load, the history starts empty:
+    call load_history() (safe on a worker thread) and pass the result to
+    install_history() on the thread that owns the listeners. Calculations
+    added before that are kept and journaled once the history is installed.
     
-    def __init__(self):
-        self.history_file = "history.json"
-        self.calculations = self.load_history()
+    With shared, several processes may use the same files: every journal
+    and snapshot access happens under an advisory lock on a ".lock" file,
+    records are numbered as they are written, and sync() applies records
+    other instances appended by reading only the journal bytes added since
+    the last read. Compaction rebuilds the snapshot from the files, so no
+    instance overwrites entries it has not seen. Records from other
+    instances are appended in the order this instance reads them.
+    
+    get_statistics() and get_statistics_by_bucket() report totals, means,
+    variances and extremes of the numeric results. They are aggregated
+    while the history loads and kept up to date as calculations are added,
+    trimmed and cleared, so queries cost nothing.
+    
+    search_history() and query_history() look rows up in a HistoryIndex of
+    trigrams and result values that is kept up to date the same way. It is
+    built by the first search, or while loading with search_index, which
+    keeps the build off the GUI thread when the load is deferred.
+    """
+    
+    FSYNC_POLICIES = ("never", "flush", "close")
+    
+    def __init__(self, history_file: str = "history.json", max_entries: int = 100,
+                 compact_threshold: int = 64 * 1024, write_behind: bool = False,
+                 flush_interval: float = 0.05, fsync: str = "never",
+                 queue_size: int = 1024, defer_load: bool = False, shared: bool = False,
+                 stats_bucket: int = DEFAULT_BUCKET_SECONDS, search_index: bool = False):
+        if fsync not in self.FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy: {fsync}")
+        self.history_file = history_file
+        self.journal_file = os.path.splitext(history_file)[0] + ".jsonl"
+        self.snapshot_cache_file = os.path.splitext(history_file)[0] + ".cache"
+        self.lock_file = os.path.splitext(history_file)[0] + ".lock"
+        self.max_entries = max_entries
+        self.compact_threshold = compact_threshold
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.last_seq = 0
+        # _lock guards the in-memory history, _io_lock the journal file
+        self._lock = threading.RLock()
+        self._io_lock = threading.Lock()
+        self._journal = None
+        self._journal_size = 0
+        self._compactor = None
+        self._listeners = []
+        # Shared mode: lock between processes, the first line of the journal
+        # that _journal_size is a read offset into (it holds a sequence
+        # number, so a rewritten journal never matches), and records of
+        # other instances read from it but not yet applied by sync()
+        self.shared = shared
+        self._file_lock = FileLock(self.lock_file) if shared else None
+        self._journal_head = b""
+        self._incoming = []
+        self._stale = False
+        # Results added through this manager; aggregates of the whole
+        # history by stats_bucket seconds live on the HistoryStore
+        self.stats_bucket = stats_bucket
+        self.session_stats = RunningStats()
+        self.search_index = search_index
+        # Calculations made before a deferred load is installed
+        self._deferred = []
+        self.loaded = not defer_load
+        if defer_load:
+            self.calculations = HistoryStore()
+            self.calculations.enable_stats(stats_bucket)
+        else:
+            self.calculations = self.load_history()
+            if self._journal_size >= self.compact_threshold:
+                self.start_compaction()
+        
+        self._queue = None
+        self._writer = None
+        if write_behind:
+            self._queue = queue.Queue(maxsize=queue_size)
+            self._writer = threading.Thread(target=self.run_writer,
+                                            name="history-writer", daemon=True)
+            self._writer.start()
     
     def add_calculation(self, expression: str, result: str):
         """Add new calculation to history"""
-        calculation = {
-            "expression": expression,
-            "result": result,
-            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        }
-        self.calculations.append(calculation)
+        calculation = CalculationView(expression, result, int(time.time()))
+        value = parse_result(result)
+        with self._lock:
+            if value is not None:
+                self.session_stats.add(value)
+            trimmed = self.append_calculation(calculation)
+            if self.loaded:
+                self.journal(dict(calculation))
+            else:
+                self._deferred.append(calculation)
         
-        # Keep only last 100 calculations to prevent file from growing too large
-        if len(self.calculations) > 100:
-            self.calculations = self.calculations[-100:]
+        if trimmed:
+            self.notify("trimmed", trimmed)
+        self.notify("added", calculation)
+    
+    def append_calculation(self, calculation: CalculationView) -> int:
+        """Append to the in-memory history, returning how many were trimmed"""
+        self.calculations.append(calculation.expression, calculation.result,
+                                 calculation.epoch)
         
-        self.save_history()
+        # Keep only the most recent calculations to bound memory use
+        if self.max_entries and len(self.calculations) > self.max_entries:
+            trimmed = len(self.calculations) - self.max_entries
+            self.calculations.drop_oldest(trimmed)
+            return trimmed
+        return 0
     
-    def get_history(self) -> List[Dict]:
+    def get_history(self) -> HistoryStore:
         """Get all calculations from history"""
         return self.calculations
     
@@ -38,39 +165,573 @@ class HistoryManager:
         """Get recent calculations from history"""
         return self.calculations[-count:] if self.calculations else []
     
+    def get_history_between(self, start, end) -> List[Dict]:
+        """Get calculations with start <= timestamp < end
+        
+        Bounds may be epoch seconds or "YYYY-MM-DD HH:MM:SS" strings.
+        """
+        with self._lock:
+            return self.calculations.between(to_epoch(start), to_epoch(end))
+    
     def clear_history(self):
         """Clear all calculation history"""
-        self.calculations = []
-        self.save_history()
+        with self._lock:
+            self.calculations = self.calculations.empty()
+            self.session_stats.clear()
+            if self.loaded:
+                self.journal({"op": "clear"})
+            else:
+                self._deferred = [None]
+        self.notify("reset", None)
+    
+    def get_statistics(self, scope: str = "history") -> StatsSummary:
+        """Aggregates over numeric results
+        
+        scope "history" covers the calculations in the history; "session"
+        the ones added through this manager since it was created or the
+        history was last cleared, including any trimmed since.
+        """
+        with self._lock:
+            if scope == "history":
+                return self.history_stats().overall.summary()
+            if scope == "session":
+                return self.session_stats.summary()
+        raise ValueError(f"Unknown statistics scope: {scope}")
+    
+    def get_statistics_by_bucket(self, start=None, end=None) -> List:
+        """(bucket start epoch, StatsSummary) per stats_bucket, oldest first
+        
+        Bounds select buckets starting in [start, end) and may be epoch
+        seconds or "YYYY-MM-DD HH:MM:SS" strings.
+        """
+        start = to_epoch(start) if start is not None else None
+        end = to_epoch(end) if end is not None else None
+        with self._lock:
+            return self.history_stats().by_bucket(start, end)
+    
+    def history_stats(self) -> HistoryStats:
+        """Aggregates of the current history; the caller holds the lock"""
+        return self.calculations.enable_stats(self.stats_bucket)
+    
+    def add_listener(self, callback):
+        """Register callback(event, payload) for history changes
+        
+        Events are "added" with the new calculation, "trimmed" with the
+        number of oldest entries dropped (always sent before the matching
+        "added"), and "reset" when the history is replaced wholesale.
+        """
+        self._listeners.append(callback)
+    
+    def remove_listener(self, callback):
+        """Unregister a history change callback"""
+        self._listeners.remove(callback)
+    
+    def notify(self, event: str, payload):
+        """Send a change event to all listeners"""
+        for callback in list(self._listeners):
+            callback(event, payload)
+    
+    def load_history(self) -> HistoryStore:
+        """Load history from the snapshot and replay the journal"""
+        with metrics.time(LOAD_SECONDS):
+            with self.shared_lock():
+                calculations = self._load_history()
+            calculations.enable_stats(self.stats_bucket)
+            if self.search_index:
+                calculations.enable_index()
+            return calculations
+    
+    def _load_history(self) -> HistoryStore:
+        """Read the history and remember the last sequence number"""
+        calculations, self.last_seq = self.read_history()
+        return calculations
+    
+    def read_history(self, limit: int = None) -> Tuple[HistoryStore, int]:
+        """Read the snapshot and replay the journal onto it
+        
+        The result keeps the last limit calculations, max_entries unless
+        given; 0 keeps them all.
+        """
+        if limit is None:
+            limit = self.max_entries
+        loaded = self.read_snapshot_cache(limit)
+        if loaded is None:
+            loaded = self.read_snapshot(limit)
+        calculations, last_seq = loaded
+        
+        for record in self.read_journal():
+            if record.get("seq", 0) <= last_seq:
+                continue
+            last_seq = record["seq"]
+            op = record.get("op")
+            if op == "clear":
+                calculations = HistoryStore()
+            elif op != "compact":
+                calculations.append_record(record)
+        
+        if limit and len(calculations) > limit:
+            calculations.drop_oldest(len(calculations) - limit)
+        return calculations, last_seq
+    
+    def shared_lock(self):
+        """The inter-process lock in shared mode, otherwise a no-op"""
+        return self._file_lock if self._file_lock is not None else nullcontext()
+    
+    def read_snapshot(self, limit: int) -> Tuple[HistoryStore, int]:
+        """Parse the JSON snapshot, refreshing the binary cache from it"""
+        calculations = HistoryStore()
+        try:
+            before = os.stat(self.history_file)
+            with open(self.history_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            records = data.get('calculations', [])
+            if limit:
+                records = records[-limit:]
+            calculations.extend_records(records)
+            last_seq = data.get('last_seq', 0)
+        except (json.JSONDecodeError, OSError, UnicodeDecodeError):
+            return HistoryStore(), 0
+        # Skip the cache if the snapshot was replaced while it was parsed
+        if self.stat_key(os.stat(self.history_file)) == self.stat_key(before):
+            self.write_snapshot_cache(calculations, last_seq, limit, before)
+        return calculations, last_seq
+    
+    def stat_key(self, stat) -> tuple:
+        """Modification time and size identifying one snapshot file"""
+        return stat.st_mtime_ns, stat.st_size
+    
+    def read_snapshot_cache(self, limit: int) -> Optional[Tuple[HistoryStore, int]]:
+        """Load the binary snapshot cache if it matches the JSON snapshot"""
+        try:
+            stat = os.stat(self.history_file)
+            with open(self.snapshot_cache_file, 'rb') as f:
+                data = f.read()
+        except OSError:
+            return None
+        try:
+            magic, mtime_ns, size, last_seq, max_entries = \
+                SNAPSHOT_CACHE_HEADER.unpack_from(data, 0)
+            if magic != SNAPSHOT_CACHE_MAGIC or (mtime_ns, size) != self.stat_key(stat) \
+                    or max_entries != limit:
+                return None
+            calculations = HistoryStore.from_bytes(
+                memoryview(data)[SNAPSHOT_CACHE_HEADER.size:])
+        except (struct.error, ValueError):
+            return None
+        return calculations, last_seq
+    
+    def write_snapshot_cache(self, calculations: HistoryStore, last_seq: int, limit: int,
+                             stat=None):
+        """Mirror the JSON snapshot (as of stat) into the binary cache file"""
+        temp_file = self.snapshot_cache_file + ".tmp"
+        try:
+            if stat is None:
+                stat = os.stat(self.history_file)
+            header = SNAPSHOT_CACHE_HEADER.pack(SNAPSHOT_CACHE_MAGIC, *self.stat_key(stat),
+                                                last_seq, limit)
+            with open(temp_file, 'wb') as f:
+                f.write(header)
+                f.write(calculations.to_bytes())
+            os.replace(temp_file, self.snapshot_cache_file)
+        except (OSError, ValueError) as e:
+            print(f"Error saving history cache: {e}")
+    
+    def install_history(self, calculations: HistoryStore):
+        """Adopt a history produced by load_history() after defer_load
+        
+        Calculations added in the meantime are appended and journaled, and
+        listeners get a "reset" event.
+        """
+        with self._lock:
+            if self.loaded:
+                return
+            self.calculations = calculations
+            calculations.enable_stats(self.stats_bucket)
+            self.loaded = True
+            for calculation in self._deferred:
+                if calculation is None:
+                    # clear_history() was called before the load finished
+                    self.calculations = self.calculations.empty()
+                    self.journal({"op": "clear"})
+                    continue
+                self.append_calculation(calculation)
+                self.journal(dict(calculation))
+            self._deferred = []
+        self.notify("reset", None)
+        if self._journal_size >= self.compact_threshold:
+            self.start_compaction()
+    
+    def read_journal(self) -> List[Dict]:
+        """Read journal records, truncating a torn last line if present"""
+        self._journal_head = b""
+        if not os.path.exists(self.journal_file):
+            self._journal_size = 0
+            return []
+        
+        records = []
+        good_size = 0
+        try:
+            with open(self.journal_file, 'rb') as f:
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        # Partial write from a crash: drop it
+                        break
+                    if not good_size:
+                        self._journal_head = line
+                    try:
+                        records.append(json.loads(line))
+                    except (json.JSONDecodeError, UnicodeDecodeError):
+                        pass
+                    good_size += len(line)
+                torn = f.tell() != good_size
+            if torn:
+                with open(self.journal_file, 'r+b') as f:
+                    f.truncate(good_size)
+        except OSError as e:
+            print(f"Error reading history journal: {e}")
+        self._journal_size = good_size
+        return records
     
-    def load_history(self) -> List[Dict]:
-        """Load history from JSON file"""
-        if os.path.exists(self.history_file):
+    def read_journal_tail(self):
+        """Read records other instances appended since the last read
+        
+        The caller holds the file and io locks. New records are queued for
+        sync(). A journal replaced by another instance's compaction starts
+        with a marker holding the snapshot's last_seq; if that is past the
+        records read so far, the history is marked stale for a reload.
+        """
+        try:
+            with open(self.journal_file, 'rb') as f:
+                head = f.readline()
+                if not head.endswith(b"\n"):
+                    head = b""
+                replaced = head != self._journal_head
+                offset = 0 if replaced else self._journal_size
+                f.seek(offset)
+                data = f.read()
+        except FileNotFoundError:
+            if self._journal_size:
+                self._stale = True
+            self._journal_head = b""
+            self._journal_size = 0
+            return
+        end = data.rfind(b"\n") + 1
+        
+        # Only a journal we had already read from can have been replaced
+        first = replaced and self._journal_size > 0
+        for line in data[:end].splitlines():
             try:
-                with open(self.history_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    return data.get('calculations', [])
-            except (json.JSONDecodeError, FileNotFoundError, UnicodeDecodeError):
-                return []
-        return []
+                record = json.loads(line)
+            except (json.JSONDecodeError, UnicodeDecodeError):
+                continue
+            seq = record.get("seq", 0)
+            if first:
+                first = False
+                if record.get("op") == "compact":
+                    if seq > self.last_seq:
+                        self._stale = True
+                else:
+                    # Rewritten without a marker: nothing is known about it
+                    self._stale = True
+            if seq <= self.last_seq:
+                continue
+            self.last_seq = seq
+            if record.get("op") != "compact":
+                self._incoming.append(record)
+        
+        if end < len(data):
+            # Partial write from a crashed instance: drop it
+            with open(self.journal_file, 'r+b') as f:
+                f.truncate(offset + end)
+        self._journal_head = head
+        self._journal_size = offset + end
+    
+    def sync(self):
+        """Apply records other instances appended to the shared journal
+        
+        Only the bytes added since the last read are parsed. Call it on the
+        thread that owns the listeners, e.g. whenever the journal changes;
+        listeners get the usual "trimmed" and "added" events, or "reset"
+        after a clear or when the history had to be reloaded.
+        """
+        if not self.shared or not self.loaded:
+            return
+        try:
+            with self._file_lock, self._io_lock:
+                self.read_journal_tail()
+                incoming, self._incoming = self._incoming, []
+                stale, self._stale = self._stale, False
+        except OSError as e:
+            print(f"Error reading history journal: {e}")
+            return
+        if stale or any(record.get("op") == "clear" for record in incoming):
+            # Local calculations may sit on either side of the clear in the
+            # journal, so take the order from the files
+            self.reload()
+            return
+        
+        for record in incoming:
+            calculation = CalculationView(record["expression"], record["result"],
+                                          parse_timestamp(record.get("timestamp", "")))
+            with self._lock:
+                trimmed = self.append_calculation(calculation)
+            if trimmed:
+                self.notify("trimmed", trimmed)
+            self.notify("added", calculation)
+    
+    def reload(self):
+        """Replace the in-memory history with the one in the shared files"""
+        # Queued local records must be in the journal to be read back
+        self.flush()
+        with self._lock:
+            try:
+                with self._file_lock, self._io_lock:
+                    self.calculations = self._load_history()
+                    self._incoming = []
+                    self._stale = False
+            except OSError as e:
+                print(f"Error reading history journal: {e}")
+                return
+            self.calculations.enable_stats(self.stats_bucket)
+            if self.search_index:
+                self.calculations.enable_index()
+        self.notify("reset", None)
+    
+    def journal(self, record: Dict):
+        """Number a record and append it to the journal
+        
+        Shared journals number records as they are written instead, since
+        other instances append to the same sequence.
+        """
+        if not self.shared:
+            self.last_seq += 1
+            record["seq"] = self.last_seq
+            self.append_journal(record)
+        elif record.get("op") == "clear":
+            # The clear is already visible in memory, so it has to reach the
+            # journal before sync() reads anything that came after it
+            self.flush()
+            self.write_journal([record], sync=self.fsync == "flush")
+        else:
+            self.append_journal(record)
+    
+    def append_journal(self, record: Dict):
+        """Append one record to the journal or hand it to the writer thread"""
+        if self._queue is not None:
+            # Blocks only when the writer has fallen queue_size records behind
+            self._queue.put(record)
+        else:
+            self.write_journal([record], sync=self.fsync == "flush")
+    
+    def write_journal(self, records: List[Dict], sync: bool = False):
+        """Write journal records in one call, compacting when it grows large"""
+        with self.shared_lock(), self._io_lock:
+            try:
+                if self.shared:
+                    self.number_records(records)
+                data = "".join(json.dumps(record, ensure_ascii=False) + "\n"
+                               for record in records)
+                if self.shared:
+                    self.append_shared(data.encode('utf-8'), sync)
+                else:
+                    if self._journal is None:
+                        self._journal = open(self.journal_file, 'a', encoding='utf-8')
+                    self._journal.write(data)
+                    self._journal.flush()
+                    if sync:
+                        os.fsync(self._journal.fileno())
+                    self._journal_size += len(data.encode('utf-8'))
+            except Exception as e:
+                print(f"Error saving history: {e}")
+                return
+        
+        if self._journal_size >= self.compact_threshold:
+            self.start_compaction()
+    
+    def number_records(self, records: List[Dict]):
+        """Catch up with the shared journal, then number records after it
+        
+        The caller holds the file and io locks. Records read here that came
+        before a clear being written are dropped along with everything else.
+        """
+        self.read_journal_tail()
+        for record in records:
+            self.last_seq += 1
+            record["seq"] = self.last_seq
+            if record.get("op") == "clear":
+                self._incoming = []
+    
+    def append_shared(self, data: bytes, sync: bool):
+        """Append to the shared journal through a handle open only meanwhile
+        
+        A handle kept open would stop other instances from replacing the
+        journal on Windows. The caller holds the file and io locks.
+        """
+        with open(self.journal_file, 'ab') as f:
+            f.write(data)
+            f.flush()
+            if sync:
+                os.fsync(f.fileno())
+        if not self._journal_size:
+            self._journal_head = data[:data.index(b"\n") + 1]
+        self._journal_size += len(data)
+    
+    def run_writer(self):
+        """Background loop that writes queued journal records in batches"""
+        sync = self.fsync == "flush"
+        while True:
+            record = self._queue.get()
+            batch = []
+            done = record is None
+            if not done:
+                batch.append(record)
+                # Collect whatever else arrives within the flush interval
+                deadline = time.monotonic() + self.flush_interval
+                while True:
+                    remaining = deadline - time.monotonic()
+                    try:
+                        record = self._queue.get(timeout=remaining) if remaining > 0 \
+                            else self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if record is None:
+                        done = True
+                        break
+                    batch.append(record)
+            if batch:
+                self.write_journal(batch, sync=sync)
+            for _ in range(len(batch) + (1 if done else 0)):
+                self._queue.task_done()
+            if done:
+                return
+    
+    def flush(self):
+        """Block until every queued journal record has been written"""
+        if self._queue is not None:
+            self._queue.join()
+    
+    def start_compaction(self):
+        """Fold the journal into the snapshot on a background thread"""
+        if self._compactor is not None and self._compactor.is_alive():
+            return
+        self._compactor = threading.Thread(target=self.save_history,
+                                           name="history-compactor", daemon=True)
+        self._compactor.start()
     
     def save_history(self):
-        """Save history to JSON file"""
+        """Save history to the JSON snapshot and trim the journal"""
+        with metrics.time(SAVE_SECONDS):
+            self._save_history()
+    
+    def _save_history(self):
+        """Write the snapshot, then drop journal records it now covers"""
+        if self.shared:
+            self.compact_shared()
+            return
+        with self._lock:
+            calculations = self.calculations.copy()
+            last_seq = self.last_seq
+        
         try:
-            data = {"calculations": self.calculations}
-            with open(self.history_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
+            data = {"calculations": calculations.to_dicts(), "last_seq": last_seq}
+            self.write_atomic(self.history_file,
+                              json.dumps(data, indent=2, ensure_ascii=False))
         except Exception as e:
             print(f"Error saving history: {e}")
+            return
+        self.write_snapshot_cache(calculations, last_seq, self.max_entries)
+        
+        # Keep only records appended while the snapshot was being written
+        with self._io_lock:
+            try:
+                if self._journal is not None:
+                    self._journal.close()
+                    self._journal = None
+                remaining = [r for r in self.read_journal() if r.get("seq", 0) > last_seq]
+                lines = "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in remaining)
+                self.write_atomic(self.journal_file, lines)
+                self._journal_size = len(lines.encode('utf-8'))
+            except Exception as e:
+                print(f"Error compacting history journal: {e}")
+    
+    def compact_shared(self):
+        """Fold the shared journal into the snapshot, both read from disk
+        
+        Other instances may have appended records this one has not applied
+        yet, so the snapshot is rebuilt from the files rather than memory.
+        The new journal holds one marker record with the snapshot's last_seq.
+        """
+        with self._file_lock, self._io_lock:
+            try:
+                self.read_journal_tail()
+                if self._journal_size < self.compact_threshold:
+                    # Another instance compacted while we waited for the lock
+                    return
+                # Other instances may keep more calculations than this
+                # one, so the shared snapshot is never trimmed
+                calculations, last_seq = self.read_history(limit=0)
+                data = {"calculations": calculations.to_dicts(), "last_seq": last_seq}
+                self.write_atomic(self.history_file,
+                                  json.dumps(data, indent=2, ensure_ascii=False))
+                self.write_snapshot_cache(calculations, last_seq, 0)
+                
+                marker = json.dumps({"seq": last_seq, "op": "compact"}) + "\n"
+                self.write_atomic(self.journal_file, marker)
+                self._journal_head = marker.encode('utf-8')
+                self._journal_size = len(self._journal_head)
+            except Exception as e:
+                print(f"Error saving history: {e}")
+    
+    def write_atomic(self, filename: str, text: str):
+        """Write a file via a temporary file and rename"""
+        temp_file = filename + ".tmp"
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_file, filename)
+    
+    def close(self):
+        """Flush pending records, wait for compaction and close the journal"""
+        if not self.loaded:
+            # Nothing deferred may be lost, even if the load never finished
+            self.install_history(self.load_history())
+        if self._writer is not None:
+            self._queue.put(None)
+            self._writer.join()
+            self._writer = None
+            self._queue = None
+        compactor = self._compactor
+        if compactor is not None:
+            compactor.join()
+        with self._io_lock:
+            if self._journal is not None:
+                if self.fsync != "never":
+                    self._journal.flush()
+                    os.fsync(self._journal.fileno())
+                self._journal.close()
+                self._journal = None
+        if self._file_lock is not None:
+            if self.fsync == "close" and os.path.exists(self.journal_file):
+                with self._file_lock, open(self.journal_file, 'ab') as f:
+                    os.fsync(f.fileno())
+            self._file_lock.close()
     
-    def export_history(self, filename: str = None) -> bool:
-        """Export history to a file"""
+    def export_history(self, filename: str = None, fmt: str = None) -> bool:
+        """Export history to a file
+        
+        fmt is one of history_io.FORMATS ("json", "jsonl", "csv", "binary")
+        and defaults to the one matching the file extension.
+        """
         if not filename:
             filename = f"calculator_history_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
         
+        from history_io import export_calculations
+        
+        with self._lock:
+            calculations = self.calculations.copy()
         try:
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump({"calculations": self.calculations}, f, indent=2, ensure_ascii=False)
+            export_calculations(calculations, filename, fmt)
             return True
         except Exception:
             return False
@@ -80,8 +741,43 @@ class HistoryManager:
         if not search_term:
             return self.calculations
         
-        search_term = search_term.lower()
-        return [
-            calc for calc in self.calculations
-            if search_term in calc['expression'].lower() or search_term in calc['result'].lower()
-        ]
+        with metrics.time(SEARCH_SECONDS):
+            with self._lock:
+                self.calculations.enable_index()
+                return self.calculations.search(search_term)
+    
+    def query_history(self, text: str = None, prefix: str = None, minimum: float = None,
+                      maximum: float = None) -> Iterator[CalculationView]:
+        """Calculations matching every given condition, newest first
+        
+        text is searched for in expressions and results, prefix must start
+        the result, and minimum and maximum bound its numeric value. Rows
+        are looked up and yielded one at a time, so taking the first page
+        costs the same at any history size; run the query again once the
+        history has changed.
+        """
+        with self._lock:
+            self.calculations.enable_index()
+            rows = self.calculations.query(text, prefix, minimum, maximum)
+        while True:
+            with self._lock:
+                calculation = next(rows, None)
+            if calculation is None:
+                return
+            yield calculation
+
+
+def create_history_manager(backend: str = "json", path: str = None, max_entries: int = 0):
+    """Create a history manager for the given storage backend
+    
+    JSON histories keep max_entries calculations, all of them by default
+    like the window, which reads and compacts the same files.
+    """
+    if backend == "sqlite":
+        from sqlite_history import SQLiteHistoryManager
+        return SQLiteHistoryManager(path or "history.db")
+    if backend == "json":
+        # The window opens the same files in shared mode, so every writer
+        # must take the lock and number its records from the journal
+        return HistoryManager(path or "history.json", max_entries=max_entries, shared=True)
+    raise ValueError(f"Unknown history backend: {backend}")
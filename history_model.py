@@ -0,0 +1,117 @@
+"""
+History Model Module
+Qt list model exposing HistoryManager entries to item views
+"""
+
+from itertools import islice
+from PySide6.QtCore import QAbstractListModel, QModelIndex, Qt
+
+class HistoryListModel(QAbstractListModel):
+    """List model over a HistoryManager, oldest calculation first
+
+    The model listens to history change events and inserts or removes only
+    the affected rows, so attaching it to a view with uniform item sizes
+    keeps every update constant-cost regardless of history length.
+    """
+
+    def __init__(self, history, parent=None):
+        super().__init__(parent)
+        self.history = history
+        # Row count as last announced to views; only changed between
+        # begin/end notifications so views always see a consistent model
+        self._count = len(history.get_history())
+        history.add_listener(self.on_history_changed)
+
+    def rowCount(self, parent=QModelIndex()):
+        """Number of calculations in the history"""
+        if parent.isValid():
+            return 0
+        return self._count
+
+    def data(self, index, role=Qt.DisplayRole):
+        """Return the display text or timestamp tooltip for a row"""
+        if not index.isValid() or not 0 <= index.row() < self._count:
+            return None
+        calc = self.history.get_history()[index.row()]
+        if role == Qt.DisplayRole:
+            return f"{calc['expression']} = {calc['result']}"
+        if role == Qt.ToolTipRole:
+            return calc['timestamp']
+        return None
+
+    def on_history_changed(self, event, payload):
+        """Translate history change events into row notifications"""
+        if event == "added":
+            self.beginInsertRows(QModelIndex(), self._count, self._count)
+            self._count += 1
+            self.endInsertRows()
+        elif event == "trimmed":
+            count = min(payload, self._count)
+            if count:
+                self.beginRemoveRows(QModelIndex(), 0, count - 1)
+                self._count -= count
+                self.endRemoveRows()
+        else:
+            self.beginResetModel()
+            self._count = len(self.history.get_history())
+            self.endResetModel()
+
+    def detach(self):
+        """Stop listening to the history manager"""
+        self.history.remove_listener(self.on_history_changed)
+
+
+class HistorySearchModel(QAbstractListModel):
+    """List model over the results of a history query, newest first
+
+    Results come from a lazy iterator such as HistoryManager.query_history
+    and are pulled in batches only as views scroll to them, so a filter
+    that matches most of a long history still looks up just one screenful.
+    """
+
+    BATCH_SIZE = 100
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.rows = []
+        self.results = None
+
+    def set_results(self, results):
+        """Replace the rows with the results of a new query"""
+        self.beginResetModel()
+        self.rows = []
+        self.results = results
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        """Number of results fetched so far"""
+        if parent.isValid():
+            return 0
+        return len(self.rows)
+
+    def data(self, index, role=Qt.DisplayRole):
+        """Return the display text or timestamp tooltip for a row"""
+        if not index.isValid() or not 0 <= index.row() < len(self.rows):
+            return None
+        calc = self.rows[index.row()]
+        if role == Qt.DisplayRole:
+            return f"{calc['expression']} = {calc['result']}"
+        if role == Qt.ToolTipRole:
+            return calc['timestamp']
+        return None
+
+    def canFetchMore(self, parent=QModelIndex()):
+        """True until the query has run out of results"""
+        return not parent.isValid() and self.results is not None
+
+    def fetchMore(self, parent=QModelIndex()):
+        """Pull the next batch of results from the query"""
+        if parent.isValid() or self.results is None:
+            return
+        batch = list(islice(self.results, self.BATCH_SIZE))
+        if len(batch) < self.BATCH_SIZE:
+            self.results = None
+        if batch:
+            self.beginInsertRows(QModelIndex(), len(self.rows), len(self.rows) + len(batch) - 1)
+            self.rows.extend(batch)
+            self.endInsertRows()
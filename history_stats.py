@@ -0,0 +1,171 @@
+"""
+History Stats Module
+Running aggregates over numeric calculation results
+"""
+
+import math
+from collections import deque, namedtuple
+from fractions import Fraction
+from typing import Dict, List, Optional, Tuple
+
+# Aggregates of one group of results; mean, variance, stddev, minimum and
+# maximum are None while count is 0, and variance is the sample variance
+StatsSummary = namedtuple("StatsSummary", ["count", "total", "mean", "variance", "stddev",
+                                           "minimum", "maximum"])
+
+# Width of the time buckets, in seconds
+DEFAULT_BUCKET_SECONDS = 3600
+
+
+def parse_result(text: str) -> Optional[float]:
+    """Numeric value of a history result string, or None if it has none"""
+    try:
+        value = float(text)
+    except ValueError:
+        # Fraction mode results look like "1/3"
+        try:
+            value = float(Fraction(text))
+        except (ValueError, ZeroDivisionError, OverflowError):
+            return None
+    return value if math.isfinite(value) else None
+
+
+class RunningStats:
+    """Count, total, mean, variance, min and max of a stream of numbers
+
+    Values are added at the end and removed from the front, oldest first,
+    both in amortized O(1): mean and variance follow Welford's update and
+    its inverse, min and max come from monotonic deques of the values
+    still present.
+    """
+
+    __slots__ = ("count", "total", "mean", "_m2", "_added", "_removed", "_mins", "_maxs")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.mean = 0.0
+        self._m2 = 0.0
+        # Positions of the next value added and the next one removed
+        self._added = 0
+        self._removed = 0
+        # (position, value) candidates, increasing and decreasing by value
+        self._mins = deque()
+        self._maxs = deque()
+
+    def add(self, value: float):
+        """Add a value at the end of the stream"""
+        self.count += 1
+        self.total += value
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+
+        position = self._added
+        self._added += 1
+        mins = self._mins
+        while mins and mins[-1][1] >= value:
+            mins.pop()
+        mins.append((position, value))
+        maxs = self._maxs
+        while maxs and maxs[-1][1] <= value:
+            maxs.pop()
+        maxs.append((position, value))
+
+    def remove_oldest(self, value: float):
+        """Remove the oldest value still in the stream, which must be value"""
+        if self.count <= 1:
+            self.clear()
+            return
+        self.count -= 1
+        self.total -= value
+        delta = value - self.mean
+        self.mean -= delta / self.count
+        # Rounding can leave a tiny negative sum of squares behind
+        self._m2 = max(0.0, self._m2 - delta * (value - self.mean))
+
+        position = self._removed
+        self._removed += 1
+        if self._mins and self._mins[0][0] == position:
+            self._mins.popleft()
+        if self._maxs and self._maxs[0][0] == position:
+            self._maxs.popleft()
+
+    def clear(self):
+        """Forget every value"""
+        self.count = 0
+        self.total = 0.0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self._added = 0
+        self._removed = 0
+        self._mins.clear()
+        self._maxs.clear()
+
+    def summary(self) -> StatsSummary:
+        """Current aggregates"""
+        if not self.count:
+            return StatsSummary(0, 0.0, None, None, None, None, None)
+        variance = self._m2 / (self.count - 1) if self.count > 1 else 0.0
+        return StatsSummary(self.count, self.total, self.mean, variance, math.sqrt(variance),
+                            self._mins[0][1], self._maxs[0][1])
+
+
+class HistoryStats:
+    """Running aggregates over the numeric results in a history
+
+    overall covers every calculation in the history and buckets group them
+    by bucket_seconds of their timestamps. Calculations are added newest
+    last and trimmed oldest first, matching HistoryStore; results without
+    a numeric value are skipped.
+    """
+
+    def __init__(self, bucket_seconds: int = DEFAULT_BUCKET_SECONDS):
+        self.bucket_seconds = bucket_seconds
+        self.overall = RunningStats()
+        self.buckets: Dict[int, RunningStats] = {}
+
+    @classmethod
+    def from_history(cls, calculations, bucket_seconds: int = DEFAULT_BUCKET_SECONDS):
+        """Aggregate an existing history in one pass"""
+        stats = cls(bucket_seconds)
+        for calculation in calculations:
+            stats.add(calculation.result, calculation.epoch)
+        return stats
+
+    def add(self, result: str, epoch: int):
+        """Count a calculation appended to the history"""
+        value = parse_result(result)
+        if value is None:
+            return
+        self.overall.add(value)
+        start = epoch - epoch % self.bucket_seconds
+        bucket = self.buckets.get(start)
+        if bucket is None:
+            bucket = self.buckets[start] = RunningStats()
+        bucket.add(value)
+
+    def remove_oldest(self, result: str, epoch: int):
+        """Uncount the oldest calculation, trimmed from the history"""
+        value = parse_result(result)
+        if value is None:
+            return
+        self.overall.remove_oldest(value)
+        start = epoch - epoch % self.bucket_seconds
+        bucket = self.buckets.get(start)
+        if bucket is not None:
+            bucket.remove_oldest(value)
+            if not bucket.count:
+                del self.buckets[start]
+
+    def clear(self):
+        """Forget every calculation"""
+        self.overall.clear()
+        self.buckets.clear()
+
+    def by_bucket(self, start: int = None, end: int = None) -> List[Tuple[int, StatsSummary]]:
+        """(bucket start epoch, aggregates) for buckets starting in [start, end)"""
+        return [(bucket_start, self.buckets[bucket_start].summary())
+                for bucket_start in sorted(self.buckets)
+                if (start is None or bucket_start >= start)
+                and (end is None or bucket_start < end)]
@@ -0,0 +1,512 @@
+"""
+History Store Module
+Compact columnar storage for calculation history
+"""
+
+import math
+import struct
+import time
+from array import array
+from bisect import bisect_left
+from collections.abc import Mapping, Sequence
+from typing import Dict, Iterator, List, Optional
+from history_index import HistoryIndex
+from history_stats import DEFAULT_BUCKET_SECONDS, HistoryStats, parse_result
+
+# Trimmed rows are only physically removed once this many have accumulated
+COMPACT_MIN_ROWS = 1024
+
+# Binary snapshot layout: magic, row count, pool sizes, pool text lengths,
+# sorted flag; then the id and epoch columns, pool refs and pool text
+STORE_MAGIC = b"PYCALCS1"
+STORE_HEADER = struct.Struct("<8sQQQQQ?")
+
+
+class StringPool:
+    """Reference-counted string interning with integer ids"""
+
+    def __init__(self):
+        self.ids = {}
+        self.values = []
+        self.refs = array('I')
+        self.free = []
+
+    def add(self, value: str) -> int:
+        """Return the id for value, adding a reference"""
+        index = self.ids.get(value)
+        if index is not None:
+            self.refs[index] += 1
+        elif self.free:
+            index = self.ids[value] = self.free.pop()
+            self.values[index] = value
+            self.refs[index] = 1
+        else:
+            index = self.ids[value] = len(self.values)
+            self.values.append(value)
+            self.refs.append(1)
+        return index
+
+    def release(self, index: int):
+        """Drop one reference, freeing the slot when it was the last"""
+        self.refs[index] -= 1
+        if not self.refs[index]:
+            del self.ids[self.values[index]]
+            self.values[index] = None
+            self.free.append(index)
+
+    def matching(self, term: str) -> set:
+        """Ids of pooled strings containing term, case-insensitively"""
+        return {index for value, index in self.ids.items() if term in value.lower()}
+
+    def copy(self) -> "StringPool":
+        """Independent copy of the pool"""
+        pool = StringPool()
+        pool.ids = dict(self.ids)
+        pool.values = list(self.values)
+        pool.refs = array('I', self.refs)
+        pool.free = list(self.free)
+        return pool
+
+    def __len__(self):
+        return len(self.ids)
+
+
+class CalculationView(Mapping):
+    """Read-only dict-compatible view of one stored calculation
+
+    Behaves like {"expression", "result", "timestamp"}; the timestamp is
+    formatted from the stored epoch seconds on access, and epoch exposes
+    the integer directly.
+    """
+
+    __slots__ = ("expression", "result", "epoch")
+
+    KEYS = ("expression", "result", "timestamp")
+
+    def __init__(self, expression: str, result: str, epoch: int):
+        self.expression = expression
+        self.result = result
+        self.epoch = epoch
+
+    @property
+    def timestamp(self) -> str:
+        """Local time formatted like the JSON history file"""
+        return format_timestamp(self.epoch)
+
+    def __getitem__(self, key):
+        if key == "expression":
+            return self.expression
+        if key == "result":
+            return self.result
+        if key == "timestamp":
+            return format_timestamp(self.epoch)
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(self.KEYS)
+
+    def __len__(self):
+        return len(self.KEYS)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+class HistoryStore(Sequence):
+    """Calculation history held in parallel typed arrays
+
+    Each row costs two 4-byte string ids and one 8-byte epoch. Expressions
+    and results are interned in reference-counted pools, so repeated
+    calculations share their text, and searches scan each distinct string
+    once. Dropping the oldest rows only moves a start offset; the arrays
+    are compacted once enough dead rows have built up. Indexing returns
+    CalculationView objects, which snapshot the row at access time.
+
+    enable_index() attaches a HistoryIndex that appends and drops keep up
+    to date, so query() and search() look candidates up instead of
+    scanning. Rows keep the same id, their position plus _base, across
+    compactions. enable_stats() attaches HistoryStats kept up to date the
+    same way.
+    """
+
+    def __init__(self):
+        self.expressions = StringPool()
+        self.results = StringPool()
+        self._expression_ids = array('I')
+        self._result_ids = array('I')
+        self._epochs = array('q')
+        self._start = 0
+        self._base = 0
+        self._sorted = True
+        self.index: Optional[HistoryIndex] = None
+        self.stats: Optional[HistoryStats] = None
+
+    def append(self, expression: str, result: str, epoch: int):
+        """Add one calculation at the end"""
+        epochs = self._epochs
+        if self._sorted and len(epochs) > self._start and epoch < epochs[-1]:
+            self._sorted = False
+        if self.index is not None:
+            self.index.add(self._base + len(epochs), expression, result)
+        if self.stats is not None:
+            self.stats.add(result, epoch)
+        self._expression_ids.append(self.expressions.add(expression))
+        self._result_ids.append(self.results.add(result))
+        epochs.append(epoch)
+
+    def append_record(self, record: Mapping):
+        """Add a calculation given as a history dict"""
+        self.append(record["expression"], record["result"],
+                    parse_timestamp(record.get("timestamp", "")))
+
+    def extend_records(self, records):
+        """Add calculations given as history dicts, in bulk"""
+        add_expression = self.expressions.add
+        add_result = self.results.add
+        expression_ids = []
+        result_ids = []
+        epochs = []
+        for record in records:
+            expression_ids.append(add_expression(record["expression"]))
+            result_ids.append(add_result(record["result"]))
+            epochs.append(parse_timestamp(record.get("timestamp", "")))
+        if not epochs:
+            return
+        if self.index is not None:
+            row = self._base + len(self._epochs)
+            expressions = self.expressions.values
+            results = self.results.values
+            for i, (expression_id, result_id) in enumerate(zip(expression_ids, result_ids)):
+                self.index.add(row + i, expressions[expression_id], results[result_id])
+        if self.stats is not None:
+            results = self.results.values
+            for result_id, epoch in zip(result_ids, epochs):
+                self.stats.add(results[result_id], epoch)
+        if self._sorted and (
+                (len(self) and epochs[0] < self._epochs[-1])
+                or any(a > b for a, b in zip(epochs, epochs[1:]))):
+            self._sorted = False
+        self._expression_ids.extend(expression_ids)
+        self._result_ids.extend(result_ids)
+        self._epochs.extend(epochs)
+
+    def drop_oldest(self, count: int):
+        """Remove the count oldest calculations"""
+        count = min(count, len(self))
+        start = self._start
+        if self.stats is not None:
+            results = self.results.values
+            for i in range(start, start + count):
+                self.stats.remove_oldest(results[self._result_ids[i]], self._epochs[i])
+        for i in range(start, start + count):
+            self.expressions.release(self._expression_ids[i])
+            self.results.release(self._result_ids[i])
+        self._start = start + count
+        if self.index is not None:
+            self.index.drop_before(self._base + self._start)
+        if self._start >= COMPACT_MIN_ROWS and self._start * 2 >= len(self._epochs):
+            self.compact()
+
+    def compact(self):
+        """Physically drop rows hidden by drop_oldest"""
+        start = self._start
+        if start:
+            del self._expression_ids[:start]
+            del self._result_ids[:start]
+            del self._epochs[:start]
+            self._base += start
+            self._start = 0
+
+    def clear(self):
+        """Remove every calculation"""
+        indexed = self.index is not None
+        stats = self.stats
+        self.__init__()
+        if indexed:
+            self.enable_index()
+        if stats is not None:
+            self.enable_stats(stats.bucket_seconds)
+
+    def empty(self) -> "HistoryStore":
+        """New empty store, indexed and aggregated if this one is"""
+        store = HistoryStore()
+        if self.index is not None:
+            store.enable_index()
+        if self.stats is not None:
+            store.enable_stats(self.stats.bucket_seconds)
+        return store
+
+    def enable_index(self) -> HistoryIndex:
+        """Index the rows for query() and search(), once"""
+        if self.index is None:
+            index = HistoryIndex(self._base + self._start)
+            expressions = self.expressions.values
+            results = self.results.values
+            row = index.first
+            for expression_id, result_id in zip(self._expression_ids[self._start:],
+                                                self._result_ids[self._start:]):
+                index.add(row, expressions[expression_id], results[result_id])
+                row += 1
+            self.index = index
+        return self.index
+
+    def enable_stats(self, bucket_seconds: int = DEFAULT_BUCKET_SECONDS) -> HistoryStats:
+        """Aggregate the numeric results, once"""
+        if self.stats is None:
+            stats = HistoryStats(bucket_seconds)
+            results = self.results.values
+            for result_id, epoch in zip(self._result_ids[self._start:],
+                                        self._epochs[self._start:]):
+                stats.add(results[result_id], epoch)
+            self.stats = stats
+        return self.stats
+
+    def copy(self) -> "HistoryStore":
+        """Independent copy, cheap enough to take under a lock; never indexed or aggregated"""
+        store = HistoryStore()
+        start = self._start
+        store.expressions = self.expressions.copy()
+        store.results = self.results.copy()
+        store._expression_ids = self._expression_ids[start:]
+        store._result_ids = self._result_ids[start:]
+        store._epochs = self._epochs[start:]
+        store._sorted = self._sorted
+        return store
+
+    def row(self, index: int) -> CalculationView:
+        """View of the row at an absolute (uncompacted) array position"""
+        return CalculationView(self.expressions.values[self._expression_ids[index]],
+                               self.results.values[self._result_ids[index]],
+                               self._epochs[index])
+
+    def __len__(self):
+        return len(self._epochs) - self._start
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.row(self._start + i) for i in range(*index.indices(len(self)))]
+        length = len(self)
+        if index < 0:
+            index += length
+        if not 0 <= index < length:
+            raise IndexError("history index out of range")
+        return self.row(self._start + index)
+
+    def __iter__(self) -> Iterator[CalculationView]:
+        for i in range(self._start, len(self._epochs)):
+            yield self.row(i)
+
+    def __repr__(self):
+        return f"HistoryStore({len(self)} calculations)"
+
+    def search(self, term: str) -> List[CalculationView]:
+        """Calculations whose expression or result contains term, ignoring case"""
+        term = term.lower()
+        if self.index is not None and len(term) >= 3:
+            # Trigrams narrow the rows down; shorter terms match too many
+            # rows for the lookup to beat one pass over the distinct strings
+            found = list(self.query(term))
+            found.reverse()
+            return found
+        expression_hits = self.expressions.matching(term)
+        result_hits = self.results.matching(term)
+        if not expression_hits and not result_hits:
+            return []
+        start = self._start
+        rows = zip(self._expression_ids[start:], self._result_ids[start:])
+        return [self.row(start + i) for i, (expression_id, result_id) in enumerate(rows)
+                if expression_id in expression_hits or result_id in result_hits]
+
+    def query(self, text: str = None, prefix: str = None, minimum: float = None,
+              maximum: float = None) -> Iterator[CalculationView]:
+        """Calculations matching every given condition, newest first, lazily
+
+        text must occur in the expression or result and prefix must start
+        the result, both ignoring case; minimum and maximum bound the
+        numeric value of the result. Without an index the rows are scanned.
+        """
+        text = text.lower() if text else None
+        prefix = prefix.lower() if prefix else None
+        ranged = minimum is not None or maximum is not None
+        low = -math.inf if minimum is None else minimum
+        high = math.inf if maximum is None else maximum
+        index = self.index
+        if index is None:
+            rows = range(self._base + len(self._epochs) - 1, self._base + self._start - 1, -1)
+        elif text:
+            rows = index.substring(text)
+        elif prefix:
+            rows = index.result_prefix(prefix)
+        elif ranged:
+            rows = index.result_range(low, high)
+        else:
+            rows = range(index.end - 1, index.first - 1, -1)
+        for row in rows:
+            position = row - self._base
+            if position < self._start:
+                return
+            expression = self.expressions.values[self._expression_ids[position]]
+            result = self.results.values[self._result_ids[position]]
+            if text and text not in expression.lower() and text not in result.lower():
+                continue
+            if prefix and not result.lower().startswith(prefix):
+                continue
+            if ranged:
+                value = parse_result(result)
+                if value is None or not low <= value <= high:
+                    continue
+            yield CalculationView(expression, result, self._epochs[position])
+
+    def between(self, start: int, end: int) -> List[CalculationView]:
+        """Calculations with start <= epoch < end, oldest first"""
+        epochs = self._epochs
+        if self._sorted:
+            lo = bisect_left(epochs, start, self._start)
+            hi = bisect_left(epochs, end, lo)
+            return [self.row(i) for i in range(lo, hi)]
+        return [self.row(i) for i in range(self._start, len(epochs))
+                if start <= epochs[i] < end]
+
+    def to_dicts(self) -> List[Dict]:
+        """Plain dict copies of every calculation, oldest first"""
+        return [dict(view) for view in self]
+
+    def to_bytes(self) -> bytes:
+        """Serialize the live rows and string pools in native byte order
+
+        Meant for local caches read back by from_bytes on the same
+        machine. Raises ValueError if a string contains NUL, which is
+        used as the separator.
+        """
+        blobs = []
+        for pool in (self.expressions, self.results):
+            values = ["" if value is None else value for value in pool.values]
+            text = "\0".join(values)
+            if text.count("\0") != max(len(values) - 1, 0):
+                raise ValueError("History text contains NUL characters")
+            blobs.append(text.encode("utf-8"))
+        start = self._start
+        parts = [STORE_HEADER.pack(STORE_MAGIC, len(self), len(self.expressions.values),
+                                   len(self.results.values), len(blobs[0]), len(blobs[1]),
+                                   self._sorted)]
+        for column in (self._expression_ids[start:], self._result_ids[start:],
+                       self._epochs[start:], self.expressions.refs, self.results.refs):
+            parts.append(column.tobytes())
+        parts.extend(blobs)
+        return b"".join(parts)
+
+    @classmethod
+    def from_bytes(cls, data) -> "HistoryStore":
+        """Rebuild a store written by to_bytes"""
+        magic, rows, expression_count, result_count, expression_bytes, result_bytes, \
+            is_sorted = STORE_HEADER.unpack_from(data, 0)
+        if magic != STORE_MAGIC:
+            raise ValueError("Not a history store snapshot")
+        store = cls()
+        position = STORE_HEADER.size
+        columns = []
+        for typecode, count in (('I', rows), ('I', rows), ('q', rows),
+                                ('I', expression_count), ('I', result_count)):
+            column = array(typecode)
+            end = position + column.itemsize * count
+            column.frombytes(data[position:end])
+            columns.append(column)
+            position = end
+        store._expression_ids, store._result_ids, store._epochs = columns[:3]
+        store._sorted = bool(is_sorted)
+        for pool, refs, size in ((store.expressions, columns[3], expression_bytes),
+                                 (store.results, columns[4], result_bytes)):
+            values = bytes(data[position:position + size]).decode("utf-8").split("\0") \
+                if len(refs) else []
+            position += size
+            if len(values) != len(refs):
+                raise ValueError("Corrupt history store snapshot")
+            pool.refs = refs
+            if refs.count(0):
+                pool.values = [value if count else None for value, count in zip(values, refs)]
+                pool.ids = {value: index for index, value in enumerate(pool.values)
+                            if refs[index]}
+                pool.free = [index for index, count in enumerate(refs) if not count]
+            else:
+                pool.values = values
+                pool.ids = dict(zip(values, range(len(values))))
+        return store
+
+    def memory_usage(self) -> int:
+        """Approximate bytes held by columns and pools, excluding string data"""
+        columns = (self._expression_ids, self._result_ids, self._epochs)
+        size = sum(column.itemsize * len(column) for column in columns)
+        for pool in (self.expressions, self.results):
+            size += pool.refs.itemsize * len(pool.refs) + 8 * len(pool.values)
+        if self.index is not None:
+            size += self.index.memory_usage()
+        return size
+
+
+# Time zone offsets and DST switches fall on quarter hours, so every
+# quarter hour shares one local "YYYY-MM-DD HH:" prefix
+QUARTER_HOUR = 900
+
+# Local prefix and first minute-of-hour per quarter-hour block
+_quarter_prefixes = {}
+
+# Zero-padded "00" to "60"; tables below are built by concatenation,
+# which keeps importing this module cheap
+_TWO_DIGITS = [f"{i:02d}" for i in range(61)]
+
+# "MM:SS" text for every second of an hour
+_MINUTE_SECOND_TEXT = [m + ":" + s for m in _TWO_DIGITS[:60] for s in _TWO_DIGITS[:60]]
+
+
+def format_timestamp(epoch: int) -> str:
+    """Format epoch seconds as local time like datetime.now().strftime"""
+    block, offset = divmod(epoch, QUARTER_HOUR)
+    prefix = _quarter_prefixes.get(block)
+    if prefix is None:
+        local = time.localtime(block * QUARTER_HOUR)
+        prefix = (time.strftime("%Y-%m-%d %H:", local), local.tm_min * 60)
+        if len(_quarter_prefixes) > 4096:
+            _quarter_prefixes.clear()
+        _quarter_prefixes[block] = prefix
+    return prefix[0] + _MINUTE_SECOND_TEXT[prefix[1] + offset]
+
+
+# Epoch of the start of each local "YYYY-MM-DD HH" hour seen while parsing
+_hour_starts = {}
+
+# Seconds into the hour for every "MM:SS" suffix, leap seconds included
+_MINUTE_SECONDS = dict(zip([m + ":" + s for m in _TWO_DIGITS[:60] for s in _TWO_DIGITS],
+                           [m * 60 + s for m in range(60) for s in range(61)]))
+
+
+def parse_timestamp(text: str) -> int:
+    """Convert a local "YYYY-MM-DD HH:MM:SS" timestamp to epoch seconds
+
+    The start of each hour is resolved with mktime once and cached, so
+    parsing a history file costs two dict lookups per entry. Malformed
+    values map to 0 so a damaged entry cannot block loading.
+    """
+    try:
+        hour_start = _hour_starts.get(text[:13])
+        if hour_start is None:
+            hour_start = _hour_start(text)
+        return hour_start + _MINUTE_SECONDS[text[14:]]
+    except (ValueError, TypeError, OverflowError, KeyError):
+        return 0
+
+
+def _hour_start(text: str) -> int:
+    """Resolve and cache the epoch of the hour a timestamp falls in"""
+    fields = (int(text[0:4]), int(text[5:7]), int(text[8:10]), int(text[11:13]))
+    hour_start = int(time.mktime(fields + (0, 0, 0, 0, -1)))
+    if len(_hour_starts) > 4096:
+        _hour_starts.clear()
+    _hour_starts[text[:13]] = hour_start
+    return hour_start
+
+
+def to_epoch(value) -> int:
+    """Accept a timestamp string or epoch number and return epoch seconds"""
+    if isinstance(value, str):
+        return parse_timestamp(value)
+    return int(value)
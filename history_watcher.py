@@ -0,0 +1,40 @@
+"""
+History Watcher Module
+Merges calculations from other instances as soon as the shared journal changes
+"""
+
+import os
+from PySide6.QtCore import QFileSystemWatcher, QObject
+
+class HistoryWatcher(QObject):
+    """Calls HistoryManager.sync() whenever the shared journal changes
+
+    The journal's directory is watched too: compaction replaces the journal
+    file, which ends the watch on it, and the journal may not exist yet.
+    """
+
+    def __init__(self, history, parent=None):
+        super().__init__(parent)
+        self.history = history
+        self.journal_file = os.path.abspath(history.journal_file)
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.addPath(os.path.dirname(self.journal_file))
+        self.watch_journal()
+        self.watcher.fileChanged.connect(self.on_changed)
+        self.watcher.directoryChanged.connect(self.on_changed)
+
+    def watch_journal(self):
+        """Watch the journal file if it exists and is not watched already"""
+        if self.journal_file not in self.watcher.files() and os.path.exists(self.journal_file):
+            self.watcher.addPath(self.journal_file)
+
+    def on_changed(self, path):
+        """Apply whatever other instances appended"""
+        self.watch_journal()
+        self.history.sync()
+
+    def stop(self):
+        """Stop watching the history files"""
+        paths = self.watcher.files() + self.watcher.directories()
+        if paths:
+            self.watcher.removePaths(paths)
@@ -0,0 +1,190 @@
+"""
+Input Buffer Module
+Expression being typed, kept as tokens rather than display text
+"""
+
+import re
+from typing import List
+from expression_parser import tokenize
+
+# Display symbols for operators; everything else is shown as typed
+DISPLAY_SYMBOLS = {'*': '×', '/': '÷'}
+
+# Clipboard text may carry display symbols or typographic minus signs
+PASTE_TRANSLATION = str.maketrans({'×': '*', '÷': '/', '−': '-', '\n': ' ', '\t': ' '})
+
+OPERATORS = frozenset(('+', '-', '*', '/', '//', '**'))
+
+NUMBER_PATTERN = re.compile(r"-?(\d+\.?\d*|\.\d+)")
+
+
+def is_number(token: str) -> bool:
+    """True for number tokens, including results and negated numbers"""
+    first = token[1:2] if token[0] == '-' else token[0]
+    return first.isdigit() or first == '.'
+
+
+def is_operand(token: str) -> bool:
+    """True for tokens an operator after which is binary"""
+    return token == ')' or is_number(token) or token[0].isalpha() or token[0] == '_'
+
+
+class InputBuffer:
+    """Tokens of the expression on the calculator display
+
+    Keys edit the last token in place, a paste tokenizes the whole text in
+    one pass, and the display text is rendered from the tokens only when it
+    is needed, so no keystroke re-reads or re-splits the display string.
+    version changes with every edit.
+    """
+
+    def __init__(self):
+        self.tokens: List[str] = []
+        self.error = False
+        self.version = 0
+
+    def changed(self):
+        """Record an edit"""
+        self.version += 1
+
+    def is_empty(self) -> bool:
+        """True when there is nothing to evaluate"""
+        return self.error or not self.tokens
+
+    def digit(self, digit: str):
+        """Type a digit or decimal point"""
+        tokens = self.tokens
+        if self.error:
+            self.error = False
+            tokens.clear()
+        last = tokens[-1] if tokens else None
+        if last is not None and is_number(last):
+            if digit == '.':
+                if '.' in last:
+                    # Only one decimal point per number
+                    return
+                tokens[-1] = last + digit
+            elif last.lstrip('-') == '0':
+                # Replace a lone zero instead of writing a leading zero
+                tokens[-1] = last[:-1] + digit
+            else:
+                tokens[-1] = last + digit
+        else:
+            tokens.append('0.' if digit == '.' else digit)
+        self.changed()
+
+    def operator(self, op: str):
+        """Type an operator, replacing any operators typed right before it
+
+        A minus after another operator starts a negative number instead.
+        """
+        if self.error:
+            return
+        tokens = self.tokens
+        if tokens and tokens[-1] in OPERATORS and op == '-' and tokens[-1] != '-':
+            tokens.append(op)
+        else:
+            while tokens and tokens[-1] in OPERATORS:
+                tokens.pop()
+            if not tokens:
+                tokens.append('0')
+            tokens.append(op)
+        self.changed()
+
+    def backspace(self):
+        """Remove the last character"""
+        if self.error or not self.tokens:
+            return
+        last = self.tokens[-1][:-1]
+        if not last or last == '-':
+            self.tokens.pop()
+        else:
+            self.tokens[-1] = last
+        self.changed()
+
+    def clear(self):
+        """Empty the buffer"""
+        self.tokens.clear()
+        self.error = False
+        self.changed()
+
+    def clear_entry(self):
+        """Remove the number being typed, keeping the pending operation"""
+        if self.error or len(self.tokens) <= 1:
+            self.tokens.clear()
+            self.error = False
+        elif is_number(self.tokens[-1]):
+            self.tokens.pop()
+        else:
+            return
+        self.changed()
+
+    def negate(self):
+        """Change the sign of the number being typed"""
+        if self.error or not self.tokens or not is_number(self.tokens[-1]):
+            return
+        last = self.tokens[-1]
+        self.tokens[-1] = last[1:] if last[0] == '-' else '-' + last
+        self.changed()
+
+    def paste(self, text: str):
+        """Append a whole expression, tokenized in one pass
+
+        Raises ValueError, leaving the buffer unchanged, when the text is
+        not made of expression tokens.
+        """
+        pasted = [token.value for token in tokenize(text.translate(PASTE_TRANSLATION))]
+        if not pasted:
+            return
+        if self.error or self.tokens == ['0']:
+            self.tokens = []
+        elif self.tokens and is_number(self.tokens[-1]) and is_number(pasted[0]):
+            # Digits pasted after a number continue it, as if typed
+            merged = self.tokens[-1] + pasted[0]
+            if not NUMBER_PATTERN.fullmatch(merged):
+                raise ValueError("Invalid expression")
+            self.tokens[-1] = merged
+            pasted = pasted[1:]
+        self.error = False
+        self.tokens.extend(pasted)
+        self.changed()
+
+    def set_result(self, text: str):
+        """Show a result, which further digits extend"""
+        self.tokens = [text] if text else []
+        self.error = False
+        self.changed()
+
+    def set_error(self):
+        """Show an error until the next digit or clear"""
+        self.tokens = []
+        self.error = True
+        self.changed()
+
+    def render(self, symbols=None) -> str:
+        """Join the tokens with spaces around binary operators"""
+        parts = []
+        previous = None
+        for token in self.tokens:
+            shown = symbols.get(token, token) if symbols else token
+            if token in OPERATORS and previous is not None and is_operand(previous):
+                shown = f" {shown} "
+            elif token == '=':
+                shown = " = "
+            elif token == ',':
+                shown = ", "
+            parts.append(shown)
+            previous = token
+        return "".join(parts)
+
+    def expression(self) -> str:
+        """The expression to evaluate"""
+        return "" if self.error else self.render()
+
+    def text(self) -> str:
+        """The display text"""
+        if self.error:
+            return "Error"
+        if not self.tokens:
+            return "0"
+        return self.render(DISPLAY_SYMBOLS)
@@ -5,21 +5,43 @@ Entry point for the calculator application
 """
 
 import sys
-from PySide6.QtWidgets import QApplication
-from calculator_ui import CalculatorUI
+# Imported first so the startup report measures from process start
+from startup import startup
+
+# Command line flags that select headless mode instead of the Qt window
+HEADLESS_FLAGS = ("--eval", "--mode", "--precision", "--history", "--history-backend",
+                  "--processes", "--metrics", "--sweep")
 
 def main():
     """Main application entry point"""
-    app = QApplication(sys.argv)
+    args = sys.argv[1:]
+    if any(arg.split('=')[0] == "--serve" for arg in args):
+        # Run the JSON-RPC evaluation service
+        from calc_server import run
+        sys.exit(run(args))
+    if any(arg.split('=')[0] in HEADLESS_FLAGS for arg in args):
+        # Evaluate from stdin or a file without importing PySide6
+        from headless import run
+        sys.exit(run(args))
+    
+    with startup.phase("imports"):
+        from PySide6.QtWidgets import QApplication
+        from calculator_ui import CalculatorUI
+    
+    with startup.phase("qapplication"):
+        app = QApplication(sys.argv)
     
     # Set application properties
     app.setApplicationName("Python Calculator")
     app.setApplicationVersion("1.0")
     app.setOrganizationName("Calculator App")
     
-    # Create and show calculator window
-    calculator = CalculatorUI()
-    calculator.show()
+    # Create and show calculator window; history and other non-critical
+    # work load after the first paint
+    with startup.phase("window"):
+        calculator = CalculatorUI()
+    with startup.phase("show"):
+        calculator.show()
     
     # Start event loop
     sys.exit(app.exec())
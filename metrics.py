@@ -0,0 +1,245 @@
+"""
+Metrics Module
+Optional timing histograms and counters for the calculator hot paths
+
+Instrumentation is off unless CALCULATOR_METRICS=1 is set or
+metrics.enable() is called. Instrumented code checks metrics.enabled
+before reading the clock, so a disabled registry costs one attribute
+lookup per call site.
+"""
+
+import json
+import os
+import threading
+from bisect import bisect_left
+from time import perf_counter
+from typing import Dict, Optional
+
+# Upper bounds in seconds, from 1 microsecond to 10 seconds
+DEFAULT_BUCKETS = (
+    0.000001, 0.0000025, 0.000005, 0.00001, 0.000025, 0.00005, 0.0001, 0.00025,
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+
+class Counter:
+    """Monotonically increasing count"""
+
+    def __init__(self, name: str, labels: Dict[str, str]):
+        self.name = name
+        self.labels = labels
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: int = 1):
+        """Increase the counter"""
+        with self._lock:
+            self.value += amount
+
+    def reset(self):
+        """Set the counter back to zero"""
+        with self._lock:
+            self.value = 0
+
+    def snapshot(self) -> Dict:
+        """Return the current value"""
+        return {"labels": self.labels, "value": self.value}
+
+
+class Histogram:
+    """Distribution of observed durations in fixed buckets"""
+
+    def __init__(self, name: str, labels: Dict[str, str], buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        """Record one observation"""
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += value
+
+    def reset(self):
+        """Drop all observations"""
+        with self._lock:
+            self.counts = [0] * (len(self.buckets) + 1)
+            self.count = 0
+            self.sum = 0.0
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimate a quantile as the upper bound of the bucket holding it"""
+        with self._lock:
+            counts = list(self.counts)
+            count = self.count
+        if not count:
+            return None
+        rank = q * count
+        seen = 0
+        for bound, bucket_count in zip(self.buckets, counts):
+            seen += bucket_count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+    def snapshot(self) -> Dict:
+        """Return count, sum, bucket counts and quantile estimates"""
+        with self._lock:
+            counts = list(self.counts)
+            count = self.count
+            total = self.sum
+        return {
+            "labels": self.labels,
+            "count": count,
+            "sum": total,
+            "mean": total / count if count else None,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+            "buckets": dict(zip([str(b) for b in self.buckets] + ["+Inf"], counts)),
+        }
+
+
+class MetricsRegistry:
+    """Named counters and histograms with Prometheus and JSON export"""
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self._metrics = {}
+        self._help = {}
+        self._lock = threading.Lock()
+
+    def enable(self):
+        """Start recording"""
+        self.enabled = True
+
+    def disable(self):
+        """Stop recording; instrumented code skips the clock entirely"""
+        self.enabled = False
+
+    def counter(self, name: str, help_text: str = "", **labels) -> Counter:
+        """Get or create a counter"""
+        return self._get(Counter, name, help_text, labels)
+
+    def histogram(self, name: str, help_text: str = "", **labels) -> Histogram:
+        """Get or create a histogram"""
+        return self._get(Histogram, name, help_text, labels)
+
+    def _get(self, kind, name: str, help_text: str, labels: Dict[str, str]):
+        """Look up a metric by name and labels, creating it on first use"""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            metric = self._metrics.get(key)
+            if metric is None:
+                metric = self._metrics[key] = kind(name, labels)
+                if help_text:
+                    self._help.setdefault(name, help_text)
+            elif not isinstance(metric, kind):
+                raise ValueError(f"Metric {name} already registered as {type(metric).__name__}")
+        return metric
+
+    def time(self, histogram: Histogram):
+        """Context manager that observes the duration of its block"""
+        return _Timer(self, histogram)
+
+    def reset(self):
+        """Clear every recorded value, keeping the registered metrics"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            metric.reset()
+
+    def snapshot(self) -> Dict:
+        """Return all metrics as a JSON-compatible dict"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        data = {"counters": {}, "histograms": {}}
+        for metric in metrics:
+            section = "counters" if isinstance(metric, Counter) else "histograms"
+            data[section].setdefault(metric.name, []).append(metric.snapshot())
+        return data
+
+    def to_json(self) -> str:
+        """Render all metrics as JSON"""
+        return json.dumps(self.snapshot(), indent=2)
+
+    def to_prometheus(self) -> str:
+        """Render all metrics in the Prometheus text exposition format"""
+        with self._lock:
+            metrics = sorted(self._metrics.items())
+        lines = []
+        described = set()
+        for (name, _), metric in metrics:
+            if name not in described:
+                described.add(name)
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                kind = "counter" if isinstance(metric, Counter) else "histogram"
+                lines.append(f"# TYPE {name} {kind}")
+            if isinstance(metric, Counter):
+                lines.append(f"{name}{_format_labels(metric.labels)} {metric.value}")
+                continue
+            data = metric.snapshot()
+            cumulative = 0
+            for bound, bucket_count in data["buckets"].items():
+                cumulative += bucket_count
+                labels = _format_labels(dict(metric.labels, le=bound))
+                lines.append(f"{name}_bucket{labels} {cumulative}")
+            labels = _format_labels(metric.labels)
+            lines.append(f"{name}_sum{labels} {data['sum']!r}")
+            lines.append(f"{name}_count{labels} {data['count']}")
+        return "\n".join(lines) + "\n"
+
+    def dump(self, filename: str) -> bool:
+        """Write metrics to a file, as JSON for *.json and Prometheus text otherwise"""
+        text = self.to_json() if filename.endswith(".json") else self.to_prometheus()
+        temp_file = filename + ".tmp"
+        try:
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                f.write(text)
+            os.replace(temp_file, filename)
+            return True
+        except OSError as e:
+            print(f"Error saving metrics: {e}")
+            return False
+
+
+class _Timer:
+    """Context manager returned by MetricsRegistry.time"""
+
+    __slots__ = ("registry", "histogram", "start")
+
+    def __init__(self, registry: MetricsRegistry, histogram: Histogram):
+        self.registry = registry
+        self.histogram = histogram
+        self.start = None
+
+    def __enter__(self):
+        if self.registry.enabled:
+            self.start = perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        if self.start is not None:
+            self.histogram.observe(perf_counter() - self.start)
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    """Render a Prometheus label set"""
+    if not labels:
+        return ""
+    pairs = []
+    for key, value in sorted(labels.items()):
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{key}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+# Process-wide registry used by the instrumented modules
+metrics = MetricsRegistry(enabled=os.environ.get("CALCULATOR_METRICS") == "1")
@@ -0,0 +1,178 @@
+"""
+Numeric Modes Module
+Number domains the expression engine can evaluate in
+"""
+
+import math
+from contextlib import nullcontext
+from decimal import (Decimal, Context, ROUND_FLOOR, ROUND_HALF_EVEN,
+                     DivisionByZero, InvalidOperation, Overflow, localcontext)
+from fractions import Fraction
+from expression_parser import BINARY_OPERATORS, UNARY_OPERATORS, parse_number
+
+DEFAULT_PRECISION = 28
+
+class FloatMode:
+    """Native int/float arithmetic, rounded to 10 places for display"""
+
+    name = "float"
+    precision = None
+
+    def __init__(self):
+        self.binary = BINARY_OPERATORS
+        self.unary = UNARY_OPERATORS
+
+    def literal(self, text: str):
+        """Convert a number literal into this domain"""
+        return parse_number(text)
+
+    def coerce(self, value):
+        """Convert an operand passed to the arithmetic methods"""
+        if isinstance(value, (int, float)):
+            return value
+        return float(value)
+
+    def evaluation_context(self):
+        """Context manager active while a program runs"""
+        return nullcontext()
+
+    def finalize(self, result):
+        """Validate a raw result and normalize it for callers"""
+        if isinstance(result, float):
+            # Overflow and invalid operations surface as inf/nan
+            if not math.isfinite(result):
+                raise ValueError("Invalid calculation result")
+            # Round to avoid floating point precision issues
+            return round(result, 10)
+        if not isinstance(result, int):
+            raise ValueError("Invalid calculation result")
+        return result
+
+    def format(self, value) -> str:
+        """Format a result for display"""
+        return str(value)
+
+
+class DecimalMode:
+    """Decimal arithmetic with a configurable number of significant digits"""
+
+    name = "decimal"
+
+    def __init__(self, precision: int = DEFAULT_PRECISION):
+        self.precision = precision
+        self.context = Context(prec=precision, rounding=ROUND_HALF_EVEN,
+                               traps=[DivisionByZero, InvalidOperation, Overflow])
+        self.binary = dict(BINARY_OPERATORS, **{'//': _decimal_floordiv})
+        self.unary = UNARY_OPERATORS
+
+    def literal(self, text: str):
+        """Convert a number literal into this domain"""
+        return Decimal(text)
+
+    def coerce(self, value):
+        """Convert an operand passed to the arithmetic methods"""
+        if isinstance(value, Decimal):
+            return value
+        if isinstance(value, float):
+            # Go through repr so 0.1 stays 0.1 instead of its binary expansion
+            return Decimal(repr(value))
+        if isinstance(value, Fraction):
+            return self.context.divide(Decimal(value.numerator), Decimal(value.denominator))
+        return Decimal(str(value).strip())
+
+    def evaluation_context(self):
+        """Context manager active while a program runs"""
+        return localcontext(self.context)
+
+    def finalize(self, result):
+        """Validate a raw result and normalize it for callers"""
+        if not isinstance(result, Decimal) or not result.is_finite():
+            raise ValueError("Invalid calculation result")
+        # Apply the context so results never carry more than precision digits
+        return self.context.plus(result)
+
+    def format(self, value) -> str:
+        """Format a result for display without exponent noise"""
+        value = value.normalize(self.context)
+        if value == value.to_integral_value() and value.adjusted() < self.precision:
+            return str(value.quantize(Decimal(1)))
+        if -7 < value.adjusted() < self.precision:
+            return format(value, 'f')
+        return str(value)
+
+
+class FractionMode:
+    """Exact rational arithmetic"""
+
+    name = "fraction"
+    precision = None
+
+    def __init__(self):
+        self.binary = dict(BINARY_OPERATORS, **{'//': _fraction_floordiv, '**': _fraction_pow})
+        self.unary = UNARY_OPERATORS
+
+    def literal(self, text: str):
+        """Convert a number literal into this domain"""
+        return Fraction(text)
+
+    def coerce(self, value):
+        """Convert an operand passed to the arithmetic methods"""
+        if isinstance(value, Fraction):
+            return value
+        if isinstance(value, float):
+            return Fraction(repr(value))
+        return Fraction(str(value).strip()) if isinstance(value, str) else Fraction(value)
+
+    def evaluation_context(self):
+        """Context manager active while a program runs"""
+        return nullcontext()
+
+    def finalize(self, result):
+        """Validate a raw result and normalize it for callers"""
+        if not isinstance(result, Fraction):
+            raise ValueError("Invalid calculation result")
+        return result
+
+    def format(self, value) -> str:
+        """Format a result for display as an integer or n/d"""
+        try:
+            if value.denominator == 1:
+                return str(value.numerator)
+            return f"{value.numerator}/{value.denominator}"
+        except ValueError:
+            # Unguarded evaluation can exceed Python's int to text limit
+            raise ValueError("Result too large to display")
+
+
+MODES = {
+    "float": FloatMode,
+    "decimal": DecimalMode,
+    "fraction": FractionMode,
+}
+
+
+def create_mode(name: str = "float", precision: int = None):
+    """Create a numeric mode by name"""
+    if name not in MODES:
+        raise ValueError(f"Unknown numeric mode: {name}")
+    if name == "decimal":
+        return DecimalMode(precision or DEFAULT_PRECISION)
+    return MODES[name]()
+
+
+def _decimal_floordiv(a, b):
+    """Floor division that rounds toward negative infinity like int //"""
+    return (a / b).to_integral_value(rounding=ROUND_FLOOR)
+
+
+def _fraction_floordiv(a, b):
+    """Floor division that stays in the rational domain"""
+    return Fraction(a // b)
+
+
+def _fraction_pow(a, b):
+    """Power that keeps results rational"""
+    if b.denominator != 1:
+        raise ValueError("Fraction mode requires integer exponents")
+    return a ** b.numerator
+
@@ -0,0 +1,249 @@
+"""
+Result Cache Module
+Persistent cache of calculation results shared across sessions
+
+Results are keyed by the canonical form of the expression, so spellings
+that differ only in whitespace, redundant parentheses or the order of
+the operands of + and * share one entry. Entries are kept in memory in
+least-recently-used order and written to an SQLite file in batches; the
+file is only touched when the cache is opened, flushed or closed, and
+every PENDING_LIMIT changes in between.
+"""
+
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from decimal import Decimal
+from fractions import Fraction
+from typing import Dict, Optional
+from expression_parser import DEFAULT_MAX_DEPTH, canonical_text, parse
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    used INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_results_used ON results(used);
+CREATE TABLE IF NOT EXISTS settings (
+    name TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+# Changes buffered in memory before they are written to the database
+PENDING_LIMIT = 64
+
+# Raw expression strings remembered with their canonical key
+KEY_MEMO_SIZE = 4096
+
+DECODERS = {
+    "decimal": Decimal,
+    "fraction": Fraction,
+}
+
+
+def default_path(history_file: str = "history.json") -> str:
+    """Cache file stored next to a history file"""
+    return os.path.join(os.path.dirname(history_file), "results_cache.db")
+
+
+def decode_float(text: str):
+    """Read back an int or float stored by the float mode"""
+    try:
+        return int(text)
+    except ValueError:
+        return float(text)
+
+
+class ResultCache:
+    """Bounded LRU map from canonical expressions to results, kept on disk
+
+    At most max_entries results and about max_bytes of key and value text
+    are kept; the least recently used entries are evicted first. Entries
+    belong to one numeric mode and precision: set_settings() with any
+    other combination empties the cache, since the stored values would
+    not be what the new settings compute.
+    """
+
+    def __init__(self, database: str = "results_cache.db", max_entries: int = 10000,
+                 max_bytes: int = 4 * 1024 * 1024, mode: str = "float",
+                 precision: Optional[int] = None):
+        self.database = database
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.entries = OrderedDict()
+        self.size = 0
+        self._keys = {}
+        # key -> value text to write, or None to delete
+        self._pending: Dict[str, Optional[str]] = {}
+        self._clock = 0
+        self._lock = threading.Lock()
+        self.connection = sqlite3.connect(database, check_same_thread=False)
+        self.connection.executescript(SCHEMA)
+        self.mode, self.precision = self.load_settings()
+        self.decode = DECODERS.get(self.mode, decode_float)
+        self.load_entries()
+        self.set_settings(mode, precision)
+
+    def load_settings(self):
+        """Numeric mode and precision the stored entries were computed with"""
+        rows = dict(self.connection.execute("SELECT name, value FROM settings"))
+        precision = rows.get("precision")
+        return rows.get("mode", "float"), int(precision) if precision else None
+
+    def load_entries(self):
+        """Read the most recently used entries into memory"""
+        try:
+            rows = self.connection.execute(
+                "SELECT key, value, used FROM results ORDER BY used DESC LIMIT ?",
+                (self.max_entries,)).fetchall()
+        except sqlite3.Error as e:
+            print(f"Error loading result cache: {e}")
+            return
+        for key, value, used in reversed(rows):
+            self.entries[key] = value
+            self.size += len(key) + len(value)
+            self._clock = max(self._clock, used)
+        self.evict()
+
+    def set_settings(self, mode: str, precision: Optional[int] = None):
+        """Switch numeric settings, dropping every entry if they changed"""
+        with self._lock:
+            if (mode, precision) == (self.mode, self.precision):
+                return
+            self.mode, self.precision = mode, precision
+            self.decode = DECODERS.get(mode, decode_float)
+            self._clear()
+            try:
+                with self.connection:
+                    self.connection.execute("DELETE FROM results")
+                    self.connection.execute("DELETE FROM settings")
+                    self.connection.executemany(
+                        "INSERT INTO settings (name, value) VALUES (?, ?)",
+                        [("mode", mode), ("precision", str(precision or ""))])
+            except sqlite3.Error as e:
+                print(f"Error saving result cache: {e}")
+
+    def key(self, expression: str) -> Optional[str]:
+        """Canonical key for an expression, or None if it does not parse"""
+        key = self._keys.get(expression)
+        if key is None:
+            try:
+                key = canonical_text(parse(expression, DEFAULT_MAX_DEPTH))
+            except (ValueError, RecursionError):
+                return None
+            if len(self._keys) >= KEY_MEMO_SIZE:
+                self._keys.clear()
+            self._keys[expression] = key
+        return key
+
+    def get(self, expression: str):
+        """Cached result for an expression, or None"""
+        key = self.key(expression)
+        with self._lock:
+            text = self.entries.get(key) if key is not None else None
+            if text is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.entries.move_to_end(key)
+            self._touch(key, text)
+        return self.decode(text)
+
+    def put(self, expression: str, value):
+        """Remember the result of an expression"""
+        key = self.key(expression)
+        if key is None or value is None:
+            return
+        try:
+            text = str(value)
+        except ValueError:
+            # Too large to convert to text; such results are not worth keeping
+            return
+        with self._lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.size -= len(key) + len(old)
+            self.entries[key] = text
+            self.size += len(key) + len(text)
+            self._touch(key, text)
+            self.evict()
+
+    def _touch(self, key: str, text: str):
+        """Queue an entry write, flushing once enough have built up"""
+        self._pending[key] = text
+        if len(self._pending) >= PENDING_LIMIT:
+            self._flush()
+
+    def evict(self):
+        """Drop least recently used entries until within the bounds"""
+        while self.entries and (len(self.entries) > self.max_entries
+                                or self.size > self.max_bytes):
+            key, text = self.entries.popitem(last=False)
+            self.size -= len(key) + len(text)
+            self._pending[key] = None
+
+    def flush(self):
+        """Write queued changes to the database"""
+        with self._lock:
+            self._flush()
+
+    def _flush(self):
+        """Write queued changes; the caller holds the lock"""
+        if not self._pending:
+            return
+        upserts = []
+        deletes = []
+        for key, text in self._pending.items():
+            if text is None:
+                deletes.append((key,))
+            else:
+                # Later touches get larger stamps, preserving LRU order
+                self._clock += 1
+                upserts.append((key, text, self._clock))
+        try:
+            with self.connection:
+                self.connection.executemany("DELETE FROM results WHERE key = ?", deletes)
+                self.connection.executemany(
+                    "INSERT INTO results (key, value, used) VALUES (?, ?, ?) "
+                    "ON CONFLICT(key) DO UPDATE SET value = excluded.value, used = excluded.used",
+                    upserts)
+            self._pending.clear()
+        except sqlite3.Error as e:
+            print(f"Error saving result cache: {e}")
+
+    def _clear(self):
+        """Forget every entry in memory; the caller holds the lock"""
+        self.entries.clear()
+        self.size = 0
+        self._pending.clear()
+
+    def clear(self):
+        """Remove every entry from memory and disk"""
+        with self._lock:
+            self._clear()
+            try:
+                with self.connection:
+                    self.connection.execute("DELETE FROM results")
+            except sqlite3.Error as e:
+                print(f"Error saving result cache: {e}")
+
+    def info(self) -> dict:
+        """Hit/miss statistics and current size"""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self.entries),
+                    "bytes": self.size, "max_entries": self.max_entries,
+                    "max_bytes": self.max_bytes}
+
+    def close(self):
+        """Write queued changes and close the database"""
+        with self._lock:
+            self._flush()
+            self.connection.close()
+
+    def __len__(self):
+        return len(self.entries)
@@ -0,0 +1,193 @@
+"""
+SQLite History Module
+SQLite-backed calculation history with indexed search and pagination
+"""
+
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+from history_io import export_calculations
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS calculations (
+    id INTEGER PRIMARY KEY,
+    expression TEXT NOT NULL,
+    result TEXT NOT NULL,
+    timestamp TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_calculations_timestamp ON calculations(timestamp);
+CREATE INDEX IF NOT EXISTS idx_calculations_result ON calculations(result);
+"""
+
+# Trigram full-text index kept in sync with the calculations table
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS calculations_fts USING fts5(
+    expression, result, content='calculations', content_rowid='id', tokenize='trigram'
+);
+CREATE TRIGGER IF NOT EXISTS calculations_ai AFTER INSERT ON calculations BEGIN
+    INSERT INTO calculations_fts(rowid, expression, result)
+    VALUES (new.id, new.expression, new.result);
+END;
+CREATE TRIGGER IF NOT EXISTS calculations_ad AFTER DELETE ON calculations BEGIN
+    INSERT INTO calculations_fts(calculations_fts, rowid, expression, result)
+    VALUES ('delete', old.id, old.expression, old.result);
+END;
+"""
+
+# Trigram matching needs at least this many characters
+MIN_TRIGRAM_LENGTH = 3
+
+class SQLiteHistoryManager:
+    """Calculation history stored in an SQLite database
+
+    Exposes the same API as HistoryManager. Queries run against indexes,
+    and page_history walks the history with keyset pagination so memory
+    and latency do not depend on the number of stored rows.
+    """
+
+    def __init__(self, database: str = "history.db"):
+        self.database = database
+        self._lock = threading.Lock()
+        self.connection = sqlite3.connect(database, check_same_thread=False)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.executescript(SCHEMA)
+        try:
+            self.connection.executescript(FTS_SCHEMA)
+            self.has_fts = True
+        except sqlite3.OperationalError:
+            # SQLite built without FTS5 or the trigram tokenizer
+            self.has_fts = False
+        self.connection.commit()
+
+    def add_calculation(self, expression: str, result: str):
+        """Add new calculation to history"""
+        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        with self._lock:
+            self.connection.execute(
+                "INSERT INTO calculations (expression, result, timestamp) VALUES (?, ?, ?)",
+                (expression, result, timestamp))
+            self.connection.commit()
+
+    def get_history(self) -> List[Dict]:
+        """Get all calculations from history, oldest first"""
+        return list(self.iter_history())
+
+    def iter_history(self, batch_size: int = 1000) -> Iterator[Dict]:
+        """Iterate over all calculations, oldest first, in fixed-size batches"""
+        last_id = 0
+        while True:
+            with self._lock:
+                rows = self.connection.execute(
+                    "SELECT id, expression, result, timestamp FROM calculations "
+                    "WHERE id > ? ORDER BY id LIMIT ?", (last_id, batch_size)).fetchall()
+            if not rows:
+                return
+            last_id = rows[-1]["id"]
+            for row in rows:
+                yield self.row_to_dict(row)
+
+    def get_recent_history(self, count: int = 10) -> List[Dict]:
+        """Get recent calculations from history, oldest first"""
+        with self._lock:
+            rows = self.connection.execute(
+                "SELECT id, expression, result, timestamp FROM calculations "
+                "ORDER BY id DESC LIMIT ?", (count,)).fetchall()
+        return [self.row_to_dict(row) for row in reversed(rows)]
+
+    def page_history(self, cursor: Optional[int] = None, limit: int = 50,
+                     search_term: str = None) -> Tuple[List[Dict], Optional[int]]:
+        """Return one page of calculations, newest first, and the next cursor
+
+        Pass the returned cursor back in to fetch the following page; it is
+        None once the history is exhausted.
+        """
+        clauses = []
+        params = []
+        if cursor is not None:
+            clauses.append("c.id < ?")
+            params.append(cursor)
+        source = "calculations c"
+        if search_term:
+            source, clause, search_params = self.search_clause(search_term)
+            clauses.append(clause)
+            params.extend(search_params)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._lock:
+            rows = self.connection.execute(
+                f"SELECT c.id, c.expression, c.result, c.timestamp FROM {source} {where} "
+                f"ORDER BY c.id DESC LIMIT ?", params + [limit]).fetchall()
+        next_cursor = rows[-1]["id"] if len(rows) == limit else None
+        return [self.row_to_dict(row) for row in rows], next_cursor
+
+    def get_history_between(self, start: str, end: str) -> List[Dict]:
+        """Get calculations with start <= timestamp < end using the index"""
+        with self._lock:
+            rows = self.connection.execute(
+                "SELECT id, expression, result, timestamp FROM calculations "
+                "WHERE timestamp >= ? AND timestamp < ? ORDER BY timestamp, id",
+                (start, end)).fetchall()
+        return [self.row_to_dict(row) for row in rows]
+
+    def clear_history(self):
+        """Clear all calculation history"""
+        with self._lock:
+            self.connection.execute("DELETE FROM calculations")
+            if self.has_fts:
+                self.connection.execute(
+                    "INSERT INTO calculations_fts(calculations_fts) VALUES ('delete-all')")
+            self.connection.commit()
+
+    def search_clause(self, search_term: str) -> Tuple[str, str, list]:
+        """Build the FROM source, WHERE clause and parameters for a search"""
+        if self.has_fts and len(search_term) >= MIN_TRIGRAM_LENGTH:
+            phrase = '"' + search_term.replace('"', '""') + '"'
+            return ("calculations c JOIN calculations_fts ON calculations_fts.rowid = c.id",
+                    "calculations_fts MATCH ?", [phrase])
+        # Terms too short for trigrams fall back to a case-insensitive scan
+        pattern = "%" + search_term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        return ("calculations c",
+                "(c.expression LIKE ? ESCAPE '\\' OR c.result LIKE ? ESCAPE '\\')",
+                [pattern, pattern])
+
+    def search_history(self, search_term: str) -> List[Dict]:
+        """Search calculations by expression or result"""
+        if not search_term:
+            return self.get_history()
+
+        source, clause, params = self.search_clause(search_term)
+        with self._lock:
+            rows = self.connection.execute(
+                f"SELECT c.id, c.expression, c.result, c.timestamp FROM {source} "
+                f"WHERE {clause} ORDER BY c.id", params).fetchall()
+        return [self.row_to_dict(row) for row in rows]
+
+    def export_history(self, filename: str = None, fmt: str = None) -> bool:
+        """Export history to a file, streaming rows from the database
+
+        fmt is one of history_io.FORMATS and defaults to the one matching
+        the file extension.
+        """
+        if not filename:
+            filename = f"calculator_history_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+
+        try:
+            export_calculations(self.iter_history(), filename, fmt)
+            return True
+        except Exception:
+            return False
+
+    def close(self):
+        """Close the database connection"""
+        with self._lock:
+            self.connection.close()
+
+    @staticmethod
+    def row_to_dict(row) -> Dict:
+        """Convert a database row to the history dict format"""
+        return {
+            "expression": row["expression"],
+            "result": row["result"],
+            "timestamp": row["timestamp"]
+        }
@@ -0,0 +1,84 @@
+"""
+Startup Module
+Phase timings from process start to first paint and deferred loading
+"""
+
+import os
+import sys
+import threading
+from contextlib import contextmanager
+from time import perf_counter
+from typing import List, Optional, Tuple
+
+# Set to 1 to print the startup report to stderr once startup completes,
+# or to a file path to write it there
+REPORT_ENV = "CALCULATOR_STARTUP_REPORT"
+
+
+class StartupProfile:
+    """Named startup phases measured from the moment this module loaded
+
+    Phases may overlap (deferred work runs on other threads), so each one
+    records its own start offset and duration; marks are single instants
+    such as the first paint.
+    """
+
+    def __init__(self):
+        self.origin = perf_counter()
+        # (name, start offset, duration), duration None for marks
+        self.phases: List[Tuple[str, float, Optional[float]]] = []
+        self._lock = threading.Lock()
+        self.reported = False
+
+    @contextmanager
+    def phase(self, name: str):
+        """Time the enclosed block as one phase"""
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            end = perf_counter()
+            with self._lock:
+                self.phases.append((name, start - self.origin, end - start))
+
+    def mark(self, name: str):
+        """Record the time of an instant event"""
+        with self._lock:
+            self.phases.append((name, perf_counter() - self.origin, None))
+
+    def elapsed(self, name: str) -> Optional[float]:
+        """Seconds from start to the end of a phase or to a mark"""
+        with self._lock:
+            for phase, start, duration in self.phases:
+                if phase == name:
+                    return start + (duration or 0.0)
+        return None
+
+    def report(self) -> str:
+        """Render the phases as a table ordered by start time"""
+        with self._lock:
+            phases = sorted(self.phases, key=lambda phase: phase[1])
+        lines = [f"{'phase':<20} {'start ms':>10} {'duration ms':>12}"]
+        for name, start, duration in phases:
+            duration_text = f"{duration * 1000:12.1f}" if duration is not None else " " * 12
+            lines.append(f"{name:<20} {start * 1000:10.1f} {duration_text}")
+        return "\n".join(lines) + "\n"
+
+    def finish(self):
+        """Emit the report once, if requested through the environment"""
+        target = os.environ.get(REPORT_ENV)
+        if not target or self.reported:
+            return
+        self.reported = True
+        if target == "1":
+            sys.stderr.write(self.report())
+            return
+        try:
+            with open(target, 'w', encoding='utf-8') as f:
+                f.write(self.report())
+        except OSError as e:
+            print(f"Error saving startup report: {e}")
+
+
+# Process-wide profile; import this module first to start the clock early
+startup = StartupProfile()
@@ -88,6 +88,21 @@ QTextEdit {
     border-radius: 4px;
 }
 
+/* History List (QListView) */
+QListView {
+    background-color: #ffffff;
+    border: 1px solid #cccccc;
+    color: #000000;
+    padding: 5px;
+    font-size: 11px;
+    border-radius: 4px;
+}
+
+QListView::item:selected {
+    background-color: #e6f3ff;
+    color: #000000;
+}
+
 /* Labels */
 QLabel {
     background-color: transparent;
@@ -95,6 +110,13 @@ QLabel {
     font-size: 12px;
 }
 
+/* Live result preview under the display */
+QLabel[class="preview"] {
+    color: #666666;
+    font-size: 14px;
+    padding-right: 12px;
+}
+
 /* Main Window */
 QMainWindow {
     background-color: #f0f0f0;
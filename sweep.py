@@ -0,0 +1,442 @@
+"""
+Sweep Module
+Evaluates one expression over many values of a free variable
+
+In float mode with NumPy installed, the expression is compiled once into
+a tree of NumPy array operations and evaluated a chunk at a time. Other
+modes, or a missing NumPy, use a pure-Python path that compiles the
+expression once and swaps the variable's value into the program. Both
+paths give the same results as calculate(), integers included.
+"""
+
+import math
+from collections import namedtuple
+from itertools import islice
+from typing import Dict, Iterable, Iterator, Optional
+from expression_parser import (BINARY, DEFAULT_MAX_DEPTH, PUSH, UNARY, compile_ast, parse,
+                               parse_number)
+from evaluation_limits import EvaluationCancelled
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Values evaluated per chunk
+DEFAULT_CHUNK_SIZE = 65536
+
+# inputs and values are parallel sequences; errors maps a position in the
+# chunk to its error message, and the value there is nan (NumPy) or None
+SweepChunk = namedtuple("SweepChunk", ["inputs", "values", "errors"])
+
+# Integers up to this magnitude are exact in float64
+EXACT_INTEGER_LIMIT = 2.0 ** 53
+
+DIVIDE_BY_ZERO = "Cannot divide by zero"
+# Same message calculate() reports for inf and nan results
+INVALID_RESULT = "Invalid expression"
+# Same message calculate() reports for powers that overflow
+OVERFLOW = "Calculation error"
+
+# Codes of the first error at each position of a vectorized chunk
+FAILURES = {1: DIVIDE_BY_ZERO, 2: OVERFLOW}
+DIVIDE_BY_ZERO_CODE, OVERFLOW_CODE = 1, 2
+
+
+def python_power(a: float, b: float) -> float:
+    """Python's float power: nan for complex results, None on overflow"""
+    try:
+        result = float(a) ** float(b)
+    except OverflowError:
+        return None
+    except ZeroDivisionError:
+        # 0 ** -n, already marked as a division by zero
+        return math.nan
+    return result if isinstance(result, float) else math.nan
+
+
+def fail(failed, mask, code):
+    """Record code where mask holds and no earlier error did"""
+    failed[(failed == 0) & mask] = code
+
+
+def round_like_python(values):
+    """Round a float array to 10 places exactly as round(value, 10) does
+
+    np.round scales by 1e10, which rounds and can overflow. Away from
+    halfway cases the scaled value still rounds to the same integer as the
+    exact product, and dividing that back is correctly rounded, so only
+    near-halfway values are passed to round() itself. Values of 2**52 or
+    more are integers and stay as they are.
+    """
+    magnitude = np.abs(values)
+    small = magnitude < 2.0 ** 52
+    scaled = np.where(small, values, 0.0) * 1e10
+    nearest = np.rint(scaled)
+    rounded = np.where(small, nearest / 1e10, values)
+    # The product's rounding error is below |scaled| * 2**-53
+    doubtful = small & ~((np.abs(np.abs(scaled - nearest) - 0.5) > np.abs(scaled) * 2.0 ** -50)
+                         & (np.abs(scaled) < 2.0 ** 52))
+    if doubtful.any():
+        rounded[doubtful] = [round(value, 10) for value in values[doubtful].tolist()]
+    return rounded
+
+
+class SweepRange:
+    """Arithmetic progression start, start + step, ... stopping before stop
+
+    Like range() but for floats; each value is computed as start + i * step
+    so rounding errors do not accumulate over long sweeps.
+    """
+
+    def __init__(self, start, stop, step=1):
+        if not step:
+            raise ValueError("Sweep step must not be zero")
+        self.start = start
+        self.stop = stop
+        self.step = step
+        self.count = max(0, math.ceil((stop - start) / step))
+
+    def __len__(self):
+        return self.count
+
+    def values(self, lo: int, hi: int) -> list:
+        """Python numbers for positions lo to hi"""
+        start, step = self.start, self.step
+        return [start + i * step for i in range(lo, hi)]
+
+    def array(self, lo: int, hi: int):
+        """NumPy array for positions lo to hi, integer when start and step are"""
+        if isinstance(self.start, int) and isinstance(self.step, int):
+            if max(abs(self.start), abs(self.stop)) + abs(self.step) < 2 ** 62:
+                return self.start + np.arange(lo, hi, dtype=np.int64) * self.step
+            # Too large for int64; evaluated exactly, one value at a time
+            return np.array(self.values(lo, hi), dtype=object)
+        return self.start + np.arange(lo, hi, dtype=np.float64) * self.step
+
+    def __repr__(self):
+        return f"SweepRange({self.start}, {self.stop}, {self.step})"
+
+
+def parse_range(text: str) -> SweepRange:
+    """Parse "START:STOP" or "START:STOP:STEP" into a SweepRange"""
+    parts = text.split(":")
+    if len(parts) not in (2, 3):
+        raise ValueError("Sweep range must be START:STOP[:STEP]")
+    try:
+        numbers = [parse_value(part) for part in parts]
+    except ValueError:
+        raise ValueError("Sweep range must be START:STOP[:STEP]")
+    return SweepRange(*numbers)
+
+
+def parse_value(text: str):
+    """Parse a sweep input value, keeping integers exact"""
+    text = text.strip()
+    sign = -1 if text.startswith('-') else 1
+    value = parse_number(text.lstrip('+-').strip())
+    return sign * value
+
+
+def format_input(value) -> str:
+    """Display a sweep input without float noise"""
+    if isinstance(value, int) or (np is not None and isinstance(value, np.integer)):
+        return str(int(value))
+    value = round(float(value), 10)
+    return str(int(value)) if value.is_integer() else str(value)
+
+
+class SweepScope:
+    """Name resolution for sweeps: the variable plus worksheet definitions"""
+
+    def __init__(self, worksheet, variable: str, marker):
+        self.worksheet = worksheet
+        self.variable = variable
+        self.marker = marker
+
+    def lookup(self, name: str):
+        """Value of a name, or the marker for the swept variable"""
+        if name == self.variable:
+            return self.marker
+        return self.worksheet.lookup(name)
+
+    def function(self, name: str):
+        """Parameters and body of a worksheet function"""
+        return self.worksheet.function(name)
+
+
+class ScalarSweep:
+    """Pure-Python sweep: one compiled program, variable patched per value"""
+
+    def __init__(self, logic, node, variable: str):
+        self.logic = logic
+        marker = object()
+        scope = SweepScope(logic.worksheet, variable, marker)
+        with logic.worksheet._lock:
+            self.program = list(compile_ast(node, logic.mode, logic.limits, scope))
+        self.slots = [i for i, (opcode, arg) in enumerate(self.program)
+                      if opcode == PUSH and arg is marker]
+
+    def __call__(self, inputs, cancel=None) -> SweepChunk:
+        """Evaluate the program for every input"""
+        logic = self.logic
+        coerce = logic.mode.coerce
+        program = self.program
+        slots = self.slots
+        values = []
+        errors = {}
+        for position, value in enumerate(inputs):
+            try:
+                instruction = (PUSH, coerce(value))
+                for slot in slots:
+                    program[slot] = instruction
+                values.append(logic.run_program(program, cancel))
+            except EvaluationCancelled:
+                raise
+            except (ValueError, ZeroDivisionError, ArithmeticError) as e:
+                values.append(None)
+                errors[position] = str(e)
+        return SweepChunk(inputs, values, errors)
+
+
+class VectorizedSweep:
+    """NumPy sweep: the expression becomes nested array operations
+
+    The postfix program compile_ast() builds for calculate() is mapped to
+    array operations and run on a stack, so expressions of any length
+    evaluate without recursion. Binary operations take (a, b, failed),
+    where failed holds, per position, the code of the first division by
+    zero or overflowing power in evaluation order, so each position
+    reports the error calculate() would raise. Powers and the final
+    rounding go through Python's own float arithmetic so results match
+    calculate() to the last bit.
+
+    Expressions that keep integers integers in Python (no true division or
+    negative powers) give int results for integer inputs. Their array
+    operations also mark in inexact every position where a value reaches
+    2**53 or a power is negative; the scalar path re-evaluates those.
+    """
+
+    OPERATIONS = {
+        '+': "add", '-': "subtract", '*': "multiply",
+        '/': "true_divide", '//': "floor_divide",
+    }
+
+    power = np.frompyfunc(python_power, 2, 1) if np is not None else None
+
+    def __init__(self, logic, node, variable: str):
+        self.logic = logic
+        self.variable = variable
+        self.inexact = None
+        marker = object()
+        with logic.worksheet._lock:
+            # The scalar program applies the literal and size limits and
+            # inlines worksheet functions; its steps become array operations
+            program = compile_ast(node, logic.mode, logic.limits,
+                                  SweepScope(logic.worksheet, variable, marker))
+        operators = {func: op for op, func in logic.mode.binary.items()}
+        self.program = []
+        for opcode, arg in program:
+            if opcode == PUSH:
+                self.program.append((PUSH, None if arg is marker else np.float64(arg)))
+            elif opcode == UNARY:
+                if arg is logic.mode.unary['-']:
+                    self.program.append((UNARY, np.negative))
+            else:
+                self.program.append((BINARY, self.binary(operators[arg])))
+        # None, or whether the integer result depends on the variable
+        self.integral = self.integer_kind(program, marker, operators)
+        self.scalar = ScalarSweep(logic, node, variable)
+
+    @staticmethod
+    def integer_kind(program, marker, operators) -> Optional[bool]:
+        """None unless program gives an int for int inputs, else whether it uses the variable"""
+        stack = []
+        for opcode, arg in program:
+            if opcode == PUSH:
+                stack.append(True if arg is marker else (False if isinstance(arg, int) else None))
+            elif opcode == BINARY:
+                right = stack.pop()
+                left = stack[-1]
+                if operators[arg] == '/' or left is None or right is None:
+                    stack[-1] = None
+                else:
+                    stack[-1] = left or right
+        return stack[-1]
+
+    def run(self, x, failed):
+        """Evaluate the array program on inputs x"""
+        stack = []
+        push = stack.append
+        pop = stack.pop
+        for opcode, arg in self.program:
+            if opcode == PUSH:
+                push(x if arg is None else arg)
+            elif opcode == UNARY:
+                stack[-1] = arg(stack[-1])
+            else:
+                right = pop()
+                stack[-1] = arg(stack[-1], right, failed)
+        return stack[-1]
+
+    def binary(self, op: str):
+        """Array function of (a, b, failed) for one binary operator"""
+        if op in ('/', '//'):
+            func = getattr(np, self.OPERATIONS[op])
+
+            def apply(a, b, failed):
+                fail(failed, b == 0, DIVIDE_BY_ZERO_CODE)
+                return self.track(func(a, b))
+        elif op == '**':
+            power = self.power
+
+            def apply(a, b, failed):
+                fail(failed, (a == 0) & (b < 0), DIVIDE_BY_ZERO_CODE)
+                if self.inexact is not None:
+                    # Negative powers give floats; the scalar path handles them
+                    np.logical_or(self.inexact, b < 0, out=self.inexact)
+                result = power(a, b)
+                if isinstance(result, np.ndarray):
+                    overflow = np.equal(result, None)
+                    fail(failed, overflow, OVERFLOW_CODE)
+                    result[overflow] = math.inf
+                    result = result.astype(np.float64)
+                else:
+                    # Both operands were constants
+                    if result is None:
+                        fail(failed, True, OVERFLOW_CODE)
+                        result = math.inf
+                    result = np.float64(result)
+                return self.track(result)
+        else:
+            func = getattr(np, self.OPERATIONS[op])
+
+            def apply(a, b, failed):
+                return self.track(func(a, b))
+        return apply
+
+    def track(self, values):
+        """Mark positions too large to be exact integers, during integer chunks"""
+        if self.inexact is not None:
+            np.logical_or(self.inexact, ~(np.abs(values) < EXACT_INTEGER_LIMIT),
+                          out=self.inexact)
+        return values
+
+    def __call__(self, inputs, cancel=None) -> SweepChunk:
+        """Evaluate the expression for a whole chunk of inputs"""
+        x = np.asarray(inputs)
+        if x.dtype.kind not in "iuf":
+            # Integers beyond int64 only fit Python ints
+            return self.scalar(inputs.tolist() if isinstance(inputs, np.ndarray) else inputs,
+                               cancel)
+        integral = self.integral is not None and (x.dtype.kind in "iu" or not self.integral)
+        x = x.astype(np.float64)
+        failed = np.zeros(x.shape, dtype=np.int8)
+        if integral:
+            self.inexact = ~(np.abs(x) < EXACT_INTEGER_LIMIT)
+        try:
+            with np.errstate(all="ignore"):
+                result = np.broadcast_to(self.track(self.run(x, failed)),
+                                         x.shape).astype(np.float64)
+                if integral:
+                    return self.integer_chunk(inputs, result, failed, cancel)
+                # Match FloatMode's rounding of results to 10 places
+                values = round_like_python(result)
+        finally:
+            self.inexact = None
+        invalid = (failed != 0) | ~np.isfinite(result)
+        errors = {}
+        if invalid.any():
+            values[invalid] = np.nan
+            for position in np.flatnonzero(invalid).tolist():
+                errors[position] = FAILURES.get(int(failed[position]), INVALID_RESULT)
+        return SweepChunk(inputs, values, errors)
+
+    def integer_chunk(self, inputs, result, failed, cancel) -> SweepChunk:
+        """Int results of an integer chunk, re-evaluating inexact positions"""
+        inexact = self.inexact
+        # Only divisions by zero are exact; overflowing powers are inexact
+        zero = (failed == DIVIDE_BY_ZERO_CODE) & ~inexact
+        if not zero.any() and not inexact.any():
+            return SweepChunk(inputs, result.astype(np.int64), {})
+        values = np.empty(result.shape, dtype=object)
+        exact = ~(zero | inexact)
+        values[exact] = result[exact].astype(np.int64).tolist()
+        errors = {position: DIVIDE_BY_ZERO for position in np.flatnonzero(zero).tolist()}
+        positions = np.flatnonzero(inexact).tolist()
+        if positions:
+            exact_inputs = [int(inputs[position]) if not isinstance(inputs[position], float)
+                            else inputs[position] for position in positions]
+            chunk = self.scalar(exact_inputs, cancel)
+            for i, position in enumerate(positions):
+                values[position] = chunk.values[i]
+                if i in chunk.errors:
+                    errors[position] = chunk.errors[i]
+        return SweepChunk(inputs, values, errors)
+
+
+def sweep(logic, expression: str, values, variable: str = "x",
+          chunk_size: int = DEFAULT_CHUNK_SIZE,
+          vectorize: Optional[bool] = None, cancel=None) -> Iterator[SweepChunk]:
+    """Evaluate expression for each value of variable, yielding chunks
+
+    values may be a SweepRange, a NumPy array or any iterable of numbers.
+    vectorize=None uses NumPy when it is installed and the calculator is in
+    float mode; True requires it; False forces the pure-Python path.
+    Setting the cancel event stops the sweep between chunks.
+    """
+    max_depth = logic.limits.max_depth if logic.limits else DEFAULT_MAX_DEPTH
+    node = parse(expression.strip(), max_depth)
+    if vectorize is None:
+        vectorize = np is not None and logic.mode.name == "float"
+    elif vectorize and np is None:
+        raise ValueError("Vectorized sweeps need NumPy")
+    elif vectorize and logic.mode.name != "float":
+        raise ValueError("Vectorized sweeps only support float mode")
+
+    evaluator = (VectorizedSweep if vectorize else ScalarSweep)(logic, node, variable)
+    for inputs in iter_chunks(values, chunk_size, vectorize):
+        if cancel is not None and cancel.is_set():
+            raise EvaluationCancelled()
+        yield evaluator(inputs, cancel)
+
+
+def iter_chunks(values, chunk_size: int, as_array: bool) -> Iterator:
+    """Split sweep inputs into chunks, as arrays for the NumPy path"""
+    if isinstance(values, SweepRange):
+        for lo in range(0, len(values), chunk_size):
+            hi = min(lo + chunk_size, len(values))
+            yield values.array(lo, hi) if as_array else values.values(lo, hi)
+        return
+    if np is not None and isinstance(values, np.ndarray):
+        for lo in range(0, len(values), chunk_size):
+            chunk = values[lo:lo + chunk_size]
+            yield chunk if as_array else chunk.tolist()
+        return
+    iterator = iter(values)
+    while True:
+        chunk = list(islice(iterator, chunk_size))
+        if not chunk:
+            return
+        if not as_array:
+            yield chunk
+            continue
+        array = np.asarray(chunk)
+        if array.dtype.kind == "f" and not all(isinstance(value, float) for value in chunk):
+            # Mixed ints and floats keep their own types on the scalar path
+            array = np.array(chunk, dtype=object)
+        yield array
+
+
+def iter_results(chunks: Iterable[SweepChunk]) -> Iterator[tuple]:
+    """Flatten chunks into (input, value, error) triples"""
+    for chunk in chunks:
+        errors: Dict[int, str] = chunk.errors
+        values = chunk.values
+        if np is not None and isinstance(values, np.ndarray):
+            values = values.tolist()
+        inputs = chunk.inputs
+        if np is not None and isinstance(inputs, np.ndarray):
+            inputs = inputs.tolist()
+        for position, (value, result) in enumerate(zip(inputs, values)):
+            yield value, result, errors.get(position)
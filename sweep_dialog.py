@@ -0,0 +1,196 @@
+"""
+Sweep Dialog Module
+Dialog that evaluates one expression over a range of inputs
+"""
+
+from bisect import bisect_right
+from PySide6.QtCore import QAbstractTableModel, QModelIndex, Qt
+from PySide6.QtWidgets import (QAbstractItemView, QDialog, QFormLayout, QHBoxLayout, QLabel,
+                               QLineEdit, QPushButton, QTableView, QVBoxLayout)
+from calculation_worker import SweepWorker
+import sweep
+
+# Largest sweep shown in the table; results are kept in memory
+MAX_ROWS = 1_000_000
+
+
+class SweepResultsModel(QAbstractTableModel):
+    """Table of swept inputs and results, filled one chunk at a time
+
+    Chunks are stored as they arrive and rows are formatted only when a
+    view asks for them, so sweeps with millions of values stay responsive.
+    """
+
+    HEADERS = ("Input", "Result")
+
+    def __init__(self, logic, parent=None):
+        super().__init__(parent)
+        self.logic = logic
+        self.chunks = []
+        # Row number of the first value in each chunk
+        self.starts = []
+        self._count = 0
+
+    def rowCount(self, parent=QModelIndex()):
+        """Number of values evaluated so far"""
+        if parent.isValid():
+            return 0
+        return self._count
+
+    def columnCount(self, parent=QModelIndex()):
+        """Input and result columns"""
+        if parent.isValid():
+            return 0
+        return len(self.HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        """Column titles"""
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.HEADERS[section]
+        return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        """Formatted input or result for a cell"""
+        if role != Qt.DisplayRole or not index.isValid() or not 0 <= index.row() < self._count:
+            return None
+        chunk_index = bisect_right(self.starts, index.row()) - 1
+        chunk = self.chunks[chunk_index]
+        offset = index.row() - self.starts[chunk_index]
+        if index.column() == 0:
+            return sweep.format_input(chunk.inputs[offset])
+        error = chunk.errors.get(offset)
+        if error is not None:
+            return f"Error: {error}"
+        return self.logic.format_result(chunk.values[offset])
+
+    def add_chunk(self, chunk):
+        """Append the rows of one evaluated chunk"""
+        size = len(chunk.inputs)
+        if not size:
+            return
+        self.beginInsertRows(QModelIndex(), self._count, self._count + size - 1)
+        self.chunks.append(chunk)
+        self.starts.append(self._count)
+        self._count += size
+        self.endInsertRows()
+
+    def clear(self):
+        """Drop every row"""
+        self.beginResetModel()
+        self.chunks = []
+        self.starts = []
+        self._count = 0
+        self.endResetModel()
+
+
+class SweepDialog(QDialog):
+    """Expression, variable and range inputs with a streaming results table"""
+
+    def __init__(self, logic, thread_pool, expression: str = "", parent=None):
+        super().__init__(parent)
+        self.logic = logic
+        self.thread_pool = thread_pool
+        self.worker = None
+        self.setWindowTitle("Sweep")
+        self.resize(360, 480)
+
+        layout = QVBoxLayout(self)
+        form = QFormLayout()
+        self.expression_edit = QLineEdit(expression)
+        self.expression_edit.setPlaceholderText("x ** 2 - 1")
+        form.addRow("Expression:", self.expression_edit)
+        self.variable_edit = QLineEdit("x")
+        form.addRow("Variable:", self.variable_edit)
+        self.range_edit = QLineEdit("0:10:1")
+        self.range_edit.setPlaceholderText("START:STOP[:STEP]")
+        form.addRow("Range:", self.range_edit)
+        layout.addLayout(form)
+
+        buttons = QHBoxLayout()
+        self.run_button = QPushButton("Run")
+        self.run_button.clicked.connect(self.start_sweep)
+        buttons.addWidget(self.run_button)
+        self.stop_button = QPushButton("Stop")
+        self.stop_button.setEnabled(False)
+        self.stop_button.clicked.connect(self.stop_sweep)
+        buttons.addWidget(self.stop_button)
+        layout.addLayout(buttons)
+
+        self.status = QLabel("")
+        layout.addWidget(self.status)
+
+        self.model = SweepResultsModel(logic, self)
+        self.table = QTableView()
+        self.table.setModel(self.model)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.verticalHeader().setVisible(False)
+        self.table.horizontalHeader().setStretchLastSection(True)
+        layout.addWidget(self.table)
+
+        self.range_edit.returnPressed.connect(self.start_sweep)
+        self.expression_edit.returnPressed.connect(self.start_sweep)
+
+    def start_sweep(self):
+        """Validate the inputs and run the sweep on the thread pool"""
+        self.stop_sweep()
+        expression = self.expression_edit.text().replace('×', '*').replace('÷', '/')
+        variable = self.variable_edit.text().strip() or "x"
+        try:
+            values = sweep.parse_range(self.range_edit.text())
+        except ValueError as e:
+            self.status.setText(str(e))
+            return
+        if len(values) > MAX_ROWS:
+            self.status.setText(f"Sweeps are limited to {MAX_ROWS:,} values")
+            return
+        self.model.clear()
+        worker = SweepWorker(self.logic, expression, values, variable)
+        worker.signals.chunk.connect(self.on_chunk)
+        worker.signals.finished.connect(self.on_finished)
+        worker.signals.failed.connect(self.on_failed)
+        self.worker = worker
+        self.status.setText(f"Evaluating {len(values)} values…")
+        self.run_button.setEnabled(False)
+        self.stop_button.setEnabled(True)
+        self.thread_pool.start(worker)
+
+    def stop_sweep(self):
+        """Cancel the running sweep, keeping the rows received so far"""
+        if self.worker is not None:
+            self.worker.cancel()
+            self.worker = None
+            self.status.setText(f"Stopped after {self.model.rowCount()} values")
+        self.run_button.setEnabled(True)
+        self.stop_button.setEnabled(False)
+
+    def is_current(self) -> bool:
+        """Check that a signal comes from the sweep still running"""
+        return self.worker is not None and self.sender() is self.worker.signals
+
+    def on_chunk(self, chunk):
+        """Show the rows of a finished chunk"""
+        if self.is_current():
+            self.model.add_chunk(chunk)
+
+    def on_finished(self, count):
+        """Report a completed sweep"""
+        if not self.is_current():
+            return
+        self.worker = None
+        self.status.setText(f"{count} values")
+        self.run_button.setEnabled(True)
+        self.stop_button.setEnabled(False)
+
+    def on_failed(self, message):
+        """Report a sweep that could not run"""
+        if not self.is_current():
+            return
+        self.worker = None
+        self.status.setText(f"Error: {message}")
+        self.run_button.setEnabled(True)
+        self.stop_button.setEnabled(False)
+
+    def closeEvent(self, event):
+        """Stop the sweep when the dialog closes"""
+        self.stop_sweep()
+        super().closeEvent(event)
@@ -0,0 +1,115 @@
+"""
+Calculator Server Tests
+Per-connection worksheets and batch routing of the JSON-RPC server
+"""
+
+import asyncio
+import json
+import socket
+import threading
+
+import pytest
+
+import calc_server
+from calc_client import AsyncCalculatorClient, CalculatorServerError
+from calc_server import INVALID_REQUEST, PARSE_ERROR, CalculatorServer
+
+
+def serve(tmp_path, scenario, **options):
+    """Run scenario(address) against a server on a Unix socket"""
+    async def main():
+        server = CalculatorServer(**options)
+        path = str(tmp_path / "calculator.sock")
+        await server.start_unix(path)
+        try:
+            return await scenario("unix:" + path)
+        finally:
+            await server.close()
+    return asyncio.run(main())
+
+
+def test_variables_are_private_to_a_connection(tmp_path):
+    async def scenario(address):
+        first = await AsyncCalculatorClient.connect(address)
+        second = await AsyncCalculatorClient.connect(address)
+        try:
+            assert await first.calculate("rate = 5") == "5"
+            assert await first.calculate("rate * 2") == "10"
+            with pytest.raises(CalculatorServerError):
+                await second.calculate("rate * 2")
+            assert await second.calculate("rate = 1") == "1"
+            assert await first.calculate("rate * 2") == "10"
+        finally:
+            await first.close()
+            await second.close()
+    serve(tmp_path, scenario)
+
+
+def test_worksheet_batches_do_not_depend_on_size(tmp_path):
+    batch = ["rate = 3"] + ["rate * 2"] * 7
+
+    async def scenario(address):
+        client = await AsyncCalculatorClient.connect(address)
+        try:
+            return await client.calculate_many(batch)
+        finally:
+            await client.close()
+    results = serve(tmp_path, scenario, processes=1, pool_threshold=4)
+    assert results == [{"value": "3"}] + [{"value": "6"}] * 7
+
+
+def test_large_plain_batches_use_the_pool(tmp_path):
+    batch = [f"{i} * 2" for i in range(10)]
+
+    async def scenario(address):
+        client = await AsyncCalculatorClient.connect(address)
+        try:
+            return await client.calculate_many(batch)
+        finally:
+            await client.close()
+    results = serve(tmp_path, scenario, processes=1, pool_threshold=4)
+    assert results == [{"value": str(i * 2)} for i in range(10)]
+
+
+def test_large_worksheet_batches_run_off_the_event_loop(tmp_path, monkeypatch):
+    batch = ["rate = 3"] + ["rate * 2"] * 7
+    threads = []
+    original = calc_server.format_batch
+
+    def format_batch(logic, expressions):
+        threads.append(threading.current_thread())
+        return original(logic, expressions)
+    monkeypatch.setattr(calc_server, "format_batch", format_batch)
+
+    async def scenario(address):
+        client = await AsyncCalculatorClient.connect(address)
+        try:
+            return await client.calculate_many(batch)
+        finally:
+            await client.close()
+    results = serve(tmp_path, scenario, processes=1, pool_threshold=4)
+    assert results == [{"value": "3"}] + [{"value": "6"}] * 7
+    assert threads and threads[0] is not threading.main_thread()
+
+
+def test_stale_sockets_are_replaced_and_other_files_kept(tmp_path):
+    path = tmp_path / "calculator.sock"
+    stale = socket.socket(socket.AF_UNIX)
+    stale.bind(str(path))
+    stale.close()
+    assert serve(tmp_path, lambda address: asyncio.sleep(0, "served")) == "served"
+
+    path.unlink()
+    path.write_text("keep me")
+    with pytest.raises(OSError):
+        serve(tmp_path, lambda address: asyncio.sleep(0))
+    assert path.read_text() == "keep me"
+
+
+def test_deeply_nested_json_is_rejected():
+    server = CalculatorServer()
+    response = asyncio.run(server.handle_message(b"[" * 100000))
+    assert response["error"]["code"] == PARSE_ERROR
+    line = json.dumps({"method": "calculate", "params": ["1"], "id": [[1]]}).encode("utf-8")
+    response = asyncio.run(server.handle_message(line))
+    assert response["error"]["code"] == INVALID_REQUEST
@@ -0,0 +1,81 @@
+"""
+Batch Evaluation Tests
+calculate_many keeps input order and reports errors per item
+"""
+
+import pytest
+
+import calculator_logic
+from calculator_logic import CalculatorLogic
+
+BATCH = ["1 + 2", "", "1 / 0", "2 ** 10", "(1", "7 // 2", "   ", "1 + 2"]
+
+
+def outcomes(results):
+    return [(r.expression, r.value, None if r.error is None else str(r.error)) for r in results]
+
+
+def expected(logic, expressions):
+    rows = []
+    for expression in expressions:
+        try:
+            rows.append((expression, logic.calculate(expression), None))
+        except (ValueError, ZeroDivisionError) as e:
+            rows.append((expression, None, str(e)))
+    return rows
+
+
+def test_results_keep_order_and_errors_stay_per_item():
+    logic = CalculatorLogic()
+    results = outcomes(logic.calculate_many(BATCH))
+    assert results == expected(CalculatorLogic(), BATCH)
+    assert results[2][2] == "Cannot divide by zero"
+    assert results[3][1] == 1024
+
+
+def test_repeated_expressions_compile_once(monkeypatch):
+    logic = CalculatorLogic()
+    compiled = []
+    compile_program = logic.compile_program
+
+    def counting(expression):
+        compiled.append(expression)
+        return compile_program(expression)
+    monkeypatch.setattr(logic, "compile_program", counting)
+    values = [r.value for r in logic.calculate_many(["1+2", "1 + 2", "3*4"] * 50)]
+    assert values == [3, 3, 12] * 50
+    assert compiled == ["1+2", "3*4"]
+
+
+def test_batch_memo_is_bounded(monkeypatch):
+    monkeypatch.setattr(calculator_logic, "BATCH_MEMO_SIZE", 4)
+    batch = [f"{i} * 3" for i in range(20)] * 2
+    assert [r.value for r in CalculatorLogic().calculate_many(batch)] == [i * 3 for i in range(20)] * 2
+
+
+def test_worksheet_input_in_a_batch():
+    logic = CalculatorLogic()
+    results = outcomes(logic.calculate_many(["rate = 3", "rate * 2", "missing + 1"]))
+    assert [value for _, value, _ in results[:2]] == [3, 6]
+    assert results[2][2] is not None
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 1000])
+def test_pooled_results_match_serial(chunk_size):
+    batch = BATCH * 5
+    logic = CalculatorLogic()
+    pooled = outcomes(logic.calculate_many(batch, chunk_size=chunk_size, processes=2))
+    assert pooled == outcomes(CalculatorLogic().calculate_many(batch))
+
+
+def test_pooled_worksheets_are_local_to_the_workers():
+    logic = CalculatorLogic()
+    logic.calculate("outer = 5")
+    results = outcomes(logic.calculate_many(["inner = 2", "inner * 3", "outer + 1"],
+                                            chunk_size=2, processes=1))
+    # Definitions are seen by later expressions on the same worker only,
+    # and the caller's worksheet is neither visible nor changed
+    assert results[:2] == [("inner = 2", 2, None), ("inner * 3", 6, None)]
+    assert results[2][2] is not None
+    with pytest.raises(ValueError):
+        logic.calculate("inner")
@@ -0,0 +1,58 @@
+"""
+Calculation Worker Tests
+Cancelled jobs report nothing and stale results are dropped
+"""
+
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from calculator_logic import CalculatorLogic
+from evaluation_limits import EvaluationCancelled
+
+
+def test_cancelled_evaluation_stops():
+    cancel = threading.Event()
+    cancel.set()
+    with pytest.raises(EvaluationCancelled):
+        CalculatorLogic().evaluate("1 + 2", cancel)
+
+
+def run_worker(expression, cancel=False):
+    """Run a CalculationWorker inline and collect what it emits"""
+    pytest.importorskip("PySide6")
+    from calculation_worker import CalculationWorker
+
+    worker = CalculationWorker(CalculatorLogic(), 7, expression)
+    emitted = []
+    worker.signals.finished.connect(lambda *args: emitted.append(("finished",) + args))
+    worker.signals.failed.connect(lambda *args: emitted.append(("failed",) + args))
+    if cancel:
+        worker.cancel()
+    worker.run()
+    return emitted
+
+
+def test_worker_reports_results_and_errors():
+    assert run_worker("6 * 7") == [("finished", 7, "6 * 7", 42)]
+    assert run_worker("1 / 0") == [("failed", 7, "1 / 0", "Cannot divide by zero")]
+
+
+@pytest.mark.parametrize("expression", ["6 * 7", "1 / 0", "5"])
+def test_cancelled_worker_reports_nothing(expression):
+    assert run_worker(expression, cancel=True) == []
+
+
+def test_stale_results_are_ignored():
+    pytest.importorskip("PySide6")
+    from calculator_ui import CalculatorUI
+
+    ui = SimpleNamespace(pending_job=(2, threading.Event(), 5), input=SimpleNamespace(version=5))
+    assert CalculatorUI.is_current_job(ui, 2)
+    # An older job, an edit since the job started, or no pending job at all
+    assert not CalculatorUI.is_current_job(ui, 1)
+    ui.input.version = 6
+    assert not CalculatorUI.is_current_job(ui, 2)
+    ui.pending_job = None
+    assert not CalculatorUI.is_current_job(ui, 2)
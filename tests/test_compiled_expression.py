@@ -0,0 +1,64 @@
+"""
+Compiled Expression Tests
+Compiled callables give the same results and errors as calculate()
+"""
+
+import pytest
+
+from calculator_logic import CalculatorLogic
+from evaluation_limits import BudgetExceededError
+
+EXPRESSIONS = ["x * 3 + y / 7", "x - y * 1", "(x + 0) ** 2 // y", "-(-x) * y ** 2",
+               "x / (y - y)", "x ** y"]
+VALUES = [(2, 3), (12.5, 3.25), (-4, 2), (0, 0)]
+
+
+def outcome(function, *args):
+    try:
+        return function(*args)
+    except (ValueError, ZeroDivisionError) as e:
+        return type(e), str(e)
+
+
+@pytest.mark.parametrize("mode", ["float", "decimal", "fraction"])
+@pytest.mark.parametrize("expression", EXPRESSIONS)
+def test_compiled_results_match_calculate(mode, expression):
+    logic = CalculatorLogic(mode=mode)
+    compiled = logic.compile(expression, params=["x", "y"])
+    for x, y in VALUES:
+        text = expression.replace("x", f"({x})").replace("y", f"({y})")
+        assert outcome(compiled, x, y) == outcome(logic.calculate, text)
+
+
+@pytest.mark.parametrize("mode,expression,args", [
+    ("float", "x * y", (10 ** 3000, 10 ** 3000)),
+    ("float", "x * y * 1", (10 ** 3000, 10 ** 3000)),
+    ("fraction", "x * y", (10 ** 3000, 10 ** 3000)),
+    ("fraction", "x / y + y / x", (3 ** 2000, 7 ** 2000)),
+    ("fraction", "x ** y", (7, 10 ** 5)),
+])
+def test_compiled_digit_budget(mode, expression, args):
+    logic = CalculatorLogic(mode=mode)
+    compiled = logic.compile(expression)
+    with pytest.raises(BudgetExceededError):
+        compiled(*args)
+
+
+def test_arguments_are_coerced_only_when_needed():
+    logic = CalculatorLogic(mode="fraction")
+    compiled = logic.compile("x + y")
+    assert str(compiled("1/3", 0.5)) == "5/6"
+    assert logic.compile("x * 2")(True) == 2
+    assert CalculatorLogic().compile("x * 2")("2.5") == 5.0
+
+
+@pytest.mark.parametrize("mode", ["float", "decimal", "fraction"])
+@pytest.mark.parametrize("expression", ["x+" * 3000 + "1", "x*1+y-" * 1500 + "1",
+                                        "x/3-y*-" * 1000 + "x"],
+                         ids=["sum", "mixed", "signs"])
+def test_long_expressions_compile(mode, expression):
+    logic = CalculatorLogic(mode=mode)
+    compiled = logic.compile(expression, params=["x", "y"])
+    for x, y in VALUES:
+        text = expression.replace("x", f"({x})").replace("y", f"({y})")
+        assert outcome(compiled, x, y) == outcome(logic.calculate, text)
@@ -0,0 +1,60 @@
+"""
+Evaluation Limits Tests
+Digit budgets in every numeric mode and how oversized results are reported
+"""
+
+import io
+
+import pytest
+
+import headless
+from calculator_logic import CalculatorLogic
+from evaluation_limits import BudgetExceededError
+from result_cache import ResultCache
+
+HUGE_QUOTIENT = "3**2000/7**2000/11**2000/13**2000"
+
+
+@pytest.mark.parametrize("expression", [HUGE_QUOTIENT, "(2/3)**2000+(5/7)**2000",
+                                        "(2/3)**2000-(5/7)**2000"])
+def test_fraction_results_are_budgeted(expression):
+    logic = CalculatorLogic(mode="fraction")
+    with pytest.raises(BudgetExceededError):
+        logic.calculate(expression)
+
+
+def test_fraction_results_within_budget_still_evaluate():
+    logic = CalculatorLogic(mode="fraction")
+    assert logic.format_result(logic.calculate("1/3+1/7")) == "10/21"
+    assert logic.format_result(logic.calculate("(2/3)**100*3**100")) == str(2 ** 100)
+
+
+def test_multiply_budget_in_float_mode():
+    logic = CalculatorLogic()
+    with pytest.raises(BudgetExceededError):
+        logic.calculate("9**2000*9**2000*9**2000")
+
+
+def test_unformattable_result_is_a_value_error():
+    logic = CalculatorLogic(mode="fraction", limits=False)
+    value = logic.calculate(HUGE_QUOTIENT)
+    with pytest.raises(ValueError, match="too large"):
+        logic.format_result(value)
+
+
+def test_headless_reports_oversized_results_per_line():
+    stdout = io.StringIO()
+    code = headless.run(["--eval", "-", "--mode", "fraction"],
+                        stdin=io.StringIO(f"1+1\n{HUGE_QUOTIENT}\n2+2\n"), stdout=stdout)
+    assert code == 1
+    lines = stdout.getvalue().splitlines()
+    assert lines[0] == "2"
+    assert lines[1].startswith("Error: ")
+    assert lines[2] == "4"
+
+
+def test_result_cache_skips_values_too_large_for_text(tmp_path):
+    cache = ResultCache(str(tmp_path / "cache.db"))
+    cache.put("1+1", 10 ** 5000)
+    assert cache.get("1+1") is None
+    cache.close()
@@ -0,0 +1,87 @@
+"""
+Expression Parser Tests
+The tokenizer and parser evaluate like Python's own arithmetic
+"""
+
+import random
+
+import pytest
+
+from calculator_logic import CalculatorLogic
+from expression_parser import canonical_text, parse, tokenize
+
+
+def random_expression(rng, depth=0):
+    if depth > 3 or rng.random() < 0.3:
+        if rng.random() < 0.7:
+            return str(rng.randint(0, 20))
+        return f"{rng.randint(0, 99)}.{rng.randint(0, 9)}"
+    choice = rng.random()
+    if choice < 0.1:
+        return f"-{random_expression(rng, depth + 1)}"
+    if choice < 0.25:
+        return f"({random_expression(rng, depth + 1)})"
+    if choice < 0.32:
+        return f"({random_expression(rng, depth + 1)}) ** {rng.randint(0, 3)}"
+    op = rng.choice(["+", "-", "*", "/", "//"])
+    return f"{random_expression(rng, depth + 1)} {op} {random_expression(rng, depth + 1)}"
+
+
+def outcome(function, expression):
+    try:
+        value = function(expression)
+    except ZeroDivisionError:
+        return ZeroDivisionError
+    return round(value, 10) if isinstance(value, float) else value
+
+
+def test_calculate_matches_python():
+    rng = random.Random(3)
+    logic = CalculatorLogic()
+    for _ in range(500):
+        expression = random_expression(rng)
+        assert outcome(logic.calculate, expression) == outcome(eval, expression), expression
+
+
+@pytest.mark.parametrize("expression,value", [
+    ("-2**2", -4), ("2**-1", 0.5), ("2**3**2", 512), ("7//2*2", 6), ("-7//2", -4),
+    ("+-+3", -3), ("((((1))))", 1), (".5+1.", 1.5), (" 1 + 2 ", 3), ("", 0),
+])
+def test_precedence_and_literals(expression, value):
+    assert CalculatorLogic().calculate(expression) == value
+
+
+@pytest.mark.parametrize("expression", ["01+1", "1+", "(1+2", "1+2)", "2 ^ 3", "1e5", "()"])
+def test_invalid_expressions(expression):
+    with pytest.raises(ValueError):
+        CalculatorLogic().calculate(expression)
+
+
+def test_nesting_limit():
+    logic = CalculatorLogic()
+    with pytest.raises(ValueError):
+        logic.calculate("(" * 500 + "1" + ")" * 500)
+
+
+def test_tokens():
+    assert [token.value for token in tokenize("2**x // (3)")] == ["2", "**", "x", "//", "(", "3", ")"]
+
+
+@pytest.mark.parametrize("mode,expression,value", [
+    ("float", "12+" * 1666 + "34", 20026),
+    ("float", "1-" * 5000 + "1", -4999),
+    ("float", "2*" * 3000 + "1", 2 ** 3000),
+    ("fraction", "1/3+" * 3000 + "0", 1000),
+    ("decimal", "1+" * 3000 + "0", 3000),
+], ids=["paste", "difference", "product", "fraction", "decimal"])
+def test_long_expressions_compile(mode, expression, value):
+    assert CalculatorLogic(mode=mode).calculate(expression) == value
+
+
+def test_canonical_text():
+    assert canonical_text(parse("((1 + 2)) * (3)")) == canonical_text(parse("(1+2)*3"))
+    assert canonical_text(parse("b + a")) == canonical_text(parse("a+b"))
+    assert canonical_text(parse("2 - (3 - 4)")) == "2-(3-4)"
+    assert canonical_text(parse("-(1+x) ** f(y, 2)")) == "-(1+x)**f(y,2)"
+    long = "x-" * 5000 + "1"
+    assert canonical_text(parse(long)) == long
@@ -0,0 +1,58 @@
+"""
+Headless Mode Tests
+Line-by-line evaluation from stdin without loading the Qt UI
+"""
+
+import io
+import subprocess
+import sys
+import threading
+from pathlib import Path
+
+from headless import run
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Runs main.main() and reports on stderr whether Qt was imported
+SCRIPT = """
+import sys
+sys.argv = ["main.py"] + sys.argv[1:]
+import main
+try:
+    main.main()
+except SystemExit as e:
+    code = e.code
+print("PySide6" in sys.modules, file=sys.stderr)
+sys.exit(code)
+"""
+
+
+def test_stdin_is_streamed_without_importing_qt():
+    process = subprocess.Popen([sys.executable, "-c", SCRIPT, "--eval", "-"], cwd=ROOT,
+                               stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                               stderr=subprocess.PIPE, text=True)
+    timer = threading.Timer(30, process.kill)
+    timer.start()
+    try:
+        # Each answer arrives before the next line is sent
+        for expression, answer in [("1 + 2", "3"), ("2 ** 10", "1024"), ("1 / 0", None)]:
+            process.stdin.write(expression + "\n")
+            process.stdin.flush()
+            line = process.stdout.readline().strip()
+            assert line == answer if answer else line.startswith("Error:")
+        process.stdin.close()
+        assert process.stdout.read() == ""
+        assert process.wait() == 1
+        assert process.stderr.read().strip().splitlines()[-1] == "False"
+    finally:
+        timer.cancel()
+        process.kill()
+
+
+def test_run_reports_errors_per_line():
+    stdout = io.StringIO()
+    code = run(["--mode", "fraction"], stdin=io.StringIO("1/3 + 1/6\n\n(1\n"), stdout=stdout)
+    assert code == 1
+    lines = stdout.getvalue().splitlines()
+    assert lines[0] == "1/2"
+    assert lines[1].startswith("Error:")
@@ -0,0 +1,102 @@
+"""
+History Cache Tests
+Binary snapshot cache invalidation and deferred history loading
+"""
+
+import os
+
+import pytest
+
+from history_manager import SNAPSHOT_CACHE_HEADER, HistoryManager
+from history_store import HistoryStore
+
+
+def expressions(history):
+    return [calculation["expression"] for calculation in history.get_history()]
+
+
+@pytest.fixture
+def path(tmp_path):
+    """A history file with a compacted snapshot and its binary cache"""
+    path = str(tmp_path / "history.json")
+    history = HistoryManager(path)
+    for i in range(10):
+        history.add_calculation(f"{i}+{i}", str(2 * i))
+    history.save_history()
+    history.close()
+    return path
+
+
+def plant_cache(path, max_entries=100):
+    """Overwrite the binary cache with a marker row valid for the snapshot"""
+    history = HistoryManager(path, max_entries=max_entries)
+    store = HistoryStore()
+    store.append("cached", "0", 0)
+    history.write_snapshot_cache(store, history.last_seq, max_entries)
+    history.close()
+
+
+def test_matching_cache_is_used(path):
+    assert os.path.exists(os.path.splitext(path)[0] + ".cache")
+    plant_cache(path)
+    assert expressions(HistoryManager(path)) == ["cached"]
+
+
+def test_cache_is_ignored_after_the_snapshot_changes_time(path):
+    plant_cache(path)
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert expressions(HistoryManager(path))[0] == "0+0"
+
+
+def test_cache_is_ignored_after_the_snapshot_changes_size(path):
+    plant_cache(path)
+    stat = os.stat(path)
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write("\n")
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert expressions(HistoryManager(path))[0] == "0+0"
+
+
+def test_cache_is_ignored_for_another_max_entries(path):
+    plant_cache(path, max_entries=100)
+    assert expressions(HistoryManager(path, max_entries=5)) == [f"{i}+{i}" for i in range(5, 10)]
+    # The reload rewrote the cache for its own limit
+    assert expressions(HistoryManager(path, max_entries=5)) == [f"{i}+{i}" for i in range(5, 10)]
+
+
+def test_corrupt_cache_falls_back_to_the_snapshot(path):
+    plant_cache(path)
+    with open(os.path.splitext(path)[0] + ".cache", 'r+b') as f:
+        # Damage the store header that follows the cache header
+        f.seek(SNAPSHOT_CACHE_HEADER.size)
+        f.write(b"\xff" * 16)
+    assert expressions(HistoryManager(path)) == [f"{i}+{i}" for i in range(10)]
+
+
+def test_deferred_load_installs_earlier_calculations(path):
+    history = HistoryManager(path, defer_load=True)
+    history.add_calculation("early", "1")
+    assert expressions(history) == ["early"]
+    history.install_history(history.load_history())
+    assert expressions(history) == [f"{i}+{i}" for i in range(10)] + ["early"]
+    history.close()
+    assert expressions(HistoryManager(path))[-1] == "early"
+
+
+def test_close_before_the_load_finishes_loses_nothing(path):
+    history = HistoryManager(path, defer_load=True, write_behind=True)
+    history.add_calculation("early", "1")
+    history.add_calculation("later", "2")
+    history.close()
+    assert expressions(HistoryManager(path)) == \
+        [f"{i}+{i}" for i in range(10)] + ["early", "later"]
+
+
+def test_clear_before_the_load_finishes(path):
+    history = HistoryManager(path, defer_load=True)
+    history.add_calculation("dropped", "1")
+    history.clear_history()
+    history.add_calculation("kept", "2")
+    history.close()
+    assert expressions(HistoryManager(path)) == ["kept"]
@@ -0,0 +1,84 @@
+"""
+History Index Tests
+Indexed queries return exactly what a scan of the history would
+"""
+
+import random
+
+import pytest
+
+from history_index import parse_query
+from history_store import HistoryStore
+
+QUERIES = [
+    {"text": "1"}, {"text": "+ 1"}, {"text": "23"}, {"text": "/3"}, {"text": "ERR"},
+    {"text": "no match"}, {"prefix": "1"}, {"prefix": "-"}, {"prefix": "1/"},
+    {"minimum": 10, "maximum": 50}, {"minimum": -5}, {"maximum": 0.5},
+    {"text": "2", "minimum": 0, "maximum": 100}, {"prefix": "2", "maximum": 30},
+]
+
+
+def random_row(rng):
+    a, b = rng.randint(-50, 200), rng.randint(1, 30)
+    op = rng.choice(["+", "-", "*", "/"])
+    if rng.random() < 0.05:
+        return f"{a} / 0", "Error"
+    if op == "/" and rng.random() < 0.5:
+        return f"{a} / {b}", f"{a}/{b}"
+    return f"{a} {op} {b}", str(eval(f"{a} {op} {b}"))
+
+
+def check(indexed, scanned):
+    for query in QUERIES:
+        assert list(indexed.query(**query)) == list(scanned.query(**query)), query
+
+
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_indexed_queries_match_a_scan(seed):
+    rng = random.Random(seed)
+    indexed, scanned = HistoryStore(), HistoryStore()
+    indexed.enable_index()
+    for step in range(3000):
+        if rng.random() < 0.02:
+            count = rng.randint(1, 1500)
+            indexed.drop_oldest(count)
+            scanned.drop_oldest(count)
+        else:
+            row = random_row(rng) + (step,)
+            indexed.append(*row)
+            scanned.append(*row)
+        if step % 500 == 0:
+            check(indexed, scanned)
+    check(indexed, scanned)
+
+
+def test_index_built_from_existing_rows():
+    rng = random.Random(5)
+    store = HistoryStore()
+    store.extend_records({"expression": e, "result": r, "timestamp": ""}
+                         for e, r in (random_row(rng) for _ in range(2000)))
+    store.drop_oldest(300)
+    scanned = store.copy()
+    store.enable_index()
+    check(store, scanned)
+
+
+def test_search_uses_the_index():
+    store = HistoryStore()
+    store.append("12 + 30", "42", 0)
+    store.append("2 * 3", "6", 1)
+    store.enable_index()
+    store.append("100 - 58", "42", 2)
+    assert [row.expression for row in store.search("42")] == ["12 + 30", "100 - 58"]
+
+
+@pytest.mark.parametrize("text,query", [
+    ("10..20", {"minimum": 10.0, "maximum": 20.0}),
+    ("..-1.5", {"minimum": None, "maximum": -1.5}),
+    ("3..", {"minimum": 3.0, "maximum": None}),
+    ("=1/", {"prefix": "1/"}),
+    ("  sqrt ", {"text": "sqrt"}),
+    ("..", {"text": ".."}),
+])
+def test_parse_query(text, query):
+    assert parse_query(text) == query
@@ -0,0 +1,78 @@
+"""
+History I/O Tests
+Every archive format round-trips, and filters match a plain scan
+"""
+
+import pytest
+
+from history_io import FORMATS, export_calculations, open_archive
+from history_store import CalculationView, format_timestamp
+
+START = 1700000000
+TEXTS = [("π×2", "6.283185307"), ("½ + ¼", "0.75"), ("√9 ÷ 3", "1"), ('"a", b', "x,y"),
+         ("12+34", "46"), ("Ünïcödé − 1", "Error"), ("1e5 × 日本", "∞"),
+         ("a\\b\tc", "1")]
+EXTENSIONS = {"json": ".json", "jsonl": ".jsonl", "csv": ".csv", "binary": ".bin"}
+
+
+def calculations(count=3000):
+    """Enough rows to span several read chunks, a minute apart"""
+    return [CalculationView(f"{TEXTS[i % len(TEXTS)][0]} #{i}", TEXTS[i % len(TEXTS)][1],
+                            START + 60 * i) for i in range(count)]
+
+
+def rows(views):
+    return [(view.expression, view.result, view.epoch) for view in views]
+
+
+@pytest.fixture(params=FORMATS)
+def archive(request, tmp_path):
+    fmt = request.param
+    path = str(tmp_path / ("history" + EXTENSIONS[fmt]))
+    assert export_calculations(calculations(), path) == 3000
+    with open_archive(path) as archive:
+        assert archive.format == fmt
+        yield archive
+
+
+def test_round_trip(archive):
+    assert rows(archive) == rows(calculations())
+
+
+@pytest.mark.parametrize("term", ["π", "ünïcödé", "日本", "46", '"a"', "#29", "\\b\t",
+                                  "missing"])
+def test_search_filter(archive, term):
+    expected = [view for view in calculations()
+                if term in view.expression.lower() or term in view.result.lower()]
+    assert rows(archive.filter(term)) == rows(expected)
+
+
+def test_time_range_filter(archive):
+    start, end = START + 60 * 100, START + 60 * 250
+    expected = rows(calculations()[100:250])
+    assert rows(archive.filter(start=start, end=end)) == expected
+    assert rows(archive.filter(start=format_timestamp(start), end=format_timestamp(end))) == \
+        expected
+    assert rows(archive.filter("½", start, end)) == [row for row in expected if "½" in row[0]]
+
+
+@pytest.mark.parametrize("fmt", FORMATS)
+def test_empty_history(tmp_path, fmt):
+    path = str(tmp_path / "empty.dat")
+    assert export_calculations([], path, fmt) == 0
+    with open_archive(path, fmt) as archive:
+        assert list(archive) == []
+
+
+def test_failed_export_keeps_the_old_archive(tmp_path):
+    path = tmp_path / "history.jsonl"
+    export_calculations(calculations(2), str(path))
+
+    def broken():
+        yield from calculations(2)
+        raise OSError("disk full")
+    with pytest.raises(OSError):
+        export_calculations(broken(), str(path))
+    with open_archive(str(path)) as archive:
+        assert rows(archive) == rows(calculations(2))
+    assert not (tmp_path / "history.jsonl.tmp").exists()
@@ -0,0 +1,89 @@
+"""
+History Journal Tests
+Snapshots, journal replay and recovery from interrupted writes
+"""
+
+import json
+
+import pytest
+
+from history_manager import HistoryManager
+
+
+def expressions(history):
+    return [calculation["expression"] for calculation in history.get_history()]
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "history.json")
+
+
+def fill(path, count, **options):
+    history = HistoryManager(path, max_entries=0, **options)
+    for i in range(count):
+        history.add_calculation(f"{i} + 1", str(i + 1))
+    history.close()
+
+
+def test_torn_last_line_is_discarded(path):
+    fill(path, 3)
+    journal = path.replace(".json", ".jsonl")
+    with open(journal, "ab") as f:
+        f.write(b'{"seq": 4, "expression": "torn')
+
+    history = HistoryManager(path, max_entries=0)
+    assert expressions(history) == ["0 + 1", "1 + 1", "2 + 1"]
+    with open(journal, "rb") as f:
+        assert f.read().endswith(b"\n")
+    history.add_calculation("3 + 1", "4")
+    history.close()
+
+    assert expressions(HistoryManager(path, max_entries=0))[-1] == "3 + 1"
+
+
+def test_corrupt_record_is_skipped(path):
+    fill(path, 2)
+    with open(path.replace(".json", ".jsonl"), "ab") as f:
+        f.write(b"not json\n")
+    fill(path, 1)
+    assert expressions(HistoryManager(path, max_entries=0)) == ["0 + 1", "1 + 1", "0 + 1"]
+
+
+def test_journal_replays_onto_the_snapshot(path):
+    history = HistoryManager(path, max_entries=0)
+    for i in range(5):
+        history.add_calculation(f"{i} * 2", str(i * 2))
+    history.save_history()
+    for i in range(5, 8):
+        history.add_calculation(f"{i} * 2", str(i * 2))
+    history.close()
+
+    with open(path, encoding="utf-8") as f:
+        assert len(json.load(f)["calculations"]) == 5
+    assert expressions(HistoryManager(path, max_entries=0)) == [f"{i} * 2" for i in range(8)]
+
+
+def test_snapshot_cache_is_ignored_once_the_snapshot_changes(path):
+    fill(path, 4)
+    history = HistoryManager(path, max_entries=0)
+    history.save_history()
+    history.close()
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    data["calculations"] = data["calculations"][:1]
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+
+    assert expressions(HistoryManager(path, max_entries=0)) == ["0 + 1"]
+
+
+def test_write_behind_records_are_flushed_on_close(path):
+    fill(path, 50, write_behind=True, fsync="flush")
+    assert len(HistoryManager(path, max_entries=0).get_history()) == 50
+
+
+def test_max_entries_trims_on_load(path):
+    fill(path, 10)
+    history = HistoryManager(path, max_entries=3)
+    assert expressions(history) == ["7 + 1", "8 + 1", "9 + 1"]
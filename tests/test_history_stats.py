@@ -0,0 +1,96 @@
+"""
+History Stats Tests
+Running aggregates agree with the statistics module as history changes
+"""
+
+import random
+import statistics
+
+import pytest
+
+from history_manager import HistoryManager
+from history_stats import HistoryStats, RunningStats, parse_result
+
+
+def check(summary, values):
+    assert summary.count == len(values)
+    if not values:
+        assert summary.mean is None
+        return
+    assert summary.total == pytest.approx(sum(values))
+    assert summary.mean == pytest.approx(statistics.fmean(values))
+    if len(values) > 1:
+        assert summary.variance == pytest.approx(statistics.variance(values), rel=1e-9, abs=1e-9)
+    assert summary.minimum == min(values)
+    assert summary.maximum == max(values)
+
+
+def test_running_stats_over_a_sliding_window():
+    rng = random.Random(7)
+    stats = RunningStats()
+    window = []
+    for _ in range(2000):
+        if window and rng.random() < 0.45:
+            stats.remove_oldest(window.pop(0))
+        else:
+            value = rng.uniform(-1000, 1000)
+            stats.add(value)
+            window.append(value)
+        check(stats.summary(), window)
+
+
+def test_parse_result():
+    assert parse_result("2.5") == 2.5
+    assert parse_result("1/4") == 0.25
+    assert parse_result("Error") is None
+    assert parse_result("inf") is None
+
+
+def results(history):
+    values = (parse_result(calculation.result) for calculation in history.get_history())
+    return [value for value in values if value is not None]
+
+
+def test_stats_are_built_while_loading(tmp_path):
+    path = str(tmp_path / "history.json")
+    history = HistoryManager(path, max_entries=0)
+    for i in range(20):
+        history.add_calculation(f"{i} / 4", str(i / 4))
+    history.add_calculation("1 / 0", "Error")
+    history.close()
+
+    loaded = HistoryManager(path, max_entries=0)
+    assert loaded.calculations.stats is not None
+    check(loaded.get_statistics(), results(loaded))
+    loaded.close()
+
+    deferred = HistoryManager(path, max_entries=0, defer_load=True)
+    calculations = deferred.load_history()
+    assert calculations.stats is not None
+    deferred.install_history(calculations)
+    check(deferred.get_statistics(), results(deferred))
+    deferred.close()
+
+
+def test_stats_follow_adds_trims_and_clears(tmp_path):
+    history = HistoryManager(str(tmp_path / "history.json"), max_entries=5)
+    for i in range(12):
+        history.add_calculation(f"{i} * 3", str(i * 3))
+        check(history.get_statistics(), results(history))
+    check(history.get_statistics("session"), [i * 3 for i in range(12)])
+    history.clear_history()
+    check(history.get_statistics(), [])
+    check(history.get_statistics("session"), [])
+    history.add_calculation("2 + 2", "4")
+    check(history.get_statistics(), [4.0])
+    history.close()
+
+
+def test_stats_by_bucket(tmp_path):
+    stats = HistoryStats(bucket_seconds=60)
+    for epoch, result in [(0, "1"), (30, "3"), (60, "5"), (150, "x"), (170, "7")]:
+        stats.add(result, epoch)
+    assert [(start, summary.count, summary.mean) for start, summary in stats.by_bucket()] \
+        == [(0, 2, 2.0), (60, 1, 5.0), (120, 1, 7.0)]
+    stats.remove_oldest("1", 0)
+    assert [start for start, _ in stats.by_bucket(start=60)] == [60, 120]
@@ -0,0 +1,66 @@
+"""
+Incremental Preview Tests
+Previews after edits match a fresh evaluation and calculate()
+"""
+
+import random
+
+import pytest
+
+from calculator_logic import CalculatorLogic
+
+EDITS = [
+    "1", "12", "12+", "12+3", "12+34", "12+34*", "12+34*5",   # typing
+    "12+34*", "12+34", "12+3",                                # backspace
+    "12+93", "1+93", "10+93", "10.5+93",                      # mid-token edits
+    "10.5-93", "(10.5-93", "(10.5-93)*2", "-(10.5-93)*2",     # at token boundaries
+    "-(10.5-93)*2**3", "-(10.5-93)*2**30", "-(10.5-93)*2**3",
+    "7//2", "7/2", "7/0", "7/0.5", "", "3 + 4 * 2", "3 + 40 * 2",
+]
+
+
+def fresh_preview(mode, text):
+    return CalculatorLogic(mode=mode).preview(text)
+
+
+def calculated(logic, text):
+    try:
+        return logic.calculate(text)
+    except (ValueError, ZeroDivisionError):
+        return None
+
+
+@pytest.mark.parametrize("mode", ["float", "decimal", "fraction"])
+def test_edits_match_a_fresh_preview_and_calculate(mode):
+    logic = CalculatorLogic(mode=mode)
+    reference = CalculatorLogic(mode=mode)
+    for text in EDITS:
+        preview = logic.preview(text)
+        assert preview == fresh_preview(mode, text), text
+        if text and text.count("(") == text.count(")") and text[-1] not in "+-*/":
+            assert preview == calculated(reference, text), text
+
+
+def test_incomplete_input_previews_the_complete_prefix():
+    logic = CalculatorLogic()
+    assert logic.preview("12 + 7 *") == 19
+    assert logic.preview("(3 + 4") == 7
+    assert logic.preview("2 * (3 + 4") == 14
+    assert logic.preview("1 / 0") is None
+    assert logic.preview("1 / 0 +") is None
+    assert logic.preview("1 / 2") == 0.5
+
+
+def test_random_edits():
+    rng = random.Random(7)
+    alphabet = "0123456789+-*/().  "
+    logic = CalculatorLogic(mode="fraction")
+    text = ""
+    for _ in range(2000):
+        position = rng.randint(0, len(text))
+        if text and rng.random() < 0.4:
+            text = text[:position] + text[position + 1:]
+        else:
+            text = text[:position] + rng.choice(alphabet) + text[position:]
+        text = text[:30]
+        assert logic.preview(text) == fresh_preview("fraction", text), text
@@ -0,0 +1,107 @@
+"""
+Input Buffer Tests
+Token editing, pasting and coalesced display updates
+"""
+
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from calculator_logic import CalculatorLogic
+from input_buffer import InputBuffer
+
+
+def typed(keys):
+    """Buffer after typing keys: digits, operators and B for backspace"""
+    buffer = InputBuffer()
+    for key in keys:
+        if key == "B":
+            buffer.backspace()
+        elif key.isdigit() or key == ".":
+            buffer.digit(key)
+        else:
+            buffer.operator(key)
+    return buffer
+
+
+def test_typing_builds_tokens():
+    buffer = typed(["1", "2", ".", "5", "*", "*", "3"])
+    assert buffer.tokens == ["12.5", "*", "3"]
+    assert buffer.text() == "12.5 × 3"
+    assert typed(["2", "*", "-", "5"]).tokens == ["2", "*", "-", "5"]
+    assert typed(["0", "0", "7", ".", "."]).tokens == ["7."]
+
+
+def test_backspace_across_multi_character_tokens():
+    buffer = typed(["1", "2", "**", "3", "4"])
+    steps = []
+    for _ in range(6):
+        buffer.backspace()
+        steps.append(list(buffer.tokens))
+    assert steps == [["12", "**", "3"], ["12", "**"], ["12", "*"], ["12"], ["1"], []]
+
+    buffer = typed(["2", "*", "5"])
+    buffer.negate()
+    assert buffer.tokens == ["2", "*", "-5"]
+    buffer.backspace()
+    # A sign left on its own goes with the last digit
+    assert buffer.tokens == ["2", "*"]
+    version = buffer.version
+    for _ in range(3):
+        buffer.backspace()
+    # Backspace on an empty buffer is not an edit
+    assert buffer.tokens == [] and buffer.version == version + 2
+
+
+def test_paste_of_a_long_expression():
+    text = "123+" * 1249 + "4567"
+    assert len(text) == 5000
+    buffer = InputBuffer()
+    started = time.perf_counter()
+    buffer.paste(text)
+    assert time.perf_counter() - started < 1
+    assert len(buffer.tokens) == 2499
+    assert buffer.expression() == text.replace("+", " + ")
+    assert CalculatorLogic().calculate(buffer.expression()) == 123 * 1249 + 4567
+
+
+def test_paste_continues_a_number_and_translates_symbols():
+    buffer = typed(["1", "2"])
+    buffer.paste("34 × 2 ÷ 4 − 1")
+    assert buffer.tokens == ["1234", "*", "2", "/", "4", "-", "1"]
+    version = buffer.version
+    with pytest.raises(ValueError):
+        buffer.paste("2 $ 3")
+    with pytest.raises(ValueError):
+        typed(["1", "."]).paste(".5")
+    assert buffer.tokens[0] == "1234" and buffer.version == version
+
+
+def test_display_updates_are_coalesced():
+    pytest.importorskip("PySide6")
+    from calculator_ui import CalculatorUI
+
+    class Timer:
+        active = False
+        starts = 0
+
+        def isActive(self):
+            return self.active
+
+        def start(self):
+            self.active = True
+            self.starts += 1
+
+    shown = []
+    ui = SimpleNamespace(input=InputBuffer(), display_timer=Timer(),
+                         display=SimpleNamespace(setText=shown.append))
+    ui.schedule_display = lambda: CalculatorUI.schedule_display(ui)
+    for digit in "12345":
+        CalculatorUI.handle_number_input(ui, digit)
+    CalculatorUI.handle_operator_input(ui, "×")
+    assert ui.display_timer.starts == 1 and shown == []
+    # One render when the event loop fires the timer
+    ui.display_timer.active = False
+    CalculatorUI.refresh_display(ui)
+    assert shown == ["12345 × "]
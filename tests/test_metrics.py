@@ -0,0 +1,98 @@
+"""
+Metrics Tests
+Prometheus and JSON export, and the disabled no-op path
+"""
+
+import json
+
+import pytest
+
+from calculator_logic import CalculatorLogic
+from metrics import MetricsRegistry, metrics
+
+
+@pytest.fixture
+def registry():
+    registry = MetricsRegistry(enabled=True)
+    errors = registry.counter("calc_errors_total", "Failed calculations", kind='div"0')
+    errors.inc(3)
+    latency = registry.histogram("calc_seconds", "Evaluation time")
+    for value in (0.05, 0.5, 0.5, 20.0):
+        latency.observe(value)
+    return registry
+
+
+def test_prometheus_text(registry):
+    lines = registry.to_prometheus().splitlines()
+    assert lines[:5] == [
+        "# HELP calc_errors_total Failed calculations",
+        "# TYPE calc_errors_total counter",
+        'calc_errors_total{kind="div\\"0"} 3',
+        "# HELP calc_seconds Evaluation time",
+        "# TYPE calc_seconds histogram",
+    ]
+    # Buckets are cumulative and end with +Inf, then the sum and count
+    assert 'calc_seconds_bucket{le="0.025"} 0' in lines
+    assert 'calc_seconds_bucket{le="0.05"} 1' in lines
+    assert 'calc_seconds_bucket{le="0.5"} 3' in lines
+    assert 'calc_seconds_bucket{le="10.0"} 3' in lines
+    assert lines[-3:] == ['calc_seconds_bucket{le="+Inf"} 4', "calc_seconds_sum 21.05",
+                          "calc_seconds_count 4"]
+
+
+def test_json_snapshot(registry, tmp_path):
+    path = tmp_path / "metrics.json"
+    assert registry.dump(str(path))
+    data = json.loads(path.read_text(encoding="utf-8"))
+    assert data["counters"]["calc_errors_total"] == [{"labels": {"kind": 'div"0'}, "value": 3}]
+    histogram = data["histograms"]["calc_seconds"][0]
+    assert histogram["count"] == 4
+    assert {bound: n for bound, n in histogram["buckets"].items() if n} == \
+        {"0.05": 1, "0.5": 2, "+Inf": 1}
+    assert (histogram["p50"], histogram["p99"]) == (0.5, float("inf"))
+
+    registry.reset()
+    assert registry.snapshot()["counters"]["calc_errors_total"][0]["value"] == 0
+
+
+def test_metric_kinds_do_not_mix(registry):
+    with pytest.raises(ValueError):
+        registry.histogram("calc_errors_total", kind='div"0')
+
+
+def test_disabled_metrics_record_nothing():
+    assert not metrics.enabled
+    metrics.reset()
+    logic = CalculatorLogic()
+    logic.calculate("1 + 2")
+    with pytest.raises(ZeroDivisionError):
+        logic.calculate("1 / 0")
+    list(logic.calculate_many(["2 * 3", "(1"]))
+    snapshot = metrics.snapshot()
+    assert all(entry["value"] == 0 for entries in snapshot["counters"].values()
+               for entry in entries)
+    assert all(entry["count"] == 0 for entries in snapshot["histograms"].values()
+               for entry in entries)
+
+    timer = metrics.time(metrics.histogram("unused_seconds"))
+    with timer:
+        pass
+    assert timer.start is None
+
+
+def test_enabled_metrics_record_calculations():
+    metrics.reset()
+    metrics.enable()
+    try:
+        logic = CalculatorLogic()
+        logic.calculate("1 + 2")
+        with pytest.raises(ZeroDivisionError):
+            logic.calculate("1 / 0")
+    finally:
+        metrics.disable()
+    snapshot = metrics.snapshot()
+    assert sum(entry["count"] for entries in snapshot["histograms"].values()
+               for entry in entries) > 0
+    assert sum(entry["value"] for entries in snapshot["counters"].values()
+               for entry in entries) > 0
+    metrics.reset()
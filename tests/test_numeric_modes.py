@@ -0,0 +1,58 @@
+"""
+Numeric Modes Tests
+Float, decimal and fraction arithmetic and how results are displayed
+"""
+
+import pytest
+
+from calculator_logic import CalculatorLogic
+from numeric_modes import create_mode
+
+
+def display(expression, mode="float", precision=None):
+    logic = CalculatorLogic(mode=mode, precision=precision)
+    return logic.format_result(logic.calculate(expression))
+
+
+@pytest.mark.parametrize("mode,expression,text", [
+    ("float", "0.1+0.2", "0.3"),
+    ("float", "4/2", "2.0"),
+    ("float", "2*3", "6"),
+    ("decimal", "0.1+0.2", "0.3"),
+    ("decimal", "4/2", "2"),
+    ("decimal", "-7//2", "-4"),
+    ("decimal", "10**30", "1E+30"),
+    ("fraction", "1/3+1/6", "1/2"),
+    ("fraction", "0.1+0.2", "3/10"),
+    ("fraction", "-7//2", "-4"),
+    ("fraction", "2**-2", "1/4"),
+])
+def test_results_in_each_mode(mode, expression, text):
+    assert display(expression, mode) == text
+
+
+def test_decimal_precision():
+    assert display("1/3", "decimal", 5) == "0.33333"
+    assert display("2/3", "decimal", 50) == "0." + "6" * 49 + "7"
+
+
+@pytest.mark.parametrize("mode", ["float", "decimal", "fraction"])
+def test_division_by_zero(mode):
+    with pytest.raises(ZeroDivisionError):
+        CalculatorLogic(mode=mode).calculate("1/0")
+
+
+def test_fraction_mode_requires_integer_exponents():
+    with pytest.raises(ValueError):
+        CalculatorLogic(mode="fraction").calculate("2**0.5")
+
+
+def test_coerce_operands():
+    assert str(create_mode("decimal").coerce(0.1)) == "0.1"
+    assert str(create_mode("fraction").coerce("1/3")) == "1/3"
+    assert create_mode("float").coerce("2.5") == 2.5
+
+
+def test_unknown_mode():
+    with pytest.raises(ValueError):
+        create_mode("complex")
@@ -0,0 +1,89 @@
+"""
+Shared History Tests
+Several history managers writing the same files, as the window and CLI do
+"""
+
+from history_manager import HistoryManager, create_history_manager
+
+
+def expressions(history):
+    return [calculation["expression"] for calculation in history.get_history()]
+
+
+def test_create_history_manager_shares_the_json_files(tmp_path):
+    history = create_history_manager("json", str(tmp_path / "history.json"))
+    assert history.shared
+    history.close()
+
+
+def test_cli_and_window_records_are_merged(tmp_path):
+    path = str(tmp_path / "history.json")
+    window = HistoryManager(path, max_entries=0, shared=True)
+    window.add_calculation("1 + 1", "2")
+    cli = create_history_manager("json", path)
+    window.add_calculation("2 + 2", "4")
+    cli.add_calculation("3 + 3", "6")
+    window.add_calculation("4 + 4", "8")
+    cli.add_calculation("5 + 5", "10")
+    window.sync()
+    cli.sync()
+    expected = ["1 + 1", "2 + 2", "3 + 3", "4 + 4", "5 + 5"]
+    assert sorted(expressions(window)) == expected
+    assert sorted(expressions(cli)) == expected
+    window.close()
+    cli.close()
+
+    reloaded = HistoryManager(path, max_entries=0)
+    assert expressions(reloaded) == expected
+    reloaded.close()
+
+
+def test_clear_in_one_instance_reaches_the_other(tmp_path):
+    path = str(tmp_path / "history.json")
+    first = HistoryManager(path, max_entries=0, shared=True)
+    second = HistoryManager(path, max_entries=0, shared=True)
+    first.add_calculation("1 + 1", "2")
+    second.sync()
+    assert expressions(second) == ["1 + 1"]
+    second.clear_history()
+    second.add_calculation("2 + 2", "4")
+    first.sync()
+    assert expressions(first) == ["2 + 2"]
+    first.close()
+    second.close()
+
+
+def test_cli_compaction_keeps_the_whole_history(tmp_path):
+    path = str(tmp_path / "history.json")
+    window = HistoryManager(path, max_entries=0, shared=True)
+    for i in range(150):
+        window.add_calculation(f"{i} + 0", str(i))
+    window.close()
+    cli = create_history_manager("json", path)
+    assert len(cli.get_history()) == 150
+    cli.add_calculation("150 + 0", "150")
+    cli.save_history()
+    cli.close()
+
+    reloaded = HistoryManager(path, max_entries=0)
+    assert len(reloaded.get_history()) == 151
+    reloaded.close()
+
+
+def test_capped_instance_compaction_keeps_other_instances_entries(tmp_path):
+    path = str(tmp_path / "history.json")
+    window = HistoryManager(path, max_entries=0, shared=True)
+    for i in range(301):
+        window.add_calculation(f"{i} + 0", str(i))
+    window.close()
+    capped = HistoryManager(path, max_entries=100, shared=True, compact_threshold=0)
+    assert len(capped.get_history()) == 100
+    capped.save_history()
+    capped.close()
+
+    reloaded = HistoryManager(path, max_entries=0)
+    assert len(reloaded.get_history()) == 301
+    reloaded.close()
+    capped = HistoryManager(path, max_entries=100, shared=True)
+    assert expressions(capped)[0] == "201 + 0"
+    capped.close()
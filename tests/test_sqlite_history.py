@@ -0,0 +1,80 @@
+"""
+SQLite History Tests
+Full-text and short-term search, keyset pagination and clearing
+"""
+
+import pytest
+
+from sqlite_history import SQLiteHistoryManager
+
+ENTRIES = [("12+34", "46"), ("50%_off", "0"), ("5_0", "50"), ("100/4", "25"),
+           ("a\\b", "1"), ("Sin(1)", "0.84"), ("2*23", "46")]
+
+
+@pytest.fixture
+def history(tmp_path):
+    manager = SQLiteHistoryManager(str(tmp_path / "history.db"))
+    for expression, result in ENTRIES:
+        manager.add_calculation(expression, result)
+    yield manager
+    manager.close()
+
+
+def found(history, term):
+    return [entry["expression"] for entry in history.search_history(term)]
+
+
+def scan(term):
+    term = term.lower()
+    return [e for e, r in ENTRIES if term in e.lower() or term in r.lower()]
+
+
+@pytest.mark.parametrize("term", ["12+", "0/4", "sin(", "100/4", "nothing", '"x"'])
+def test_full_text_search(history, term):
+    if not history.has_fts:
+        pytest.skip("SQLite built without FTS5 trigram support")
+    assert found(history, term) == scan(term)
+
+
+@pytest.mark.parametrize("term", ["%", "_", "46", "\\", "5", "%_"])
+def test_short_terms_match_literally(history, term):
+    assert found(history, term) == scan(term)
+
+
+def test_search_without_full_text_index(history):
+    history.has_fts = False
+    for term in ["12+", "50%_", "sin("]:
+        assert found(history, term) == scan(term)
+
+
+def test_pages_cover_the_history_once(history):
+    pages = []
+    cursor = None
+    while True:
+        page, cursor = history.page_history(cursor, limit=3)
+        pages.append([entry["expression"] for entry in page])
+        if cursor is None:
+            break
+    expressions = [e for e, _ in reversed(ENTRIES)]
+    assert pages == [expressions[:3], expressions[3:6], expressions[6:]]
+
+    page, cursor = history.page_history(limit=len(ENTRIES))
+    assert len(page) == len(ENTRIES)
+    assert history.page_history(cursor, limit=len(ENTRIES)) == ([], None)
+
+
+def test_pages_of_a_search(history):
+    page, cursor = history.page_history(limit=1, search_term="46")
+    assert [entry["expression"] for entry in page] == ["2*23"]
+    page, cursor = history.page_history(cursor, limit=1, search_term="46")
+    assert [entry["expression"] for entry in page] == ["12+34"]
+    assert history.page_history(cursor, limit=1, search_term="46") == ([], None)
+
+
+def test_clear_history_resets_the_full_text_index(history):
+    history.clear_history()
+    assert history.get_history() == []
+    assert found(history, "12+") == []
+    history.add_calculation("12+1", "13")
+    assert found(history, "12+") == ["12+1"]
+    assert found(history, "+1") == ["12+1"]
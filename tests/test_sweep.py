@@ -0,0 +1,96 @@
+"""
+Sweep Tests
+Vectorized and scalar sweeps agree with calculate(), integers included
+"""
+
+import io
+import random
+from decimal import Decimal
+
+import pytest
+
+import headless
+import sweep
+from calculator_logic import CalculatorLogic
+
+pytest.importorskip("numpy")
+
+
+def run(expression, values, vectorize):
+    logic = CalculatorLogic()
+    results = sweep.iter_results(sweep.sweep(logic, expression, values, vectorize=vectorize))
+    return [(value, error if error else logic.format_result(result))
+            for value, result, error in results]
+
+
+def expected(expression, values):
+    logic = CalculatorLogic()
+    rows = []
+    for value in values:
+        try:
+            result = logic.calculate(expression.replace("x", f"({value!r})"))
+            rows.append((value, logic.format_result(result)))
+        except (ValueError, ZeroDivisionError) as e:
+            rows.append((value, str(e)))
+    return rows
+
+
+@pytest.mark.parametrize("vectorize", [True, False])
+@pytest.mark.parametrize("expression,values", [
+    ("x*2", sweep.SweepRange(0, 4)),
+    ("x/2", sweep.SweepRange(0, 3)),
+    ("x**2//3 - x", sweep.SweepRange(-3, 3)),
+    ("2**x", sweep.SweepRange(-2, 3)),
+    ("7//x", sweep.SweepRange(-1, 2)),
+    ("x*3", [2 ** 60, 2 ** 70, -5]),
+    ("x*3**40", sweep.SweepRange(0, 3)),
+    ("x*2", [1, 2.5, 3]),
+    ("x*2", sweep.SweepRange(0, 1, 0.25)),
+])
+def test_sweep_matches_calculate(expression, values, vectorize):
+    inputs = values.values(0, len(values)) if isinstance(values, sweep.SweepRange) else values
+    assert run(expression, values, vectorize) == expected(expression, inputs)
+
+
+def test_integer_sweep_prints_integers():
+    out = io.StringIO()
+    rc = headless.run(["--sweep", "x*2", "--range", "0:4"], stdout=out)
+    assert rc == 0
+    assert out.getvalue() == "0\t0\n1\t2\n2\t4\n3\t6\n"
+
+
+def literal(value):
+    """Decimal text calculate() parses back to exactly value"""
+    text = repr(value)
+    if "e" in text:
+        text = format(Decimal(value), "f")
+    return text if "." in text else text + ".0"
+
+
+@pytest.mark.parametrize("expression", [
+    "x**2", "2**x", "x**x", "10**x/3", "x*1.1-x/3", "x//0.3", "x**0.5", "1/x", "x**-2",
+    "x*x*x*x*x*x*x*x", "2.5**x**2", "x+2.0**10000.0", "(x-x)**-1+2.0**10000.0",
+])
+def test_vectorized_sweep_matches_calculate_bit_for_bit(expression):
+    rng = random.Random(11)
+    values = [rng.uniform(-60, 60) for _ in range(1500)] + [rng.uniform(-3, 3) for _ in range(1500)]
+    values += [0.0, 0.5, -0.5, 1e308, -1e308, 1e-300, 123456.78901234565]
+    logic = CalculatorLogic()
+    got = [error or logic.format_result(result) for _, result, error
+           in sweep.iter_results(sweep.sweep(logic, expression, values, vectorize=True))]
+    wanted = []
+    for value in values:
+        try:
+            result = logic.calculate(expression.replace("x", f"({literal(value)})"))
+            wanted.append(logic.format_result(result))
+        except (ValueError, ZeroDivisionError) as e:
+            wanted.append(str(e))
+    assert got == wanted
+
+
+@pytest.mark.parametrize("vectorize", [True, False])
+def test_long_sweep_expressions(vectorize):
+    logic = CalculatorLogic()
+    expression = "x+" * 3000 + "1"
+    chunk = next(sweep.sweep(logic, expression, sweep.SweepRange(0, 3), vectorize=vectorize))
+    assert list(chunk.values) == [1, 3001, 6001]
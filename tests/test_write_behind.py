@@ -0,0 +1,59 @@
+"""
+Write-Behind History Tests
+Journal records queued for the writer thread are never lost or waited on
+"""
+
+import threading
+import time
+
+import pytest
+
+from history_manager import HistoryManager
+
+
+def expressions(history):
+    return [calculation["expression"] for calculation in history.get_history()]
+
+
+@pytest.mark.parametrize("fsync", HistoryManager.FSYNC_POLICIES)
+def test_close_writes_queued_records(tmp_path, fsync):
+    path = str(tmp_path / "history.json")
+    history = HistoryManager(path, write_behind=True, flush_interval=30, fsync=fsync)
+    for i in range(20):
+        history.add_calculation(f"{i}+1", str(i + 1))
+    started = time.monotonic()
+    history.close()
+    # close() ends the writer's batch instead of waiting out the interval
+    assert time.monotonic() - started < 10
+    assert expressions(HistoryManager(path)) == [f"{i}+1" for i in range(20)]
+
+
+def test_flush_writes_without_closing(tmp_path):
+    path = str(tmp_path / "history.json")
+    history = HistoryManager(path, write_behind=True, flush_interval=0.01)
+    history.add_calculation("1+1", "2")
+    history.flush()
+    assert expressions(HistoryManager(path)) == ["1+1"]
+    history.close()
+
+
+def test_add_calculation_does_not_wait_for_the_disk(tmp_path):
+    path = str(tmp_path / "history.json")
+    history = HistoryManager(path, write_behind=True, flush_interval=0)
+    release = threading.Event()
+    write_journal = history.write_journal
+
+    def slow_write(records, sync=False):
+        release.wait(10)
+        write_journal(records, sync)
+    history.write_journal = slow_write
+
+    started = time.monotonic()
+    for i in range(50):
+        history.add_calculation(f"{i}*2", str(i * 2))
+    assert time.monotonic() - started < 5
+    assert len(expressions(history)) == 50
+
+    release.set()
+    history.close()
+    assert expressions(HistoryManager(path)) == [f"{i}*2" for i in range(50)]
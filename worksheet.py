@@ -0,0 +1,250 @@
+"""
+Worksheet Module
+Named variables and user functions with dependency-tracked recomputation
+"""
+
+import threading
+from collections import defaultdict
+from typing import Dict, List, Optional
+from evaluation_limits import EvaluationCancelled
+from expression_parser import (DEFAULT_MAX_DEPTH, Assignment, compile_ast, names_in,
+                               parse_statement)
+
+
+class Cell:
+    """One named definition: a variable formula or a user function"""
+
+    __slots__ = ("name", "source", "params", "body", "deps", "value", "error", "dirty")
+
+    def __init__(self, name: str, source: str, params, body, deps: set):
+        self.name = name
+        self.source = source
+        self.params = params
+        self.body = body
+        self.deps = deps
+        self.value = None
+        self.error = None
+        self.dirty = True
+
+    @property
+    def is_function(self) -> bool:
+        """True for user functions, False for variables"""
+        return self.params is not None
+
+
+class Worksheet:
+    """Variables and functions kept in a dependency graph
+
+    Every definition records the names it refers to. Redefining a name
+    marks it and everything that depends on it (directly or through other
+    definitions) as dirty, without evaluating anything. Reading a dirty
+    variable recomputes just the dirty definitions it needs, dependencies
+    first, so a change to one input costs only the formulas downstream of
+    it. Values are computed in the numeric mode and under the evaluation
+    limits of the owning CalculatorLogic.
+    """
+
+    def __init__(self, logic):
+        self.logic = logic
+        self.cells: Dict[str, Cell] = {}
+        # name -> names of the definitions that refer to it, defined or not
+        self.dependents = defaultdict(set)
+        self.recomputed = 0
+        self._mode = logic.mode
+        self._lock = threading.RLock()
+
+    def execute(self, source: str, cancel=None):
+        """Run an assignment, function definition or expression
+
+        Assignments return the new value of the variable, function
+        definitions return None and expressions return their value.
+        """
+        max_depth = self.logic.limits.max_depth if self.logic.limits else DEFAULT_MAX_DEPTH
+        statement = parse_statement(source, max_depth)
+        with self._lock:
+            if not isinstance(statement, Assignment):
+                return self.evaluate_ast(statement, cancel)
+            self.define(statement.target, statement.params, statement.body, source.strip())
+            if statement.params is not None:
+                return None
+            return self.get(statement.target, cancel)
+
+    def evaluate(self, expression: str, cancel=None):
+        """Evaluate an expression that may refer to worksheet names"""
+        max_depth = self.logic.limits.max_depth if self.logic.limits else DEFAULT_MAX_DEPTH
+        statement = parse_statement(expression, max_depth)
+        if isinstance(statement, Assignment):
+            raise ValueError("Invalid expression")
+        with self._lock:
+            return self.evaluate_ast(statement, cancel)
+
+    def evaluate_ast(self, node, cancel=None):
+        """Compile and run an expression AST against the current values"""
+        self.check_mode()
+        program = compile_ast(node, self.logic.mode, self.logic.limits, self)
+        return self.logic.run_program(program, cancel)
+
+    def define(self, name: str, params, body, source: str = ""):
+        """Create or replace a definition and invalidate its dependents"""
+        deps = names_in(body) - set(params or ())
+        with self._lock:
+            if self.reaches(deps, name):
+                raise ValueError(f"Circular reference: {name}")
+            old = self.cells.get(name)
+            if old is not None:
+                for dep in old.deps:
+                    self.dependents[dep].discard(name)
+            for dep in deps:
+                self.dependents[dep].add(name)
+            self.cells[name] = Cell(name, source, params, body, deps)
+            self.invalidate(name)
+
+    def remove(self, name: str):
+        """Delete a definition; formulas using it report it as undefined"""
+        with self._lock:
+            cell = self.cells.pop(name, None)
+            if cell is None:
+                raise ValueError(f"Undefined variable: {name}")
+            for dep in cell.deps:
+                self.dependents[dep].discard(name)
+            self.invalidate(name)
+
+    def clear(self):
+        """Remove every definition"""
+        with self._lock:
+            self.cells.clear()
+            self.dependents.clear()
+
+    def reaches(self, start: set, target: str) -> bool:
+        """Check whether target is reachable from start along dependencies"""
+        stack = list(start)
+        seen = set()
+        while stack:
+            name = stack.pop()
+            if name == target:
+                return True
+            if name in seen:
+                continue
+            seen.add(name)
+            cell = self.cells.get(name)
+            if cell is not None:
+                stack.extend(cell.deps)
+        return False
+
+    def invalidate(self, name: str):
+        """Mark name and everything downstream of it dirty
+
+        A dirty definition always has dirty dependents, so the walk stops
+        at definitions that were already dirty.
+        """
+        cell = self.cells.get(name)
+        if cell is not None:
+            cell.dirty = True
+        stack = list(self.dependents.get(name, ()))
+        while stack:
+            dependent = self.cells.get(stack.pop())
+            if dependent is None or dependent.dirty:
+                continue
+            dependent.dirty = True
+            stack.extend(self.dependents.get(dependent.name, ()))
+
+    def check_mode(self):
+        """Recompute everything after the calculator switched numeric mode"""
+        if self.logic.mode is not self._mode:
+            self._mode = self.logic.mode
+            for cell in self.cells.values():
+                cell.dirty = True
+
+    def get(self, name: str, cancel=None):
+        """Return the value of a variable, recomputing it if needed"""
+        with self._lock:
+            self.check_mode()
+            cell = self.cells.get(name)
+            if cell is None or cell.is_function:
+                raise ValueError(f"Undefined variable: {name}")
+            if cell.dirty:
+                self.recompute(cell, cancel)
+            if cell.error is not None:
+                raise cell.error
+            return cell.value
+
+    def recompute(self, target: Cell, cancel=None):
+        """Bring target up to date, computing dirty dependencies first"""
+        order = []
+        stack = [(target, False)]
+        seen = set()
+        while stack:
+            cell, expanded = stack.pop()
+            if expanded:
+                order.append(cell)
+                continue
+            if cell.name in seen:
+                continue
+            seen.add(cell.name)
+            stack.append((cell, True))
+            for dep in cell.deps:
+                dep_cell = self.cells.get(dep)
+                if dep_cell is not None and dep_cell.dirty and dep not in seen:
+                    stack.append((dep_cell, False))
+        for cell in order:
+            self.compute(cell, cancel)
+
+    def recalculate(self, cancel=None) -> int:
+        """Recompute every dirty definition and return how many there were"""
+        with self._lock:
+            self.check_mode()
+            before = self.recomputed
+            for cell in list(self.cells.values()):
+                if cell.dirty:
+                    self.recompute(cell, cancel)
+            return self.recomputed - before
+
+    def compute(self, cell: Cell, cancel=None):
+        """Evaluate one definition whose dependencies are up to date"""
+        if cell.is_function:
+            cell.dirty = False
+            return
+        try:
+            program = compile_ast(cell.body, self.logic.mode, self.logic.limits, self)
+            cell.value = self.logic.run_program(program, cancel)
+            cell.error = None
+        except EvaluationCancelled:
+            # Leave the cell dirty so the next read tries again
+            raise
+        except (ValueError, ZeroDivisionError) as e:
+            cell.value = None
+            cell.error = e
+        cell.dirty = False
+        self.recomputed += 1
+
+    def lookup(self, name: str):
+        """Value of a variable, for compile_ast"""
+        cell = self.cells.get(name)
+        if cell is None or cell.is_function:
+            raise ValueError(f"Undefined variable: {name}")
+        if cell.dirty:
+            self.recompute(cell)
+        if cell.error is not None:
+            raise ValueError(f"Error in {name}: {cell.error}")
+        return cell.value
+
+    def function(self, name: str):
+        """Parameters and body of a user function, for compile_ast"""
+        cell = self.cells.get(name)
+        if cell is None or not cell.is_function:
+            raise ValueError(f"Undefined function: {name}")
+        return cell.params, cell.body
+
+    def is_variable(self, name: str) -> bool:
+        """True if name is defined as a variable"""
+        cell = self.cells.get(name)
+        return cell is not None and not cell.is_function
+
+    def names(self) -> List[str]:
+        """Names of all definitions in definition order"""
+        return list(self.cells)
+
+    def definition(self, name: str) -> Optional[str]:
+        """Source text a name was defined with"""
+        cell = self.cells.get(name)
+        return cell.source if cell is not None else None